@@ -187,6 +187,10 @@
   ],
   "link_collections": ["linktr.ee", "link3.to", "bento.me", "hub.xyz"],
   "http": {
+    "pool_size": 16,
+    "timeout_sec": 30,
+    "max_body_mb": 8,
+    "stop_at": ["</body>"],
     "strategy": "random",
     "ua": [
       "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/125.0.0.0 Safari/537.36",
@@ -213,7 +217,65 @@
     "max_ins": 3,
     "strategy": "random"
   },
+  "browser": {
+    "service": true,
+    "max_pages": 4,
+    "context_max_uses": 20,
+    "block_resources": true,
+    "stats_log_sec": 60
+  },
+  "cookies": {
+    "enabled": true,
+    "ttl_hours": 12
+  },
+  "host_profile": {
+    "enabled": true,
+    "ttl_hours": 72
+  },
+  "http_cache": {
+    "enabled": true,
+    "max_mb": 512,
+    "ttl": {
+      "homepage": "12h",
+      "aggregator": "6h",
+      "nitter": "6h",
+      "oembed": "7d"
+    }
+  },
+  "async_http": {
+    "max_connections": 100,
+    "per_host": 6,
+    "timeout_sec": 30
+  },
+  "html_parser": {
+    "backend": "auto"
+  },
   "clear_logs": true,
+  "partner_timeout_sec": 400,
+  "max_parallel_partners": 4,
+  "trace": false,
+  "worker_pool": {
+    "enabled": false,
+    "max_jobs_per_worker": 20,
+    "max_rss_mb": 1500
+  },
+  "stages": {
+    "ai_workers": 4,
+    "publish_workers": 2,
+    "publish_queue_size": 8,
+    "stats_log_sec": 30
+  },
+  "freshness": {
+    "only_stale": false,
+    "socials_ttl": "24h",
+    "ai_ttl": "30d"
+  },
+  "work_queue": {
+    "path": "",
+    "lease_sec": 120,
+    "max_attempts": 2,
+    "journal_mode": "WAL"
+  },
   "strapi": {
     "strapi_sync": true,
     "strapi_publish": true,
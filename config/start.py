@@ -53,7 +53,7 @@ def run_orchestrator():
     spec = importlib.util.spec_from_file_location("orchestrator", orchestrator_path)
     orchestrator = importlib.util.module_from_spec(spec)
     spec.loader.exec_module(orchestrator)
-    orchestrator.run_pipeline()
+    orchestrator.run_pipeline(sys.argv[1:])
 
 
 if __name__ == "__main__":
@@ -2,10 +2,13 @@ import asyncio
 import concurrent.futures
 import json
 import os
+from contextlib import asynccontextmanager
 
-import requests
+from core.async_http import aclose_async_http, get_async_http
+from core.http_client import get_session
 from core.log_utils import get_logger
 from core.normalize import normalize_content_to_template_md_with_retry
+from core.partner_cache import load_shared_review, save_shared_review
 from core.paths import (
     CONFIG_DIR,
     CONFIG_JSON,
@@ -13,6 +16,7 @@ from core.paths import (
     PROMPT_JSON,
     STORAGE_APPS_DIR,
 )
+from core.timing import cache_event, stage
 
 # Константы
 PROMPT_TYPE_REVIEW_FULL = "review_full"
@@ -26,6 +30,15 @@ PROMPT_TYPE_SEO_KEYWORDS = "seo_keywords"
 # Логгер
 logger = get_logger("ai")
 
+# Общий ограничитель LLM-запросов (core.pipeline.AiGate), ставит оркестратор
+_AI_GATE = None
+
+
+# Установка ограничителя LLM-запросов для текущего процесса
+def set_ai_gate(gate):
+    global _AI_GATE
+    _AI_GATE = gate
+
 
 # Загрузка AI-конфига
 def load_ai_config(config_path=CONFIG_JSON):
@@ -75,15 +88,14 @@ def get_group_for_prompt_type(ai_cfg, prompt_type):
     raise ValueError(f"No group found for prompt_type '{prompt_type}'")
 
 
-# Универсальный вызов AI API с полным конфигом
-def call_ai_with_config(
-    prompt, ai_cfg, custom_system_prompt=None, prompt_type="prompt"
-):
+# Параметры вызова для prompt_type (модель, api_url, ключ) или None, если
+# ИИ выключен или модель принадлежит не активному провайдеру
+def _ai_call_args(ai_cfg, prompt_type):
     # если ИИ выключен - ничего не генерится
     active_name, _ = get_active_provider(ai_cfg)
     if not active_name:
         logger.info("[ai] disabled: skip generation for %s", prompt_type)
-        return ""
+        return None
 
     group_cfg = get_group_for_prompt_type(ai_cfg, prompt_type)
     model = group_cfg["model"]
@@ -97,40 +109,49 @@ def call_ai_with_config(
             active_name,
             prompt_type,
         )
-        return ""
+        return None
 
     # приоритет: api_url из группы → из провайдера
-    api_url = group_cfg.get("api_url") or provider_cfg.get("api_url")
-    api_key = provider_cfg.get("api_key")
-    web_search_options = group_cfg.get("web_search_options")
+    return {
+        "api_key": provider_cfg.get("api_key"),
+        "api_url": group_cfg.get("api_url") or provider_cfg.get("api_url"),
+        "model": model,
+        "web_search_options": group_cfg.get("web_search_options"),
+    }
+
 
+# Универсальный вызов AI API с полным конфигом
+def call_ai_with_config(
+    prompt, ai_cfg, custom_system_prompt=None, prompt_type="prompt"
+):
+    args = _ai_call_args(ai_cfg, prompt_type)
+    if args is None:
+        return ""
     return call_ai_api(
         prompt=prompt,
-        api_key=api_key,
-        api_url=api_url,
-        model=model,
         system_prompt=custom_system_prompt,
         prompt_type=prompt_type,
-        web_search_options=web_search_options,
+        **args,
     )
 
 
-# Прямой вызов AI API и лог результата
-def call_ai_api(
-    prompt,
-    api_key,
-    api_url,
-    model,
-    system_prompt=None,
-    prompt_type="prompt",
-    web_search_options=None,
+# Асинхронный вариант call_ai_with_config (запрос в event loop, без потока)
+async def call_ai_with_config_async(
+    prompt, ai_cfg, custom_system_prompt=None, prompt_type="prompt"
 ):
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json",
-    }
+    args = _ai_call_args(ai_cfg, prompt_type)
+    if args is None:
+        return ""
+    return await call_ai_api_async(
+        prompt=prompt,
+        system_prompt=custom_system_prompt,
+        prompt_type=prompt_type,
+        **args,
+    )
 
-    # payload (для /responses и chat/completions)
+
+# payload (для /responses и chat/completions)
+def _ai_payload(prompt, api_url, model, system_prompt=None, web_search_options=None):
     if api_url.endswith("/responses"):
         payload = {
             "model": model,
@@ -157,63 +178,157 @@ def call_ai_api(
         }
         if web_search_options:
             payload["web_search_options"] = web_search_options
+    return payload
+
+
+# Текст ответа AI API и лог результата
+def _ai_response_text(resp, api_url, model, prompt_type):
+    if resp.status_code == 200:
+        result = resp.json()
+        text = ""
+
+        if api_url.endswith("/responses"):
+            if isinstance(result, dict) and "output" in result:
+                for item in result["output"]:
+                    if item.get("type") == "message":
+                        for block in item.get("content", []):
+                            if block.get("type") == "output_text":
+                                text = block.get("text", "")
+                                break
+
+            # Старый/альтернативный формат
+            elif isinstance(result, list):
+                for item in result:
+                    if item.get("type") == "message":
+                        content = item.get("content", [])
+                        if content and isinstance(content, list):
+                            text = content[0].get("text", "")
+                            break
+            # В случае unexpected result - лог
+            if not text:
+                logger.error(
+                    "[error] No message found in responses result: %s",
+                    str(result)[:1200],
+                )
+            # Лог ответа (модель + полный текст)
+            logger.info(f"[response] {prompt_type} ({model}): {text}")
+            return text
+
+        else:
+            # Стандартный chat/completions
+            choices = result.get("choices", [])
+            if choices and "message" in choices[0]:
+                text = choices[0]["message"]["content"]
+            else:
+                text = ""
+            logger.info(f"[response] {prompt_type} ({model}): {text}")
+            return text
+
+    else:
+        logger.error(
+            "[error] status: %s, response: %s", resp.status_code, resp.text[:1200]
+        )
+    return ""
+
+
+# Прямой вызов AI API и лог результата
+def call_ai_api(
+    prompt,
+    api_key,
+    api_url,
+    model,
+    system_prompt=None,
+    prompt_type="prompt",
+    web_search_options=None,
+):
+    headers = {
+        "Authorization": f"Bearer {api_key}",
+        "Content-Type": "application/json",
+    }
+    payload = _ai_payload(prompt, api_url, model, system_prompt, web_search_options)
 
     try:
         logger.info(f"[request] {prompt_type} prompt ({model}): {prompt}")
         logger.debug(f"[payload] {json.dumps(payload, ensure_ascii=False, indent=2)}")
 
-        resp = requests.post(api_url, headers=headers, json=payload, timeout=180)
-
-        if resp.status_code == 200:
-            result = resp.json()
-            text = ""
-
-            if api_url.endswith("/responses"):
-                if isinstance(result, dict) and "output" in result:
-                    for item in result["output"]:
-                        if item.get("type") == "message":
-                            for block in item.get("content", []):
-                                if block.get("type") == "output_text":
-                                    text = block.get("text", "")
-                                    break
-
-                # Старый/альтернативный формат
-                elif isinstance(result, list):
-                    for item in result:
-                        if item.get("type") == "message":
-                            content = item.get("content", [])
-                            if content and isinstance(content, list):
-                                text = content[0].get("text", "")
-                                break
-                # В случае unexpected result - лог
-                if not text:
-                    logger.error(
-                        "[error] No message found in responses result: %s",
-                        str(result)[:1200],
+        # время этапа включает ожидание слота AI-стадии
+        with stage(f"ai.{prompt_type}"):
+            if _AI_GATE is not None:
+                with _AI_GATE.slot():
+                    resp = get_session("ai").post(
+                        api_url, headers=headers, json=payload, timeout=180
                     )
-                # Лог ответа (модель + полный текст)
-                logger.info(f"[response] {prompt_type} ({model}): {text}")
-                return text
-
             else:
-                # Стандартный chat/completions
-                choices = result.get("choices", [])
-                if choices and "message" in choices[0]:
-                    text = choices[0]["message"]["content"]
-                else:
-                    text = ""
-                logger.info(f"[response] {prompt_type} ({model}): {text}")
-                return text
+                resp = get_session("ai").post(
+                    api_url, headers=headers, json=payload, timeout=180
+                )
 
-        else:
-            logger.error(
-                "[error] status: %s, response: %s", resp.status_code, resp.text[:1200]
-            )
+        return _ai_response_text(resp, api_url, model, prompt_type)
     except Exception as e:
         logger.error("[EXCEPTION] %s", str(e))
     return ""
 
 
+# Слот AI-стадии из корутины: семафор межпроцессный и блокирующий, поэтому
+# ждем его в потоке. Если задачу отменили, пока поток ждал, слот, который
+# поток все-таки взял, отпускается сразу по получении
+@asynccontextmanager
+async def _ai_gate_slot_async():
+    if _AI_GATE is None:
+        yield
+        return
+    cm = _AI_GATE.slot()
+    enter = asyncio.ensure_future(asyncio.to_thread(cm.__enter__))
+    try:
+        await asyncio.shield(enter)
+    except asyncio.CancelledError:
+        enter.add_done_callback(lambda f: _release_late(f, cm))
+        raise
+    try:
+        yield
+    finally:
+        cm.__exit__(None, None, None)
+
+
+def _release_late(future, cm):
+    if not future.cancelled() and future.exception() is None:
+        cm.__exit__(None, None, None)
+
+
+# Асинхронный вариант call_ai_api (запрос в общем event loop, без потока на ответ)
+async def call_ai_api_async(
+    prompt,
+    api_key,
+    api_url,
+    model,
+    system_prompt=None,
+    prompt_type="prompt",
+    web_search_options=None,
+):
+    headers = {
+        "Authorization": f"Bearer {api_key}",
+        "Content-Type": "application/json",
+    }
+    payload = _ai_payload(prompt, api_url, model, system_prompt, web_search_options)
+
+    try:
+        logger.info(f"[request] {prompt_type} prompt ({model}): {prompt}")
+        logger.debug(f"[payload] {json.dumps(payload, ensure_ascii=False, indent=2)}")
+
+        with stage(f"ai.{prompt_type}"):
+            async with _ai_gate_slot_async():
+                resp = await get_async_http().post(
+                    api_url, service="ai", headers=headers, json=payload, timeout=180
+                )
+
+        return _ai_response_text(resp, api_url, model, prompt_type)
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        logger.error("[EXCEPTION] %r", e)
+    return ""
+
+
 # Обновление contentMarkdown в main.json
 def enrich_main_json(json_path, content):
     if not os.path.exists(json_path):
@@ -242,49 +357,38 @@ def enrich_short_description(json_path, short_desc):
     return True
 
 
-# Асинх генерация описания для проекта (short_desc)
+# Асинх генерация описания для проекта (short_desc). Короткие промпты идут
+# запросом в event loop (core.async_http); executor - для совместимости вызовов
 async def ai_generate_short_desc(content, prompts, ai_cfg, executor):
     short_desc_cfg = ai_cfg["short_desc"]
-
-    def sync_ai_short():
-        context = {"content": content, "max_len": short_desc_cfg["max_len"]}
-        short_prompt = render_prompt(prompts["short_description"], context)
-        return call_ai_with_config(
-            short_prompt, ai_cfg, prompt_type=PROMPT_TYPE_SHORT_DESCRIPTION
-        )
-
-    loop = asyncio.get_event_loop()
-    result = await loop.run_in_executor(executor, sync_ai_short)
+    context = {"content": content, "max_len": short_desc_cfg["max_len"]}
+    short_prompt = render_prompt(prompts["short_description"], context)
+    result = await call_ai_with_config_async(
+        short_prompt, ai_cfg, prompt_type=PROMPT_TYPE_SHORT_DESCRIPTION
+    )
     return (result or "").strip()
 
 
 # Асинхронная генерация short_description с ретраями
 async def ai_generate_short_desc_with_retries(content, prompts, ai_cfg, executor):
     short_desc_cfg = ai_cfg["short_desc"]
-    loop = asyncio.get_event_loop()
-
-    def sync_short():
-        context = {"content": content, "max_len": short_desc_cfg["max_len"]}
-        short_prompt = render_prompt(prompts["short_description"], context)
-        return call_ai_with_config(
-            short_prompt, ai_cfg, prompt_type=PROMPT_TYPE_SHORT_DESCRIPTION
-        )
 
-    desc = await loop.run_in_executor(executor, sync_short)
+    context = {"content": content, "max_len": short_desc_cfg["max_len"]}
+    short_prompt = render_prompt(prompts["short_description"], context)
+    desc = await call_ai_with_config_async(
+        short_prompt, ai_cfg, prompt_type=PROMPT_TYPE_SHORT_DESCRIPTION
+    )
     desc = (desc or "").strip()
 
     if len(desc) <= short_desc_cfg["strapi_limit"]:
         logger.info("[short_desc_first_try] %s", desc)
         return desc
 
-    def sync_retry():
-        context = {"content": content, "max_len": short_desc_cfg["retry_len"]}
-        short_prompt_retry = render_prompt(prompts["short_description"], context)
-        return call_ai_with_config(
-            short_prompt_retry, ai_cfg, prompt_type=PROMPT_TYPE_SHORT_DESCRIPTION
-        )
-
-    desc_retry = await loop.run_in_executor(executor, sync_retry)
+    context = {"content": content, "max_len": short_desc_cfg["retry_len"]}
+    short_prompt_retry = render_prompt(prompts["short_description"], context)
+    desc_retry = await call_ai_with_config_async(
+        short_prompt_retry, ai_cfg, prompt_type=PROMPT_TYPE_SHORT_DESCRIPTION
+    )
     desc_retry = (desc_retry or "").strip()
 
     if len(desc_retry) <= short_desc_cfg["strapi_limit"]:
@@ -322,25 +426,21 @@ def clean_categories(raw_cats, allowed_categories):
 async def ai_generate_project_categories(
     content, prompts, ai_cfg, executor, allowed_categories=None
 ):
-    def sync_ai_categories():
-        categories_str = ", ".join(allowed_categories or [])
-        context = {"categories": categories_str, "content": content}
-        prompt = render_prompt(prompts["project_categories"], context)
-        raw = call_ai_with_config(
-            prompt, ai_cfg, prompt_type=PROMPT_TYPE_PROJECT_CATEGORIES
-        )
-        if not raw:
-            return []
-        if "," in raw:
-            cats = [c.strip() for c in raw.split(",") if c.strip()]
-        else:
-            cats = [c.strip("-•. \t") for c in raw.splitlines() if c.strip()]
-        if allowed_categories is not None:
-            return clean_categories(cats, allowed_categories)
-        return cats[:3]
-
-    loop = asyncio.get_event_loop()
-    return await loop.run_in_executor(executor, sync_ai_categories)
+    categories_str = ", ".join(allowed_categories or [])
+    context = {"categories": categories_str, "content": content}
+    prompt = render_prompt(prompts["project_categories"], context)
+    raw = await call_ai_with_config_async(
+        prompt, ai_cfg, prompt_type=PROMPT_TYPE_PROJECT_CATEGORIES
+    )
+    if not raw:
+        return []
+    if "," in raw:
+        cats = [c.strip() for c in raw.split(",") if c.strip()]
+    else:
+        cats = [c.strip("-•. \t") for c in raw.splitlines() if c.strip()]
+    if allowed_categories is not None:
+        return clean_categories(cats, allowed_categories)
+    return cats[:3]
 
 
 # Шаблон контента
@@ -363,18 +463,25 @@ def ai_verify_connection_section(section_text, name1, name2, prompts, ai_cfg):
 
 # Асинх генерация полного markdown-контент проекта
 async def ai_generate_content_markdown(
-    data, app_name, domain, prompts, ai_cfg, executor
+    data, app_name, domain, prompts, ai_cfg, executor, review_cache_path=None
 ):
     def sync_ai_content():
-        # Генерация обзора
+        # Генерация обзора (не зависит от приложения - общий кэш на прогон)
         context1 = {
             "name": data.get("name", domain),
             "website": data.get("socialLinks", {}).get("websiteURL", ""),
         }
-        prompt1 = render_prompt(prompts["review_full"], context1)
-        content1 = call_ai_with_config(
-            prompt1, ai_cfg, prompt_type=PROMPT_TYPE_REVIEW_FULL
-        )
+        content1 = load_shared_review(review_cache_path, context1)
+        if review_cache_path:
+            cache_event("review", bool(content1))
+        if content1:
+            logger.info("[review_full] из общего кэша: %s", context1["website"])
+        else:
+            prompt1 = render_prompt(prompts["review_full"], context1)
+            content1 = call_ai_with_config(
+                prompt1, ai_cfg, prompt_type=PROMPT_TYPE_REVIEW_FULL
+            )
+            save_shared_review(review_cache_path, context1, content1)
 
         # Генерация связки
         main_app_config_path = os.path.join(CONFIG_DIR, "apps", f"{app_name}.json")
@@ -505,40 +612,34 @@ async def ai_generate_content_markdown(
 # Асинх генерация SEO-описания
 async def ai_generate_seo_desc(short_desc, prompts, ai_cfg, executor):
     seo_short_cfg = ai_cfg["seo_short"]
-
-    def sync_seo_desc():
-        context = {"short_desc": short_desc, "max_len": seo_short_cfg["max_len"]}
-        prompt = render_prompt(prompts["seo_short"], context)
-        return call_ai_with_config(prompt, ai_cfg, prompt_type=PROMPT_TYPE_SEO_SHORT)
-
-    loop = asyncio.get_event_loop()
-    result = await loop.run_in_executor(executor, sync_seo_desc)
+    context = {"short_desc": short_desc, "max_len": seo_short_cfg["max_len"]}
+    prompt = render_prompt(prompts["seo_short"], context)
+    result = await call_ai_with_config_async(
+        prompt, ai_cfg, prompt_type=PROMPT_TYPE_SEO_SHORT
+    )
     return (result or "").strip()
 
 
 # Асинх генерация seo_short с ретраями
 async def ai_generate_seo_desc_with_retries(short_desc, prompts, ai_cfg, executor):
     seo_short_cfg = ai_cfg["seo_short"]
-    loop = asyncio.get_event_loop()
 
-    def sync_seo_1():
-        context = {"short_desc": short_desc, "max_len": seo_short_cfg["max_len"]}
-        prompt = render_prompt(prompts["seo_short"], context)
-        return call_ai_with_config(prompt, ai_cfg, prompt_type=PROMPT_TYPE_SEO_SHORT)
-
-    desc = await loop.run_in_executor(executor, sync_seo_1)
+    context = {"short_desc": short_desc, "max_len": seo_short_cfg["max_len"]}
+    prompt = render_prompt(prompts["seo_short"], context)
+    desc = await call_ai_with_config_async(
+        prompt, ai_cfg, prompt_type=PROMPT_TYPE_SEO_SHORT
+    )
     desc = (desc or "").strip()
 
     if len(desc) <= seo_short_cfg["strapi_limit"]:
         logger.info("[seo_desc_first_try] %s", desc)
         return desc
 
-    def sync_seo_2():
-        context = {"short_desc": short_desc, "max_len": seo_short_cfg["retry_len"]}
-        prompt = render_prompt(prompts["seo_short"], context)
-        return call_ai_with_config(prompt, ai_cfg, prompt_type=PROMPT_TYPE_SEO_SHORT)
-
-    desc_retry = await loop.run_in_executor(executor, sync_seo_2)
+    context = {"short_desc": short_desc, "max_len": seo_short_cfg["retry_len"]}
+    prompt = render_prompt(prompts["seo_short"], context)
+    desc_retry = await call_ai_with_config_async(
+        prompt, ai_cfg, prompt_type=PROMPT_TYPE_SEO_SHORT
+    )
     desc_retry = (desc_retry or "").strip()
 
     if len(desc_retry) <= seo_short_cfg["strapi_limit"]:
@@ -555,13 +656,11 @@ async def ai_generate_seo_desc_with_retries(short_desc, prompts, ai_cfg, executo
 
 # Асинх генерация SEO-ключевых слов
 async def ai_generate_keywords(content, prompts, ai_cfg, executor):
-    def sync_keywords():
-        context = {"content": content or ""}
-        prompt = render_prompt(prompts["seo_keywords"], context)
-        return call_ai_with_config(prompt, ai_cfg, prompt_type=PROMPT_TYPE_SEO_KEYWORDS)
-
-    loop = asyncio.get_event_loop()
-    return await loop.run_in_executor(executor, sync_keywords)
+    context = {"content": content or ""}
+    prompt = render_prompt(prompts["seo_keywords"], context)
+    return await call_ai_with_config_async(
+        prompt, ai_cfg, prompt_type=PROMPT_TYPE_SEO_KEYWORDS
+    )
 
 
 # Синхр генерация для оффлайн-режима
@@ -685,6 +784,14 @@ async def process_all_projects(executor):
                 )
 
 
+# Оффлайн-прогон в своем event loop; движок async_http закрывается с ним
+async def _main(executor):
+    try:
+        await process_all_projects(executor)
+    finally:
+        await aclose_async_http()
+
+
 if __name__ == "__main__":
     executor = concurrent.futures.ThreadPoolExecutor()
-    asyncio.run(process_all_projects(executor))
+    asyncio.run(_main(executor))
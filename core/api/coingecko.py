@@ -1,9 +1,10 @@
+import asyncio
 import json
 import re
 import time
-from urllib.parse import urlparse
 
-import requests
+from core.async_http import get_async_http
+from core.http_client import get_session
 from core.log_utils import get_logger
 from core.normalize import (
     brand_from_url,
@@ -11,7 +12,9 @@ from core.normalize import (
     normalize_query,
     normalize_socials,
 )
+from core.parser.url_classify import classify_url
 from core.paths import CONFIG_JSON  # используем единый файл путей
+from core.singleflight import SingleFlight
 
 # Логгер
 logger = get_logger("coingecko")
@@ -34,6 +37,11 @@ def load_coingecko_api_base():
 
 COINGECKO_API_BASE = load_coingecko_api_base()
 
+# Одинаковые запросы из параллельных потоков - один поход в API (лимит 429).
+# Только внутри процесса: ответы API на диск не кэшируются, и fork-воркерам
+# нечего взять у лидера другого процесса
+_REQUEST_FLIGHT = SingleFlight("coingecko")
+
 
 # Вспомогательная функция: безопасный запрос к CoinGecko с базовой обработкой 429/ошибок
 def _request_json(
@@ -47,10 +55,14 @@ def _request_json(
     """
     url = f"{COINGECKO_API_BASE}{path}"
     params = params or {}
+    key = (url, json.dumps(params, sort_keys=True, default=str))
+    return _REQUEST_FLIGHT.do(key, lambda: _get_json(url, params, timeout, retries))
+
 
+def _get_json(url: str, params: dict, timeout: int, retries: int):
     for attempt in range(retries):
         try:
-            resp = requests.get(
+            resp = get_session("coingecko").get(
                 url,
                 params=params,
                 timeout=timeout,
@@ -71,6 +83,42 @@ def _request_json(
     return None
 
 
+# Асинхронный вариант _request_json: те же паузы на 429/ошибки, но через
+# asyncio.sleep - ожидание не держит поток
+async def _request_json_async(
+    path: str, params: dict | None = None, timeout: int = 10, retries: int = 3
+):
+    url = f"{COINGECKO_API_BASE}{path}"
+    params = params or {}
+    key = (url, json.dumps(params, sort_keys=True, default=str))
+    return await _REQUEST_FLIGHT.ado(
+        key, lambda: _get_json_async(url, params, timeout, retries)
+    )
+
+
+async def _get_json_async(url: str, params: dict, timeout: int, retries: int):
+    http = get_async_http()
+    for attempt in range(retries):
+        try:
+            resp = await http.get(
+                url,
+                service="coingecko",
+                params=params,
+                timeout=timeout,
+                headers={"User-Agent": "Mozilla/5.0"},
+            )
+            if resp.status_code == 429:
+                await asyncio.sleep(6)
+                continue
+            if resp.status_code != 200:
+                return None
+            return resp.json()
+        except Exception:
+            await asyncio.sleep(2)
+
+    return None
+
+
 # Вспомогательная функция: вытащить handle из twitter/x URL
 def _twitter_handle_from_url(url: str) -> str:
     """
@@ -91,40 +139,15 @@ def _twitter_handle_from_url(url: str) -> str:
 # Вспомогательная функция: классификация URL в social-ключ
 def _map_url_to_social_key(raw_url: str) -> tuple[str | None, str]:
     """
-    По домену определяет тип соцсети:
-    - twitter.com/x.com → twitterURL
-    - t.me/telegram.me → telegramURL
-    - discord.gg/discord.com → discordURL
-    - github.com → githubURL
-    - reddit.com → redditURL
-    - youtube.com/youtu.be → youtubeURL
+    По домену определяет тип соцсети через общий индекс хостов
+    (core.parser.url_classify): twitter.com/x.com → twitterURL,
+    t.me/telegram.me → telegramURL, discord.gg/discord.com → discordURL и т.д.
     Остальные ссылки здесь не маркируем как websiteURL — сайт уже есть из web-парсера.
     """
     if not raw_url:
         return None, ""
     url = force_https(raw_url.strip())
-    try:
-        host = urlparse(url).netloc.lower().replace("www.", "")
-    except Exception:
-        host = ""
-
-    if not host:
-        return None, url
-
-    if host in ("twitter.com", "x.com"):
-        return "twitterURL", url
-    if host in ("t.me", "telegram.me"):
-        return "telegramURL", url
-    if host.startswith("discord.") or host == "discord.gg":
-        return "discordURL", url
-    if host == "github.com":
-        return "githubURL", url
-    if host.endswith("reddit.com"):
-        return "redditURL", url
-    if "youtube.com" in host or "youtu.be" in host:
-        return "youtubeURL", url
-
-    return None, url
+    return classify_url(url).social or None, url
 
 
 # Быстрый поиск coin id на CoinGecko по текстовому запросу (имя, тикер, домен, handle)
@@ -147,6 +170,26 @@ def search_coin_id(query: str, retries: int = 3) -> str:
         timeout=10,
         retries=retries,
     )
+    return _pick_coin_id(data, query)
+
+
+# Асинхронный вариант search_coin_id
+async def search_coin_id_async(query: str, retries: int = 3) -> str:
+    q_api = normalize_query(query) or (query or "").strip()
+    if not q_api:
+        return ""
+
+    data = await _request_json_async(
+        "/search",
+        params={"query": q_api},
+        timeout=10,
+        retries=retries,
+    )
+    return _pick_coin_id(data, query)
+
+
+# Выбор id из ответа /search: точное совпадение, подстрока, первый из списка
+def _pick_coin_id(data, query: str) -> str:
     if not data:
         return ""
 
@@ -186,6 +229,28 @@ def get_coin_id_best(name: str, website_url: str = "", twitter_url: str = "") ->
     3) twitter handle из URL
     И по очереди ищет id через /search.
     """
+    for q in _coin_id_candidates(name, website_url, twitter_url):
+        coin_id = search_coin_id(q)
+        if coin_id:
+            return coin_id
+
+    return ""
+
+
+# Асинхронный вариант get_coin_id_best
+async def get_coin_id_best_async(
+    name: str, website_url: str = "", twitter_url: str = ""
+) -> str:
+    for q in _coin_id_candidates(name, website_url, twitter_url):
+        coin_id = await search_coin_id_async(q)
+        if coin_id:
+            return coin_id
+
+    return ""
+
+
+# Запросы для /search по порядку: имя, бренд из домена, twitter handle (без дублей)
+def _coin_id_candidates(name: str, website_url: str, twitter_url: str) -> list[str]:
     candidates: list[str] = []
 
     if name:
@@ -210,13 +275,18 @@ def get_coin_id_best(name: str, website_url: str = "", twitter_url: str = "") ->
         if q not in seen:
             seen.add(q)
             uniq_candidates.append(q)
+    return uniq_candidates
 
-    for q in uniq_candidates:
-        coin_id = search_coin_id(q)
-        if coin_id:
-            return coin_id
 
-    return ""
+# /coins/{id} без лишних данных
+_COIN_PARAMS = {
+    "localization": "false",
+    "tickers": "false",
+    "market_data": "false",
+    "community_data": "true",
+    "developer_data": "true",
+    "sparkline": "false",
+}
 
 
 # Вспомогательная функция: получить соцсети токена из CoinGecko /coins/{id}
@@ -230,22 +300,26 @@ def _get_coin_socials_from_api(coin_id: str) -> tuple[dict, dict | None]:
     """
     if not coin_id:
         return {}, None
-
     data = _request_json(
-        f"/coins/{coin_id}",
-        params={
-            "localization": "false",
-            "tickers": "false",
-            "market_data": "false",
-            "community_data": "true",
-            "developer_data": "true",
-            "sparkline": "false",
-        },
-        timeout=15,
-        retries=2,
+        f"/coins/{coin_id}", params=_COIN_PARAMS, timeout=15, retries=2
     )
-    if not data:
+    return _coin_socials(data), data
+
+
+# Асинхронный вариант _get_coin_socials_from_api
+async def _get_coin_socials_from_api_async(coin_id: str) -> tuple[dict, dict | None]:
+    if not coin_id:
         return {}, None
+    data = await _request_json_async(
+        f"/coins/{coin_id}", params=_COIN_PARAMS, timeout=15, retries=2
+    )
+    return _coin_socials(data), data
+
+
+# Соцлинки из ответа /coins/{id}
+def _coin_socials(data) -> dict:
+    if not data:
+        return {}
 
     links = data.get("links") or {}
 
@@ -294,7 +368,7 @@ def _get_coin_socials_from_api(coin_id: str) -> tuple[dict, dict | None]:
     if tw_screen and not socials.get("twitterURL"):
         socials["twitterURL"] = force_https(f"https://x.com/{tw_screen}")
 
-    return socials, data
+    return socials
 
 
 # Вспомогательная функция: проверка, совпадает ли токен по сайту/твиттеру с нашим проектом
@@ -354,6 +428,35 @@ def enrich_with_coin_id(main_data: dict) -> dict:
          [INFO] - [coingecko] Токен в Coingecko не найден
     """
     main_data = main_data or {}
+    query = _coin_query(main_data)
+    if query is None:
+        return _coin_not_found(main_data)
+
+    coin_id = get_coin_id_best(*query)
+    cg_socials, _raw = _get_coin_socials_from_api(coin_id)
+    return _apply_coin(main_data, coin_id, cg_socials)
+
+
+# Асинхронный вариант enrich_with_coin_id: запросы к API - в event loop
+async def enrich_with_coin_id_async(main_data: dict) -> dict:
+    main_data = main_data or {}
+    query = _coin_query(main_data)
+    if query is None:
+        return _coin_not_found(main_data)
+
+    coin_id = await get_coin_id_best_async(*query)
+    cg_socials, _raw = await _get_coin_socials_from_api_async(coin_id)
+    return _apply_coin(main_data, coin_id, cg_socials)
+
+
+def _coin_not_found(main_data: dict) -> dict:
+    main_data["coinData"] = {"coin": ""}
+    logger.info("Токен в Coingecko не найден")
+    return main_data
+
+
+# Запрос поиска токена (name, website_url, twitter_url); None - искать не по чему
+def _coin_query(main_data: dict):
     social_links = main_data.get("socialLinks") or {}
     website_url = (social_links.get("websiteURL") or "").strip()
     twitter_url = (social_links.get("twitterURL") or "").strip()
@@ -371,31 +474,22 @@ def enrich_with_coin_id(main_data: dict) -> dict:
 
     # Базовое условие: нужен хотя бы сайт или твиттер, иначе токен считаем неподходящим
     if not website_url and not twitter_url and not name:
-        main_data["coinData"] = {"coin": ""}
-        logger.info("Токен в Coingecko не найден")
-        return main_data
+        return None
+    return name, website_url, twitter_url
 
-    # Поиск самого id токена
-    coin_id = get_coin_id_best(
-        name=name, website_url=website_url, twitter_url=twitter_url
-    )
-    if not coin_id:
-        main_data["coinData"] = {"coin": ""}
-        logger.info("Токен в Coingecko не найден")
-        return main_data
 
-    # Соцсети и детали токена
-    cg_socials, _raw = _get_coin_socials_from_api(coin_id)
-    if not cg_socials:
-        main_data["coinData"] = {"coin": ""}
-        logger.info("Токен в Coingecko не найден")
-        return main_data
+# Найденный токен -> coinData + соцсети CoinGecko (после проверки по сайту/твиттеру)
+def _apply_coin(main_data: dict, coin_id: str, cg_socials: dict) -> dict:
+    if not coin_id or not cg_socials:
+        return _coin_not_found(main_data)
+
+    social_links = main_data.get("socialLinks") or {}
+    website_url = (social_links.get("websiteURL") or "").strip()
+    name = (main_data.get("name") or "").strip() or brand_from_url(website_url) or ""
 
     # Валидация токена по сайту/твиттеру
     if not _token_links_match(social_links, cg_socials):
-        main_data["coinData"] = {"coin": ""}
-        logger.info("Токен в Coingecko не найден")
-        return main_data
+        return _coin_not_found(main_data)
 
     # Мерж соцсетей из CoinGecko как из линк-агрегатора (не перетираем уже найденные)
     for key, val in cg_socials.items():
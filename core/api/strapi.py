@@ -1,9 +1,11 @@
+import asyncio
 import json
 import os
 import time
 
 import markdown
-import requests
+from core.async_http import RETRY_ERRORS, get_async_http
+from core.http_client import get_session
 from core.log_utils import get_logger
 from core.normalize import force_https
 from core.parser.youtube import youtube_oembed_title, youtube_watch_to_embed
@@ -15,6 +17,7 @@ from core.status import (
     check_strapi_status,
     log_strapi_status,
 )
+from core.trace import span
 from requests.exceptions import ConnectionError, ConnectTimeout, ReadTimeout
 
 # Логгер
@@ -99,16 +102,19 @@ def _request_with_retry(
     last_exc = None
     for attempt in range(1, retries + 1):
         try:
-            resp = requests.request(
-                method=method.upper(),
-                url=url,
-                headers=headers or {},
-                json=json_body,
-                params=params,
-                files=files,
-                data=data,
-                timeout=timeout,
-            )
+            with span(
+                "strapi.request", method=method.upper(), url=url, attempt=attempt
+            ):
+                resp = get_session("strapi").request(
+                    method=method.upper(),
+                    url=url,
+                    headers=headers or {},
+                    json=json_body,
+                    params=params,
+                    files=files,
+                    data=data,
+                    timeout=timeout,
+                )
             return resp
         except (ReadTimeout, ConnectTimeout, ConnectionError) as e:
             last_exc = e
@@ -126,6 +132,58 @@ def _request_with_retry(
     raise last_exc if last_exc else RuntimeError("Unknown HTTP error")
 
 
+# Асинхронный вариант _request_with_retry (те же ретраи и backoff)
+async def _request_with_retry_async(
+    method,
+    url,
+    *,
+    headers=None,
+    json_body=None,
+    params=None,
+    files=None,
+    data=None,
+    timeout,
+    retries,
+    backoff,
+):
+    retries = max(1, int(retries))
+    timeout = float(timeout)
+    backoff = float(backoff)
+
+    last_exc = None
+    for attempt in range(1, retries + 1):
+        try:
+            with span(
+                "strapi.request", method=method.upper(), url=url, attempt=attempt
+            ):
+                resp = await get_async_http().request(
+                    method.upper(),
+                    url,
+                    service="strapi",
+                    headers=headers or {},
+                    json=json_body,
+                    params=params,
+                    files=files,
+                    data=data,
+                    timeout=timeout,
+                )
+            return resp
+        except RETRY_ERRORS as e:
+            last_exc = e
+            if attempt >= retries:
+                break
+            sleep_sec = backoff ** (attempt - 1)
+            logger.warning(
+                f"[http-retry] {method} {url} failed: {e!r} (attempt {attempt}/{retries}), sleep {sleep_sec:.2f}s"
+            )
+            await asyncio.sleep(sleep_sec)
+        except Exception as e:
+            # другие ошибки не ретраим
+            last_exc = e
+            break
+    raise last_exc if last_exc else RuntimeError("Unknown HTTP error")
+
+
 # Проверка существования проекта в strapi
 def project_exists(
     api_url_proj, api_token, name, *, http_timeout, http_retries, http_backoff
@@ -567,11 +625,9 @@ def get_or_create_project_category(
         retries=http_retries,
         backoff=http_backoff,
     )
-    if resp.status_code == 200:
-        data = resp.json()
-        items = data.get("data", [])
-        if items:
-            return items[0]["id"]
+    found = _found_category_id(resp)
+    if found:
+        return found
     create_url = api_url_cat
     payload = {"data": {"name": category_name}}
     resp = _request_with_retry(
@@ -583,9 +639,50 @@ def get_or_create_project_category(
         retries=http_retries,
         backoff=http_backoff,
     )
+    return _created_category_id(resp)
+
+
+# Асинхронный вариант get_or_create_project_category
+async def get_or_create_project_category_async(
+    api_url_cat, api_token, category_name, *, http_timeout, http_retries, http_backoff
+):
+    url = f"{api_url_cat}?filters[name][$eq]={category_name}"
+    headers = get_strapi_headers(api_token)
+    resp = await _request_with_retry_async(
+        "GET",
+        url,
+        headers=headers,
+        timeout=http_timeout,
+        retries=http_retries,
+        backoff=http_backoff,
+    )
+    found = _found_category_id(resp)
+    if found:
+        return found
+    payload = {"data": {"name": category_name}}
+    resp = await _request_with_retry_async(
+        "POST",
+        api_url_cat,
+        headers=headers,
+        json_body=payload,
+        timeout=http_timeout,
+        retries=http_retries,
+        backoff=http_backoff,
+    )
+    return _created_category_id(resp)
+
+
+def _found_category_id(resp):
+    if resp.status_code == 200:
+        items = resp.json().get("data", [])
+        if items:
+            return items[0]["id"]
+    return None
+
+
+def _created_category_id(resp):
     if resp.status_code in (200, 201):
-        data = resp.json()
-        return data["data"]["id"]
+        return resp.json()["data"]["id"]
     return None
 
 
@@ -608,6 +705,25 @@ def get_project_category_ids(
     return ids
 
 
+# Асинхронный вариант get_project_category_ids (из event loop партнера)
+async def get_project_category_ids_async(
+    api_url_cat, api_token, category_names, *, http_timeout, http_retries, http_backoff
+):
+    ids = []
+    for cat in category_names:
+        id_ = await get_or_create_project_category_async(
+            api_url_cat,
+            api_token,
+            cat,
+            http_timeout=http_timeout,
+            http_retries=http_retries,
+            http_backoff=http_backoff,
+        )
+        if id_:
+            ids.append(id_)
+    return ids
+
+
 # Синх без вывода в терминал
 def sync_projects(config_path=CONFIG_JSON, only_app=None, quiet: bool = False):
     with open(config_path, "r", encoding="utf-8") as f:
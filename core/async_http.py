@@ -0,0 +1,190 @@
+import asyncio
+import weakref
+from urllib.parse import urlparse
+
+from requests.exceptions import ConnectionError, ConnectTimeout, ReadTimeout
+
+from core.http_client import (
+    CHUNK_SIZE,
+    HTML_TYPES,
+    MAX_BODY_BYTES,
+    CappedBody,
+    get_session,
+    is_text_response,
+    read_body,
+)
+from core.log_utils import get_logger
+from core.settings import get_http_ua, get_settings
+
+try:
+    import httpx
+except ImportError:  # без httpx запросы идут через пул потоков и сессии requests
+    httpx = None
+
+# Сетевые ошибки, после которых запрос имеет смысл повторить (для обоих режимов)
+RETRY_ERRORS = (asyncio.TimeoutError, ReadTimeout, ConnectTimeout, ConnectionError)
+if httpx is not None:
+    RETRY_ERRORS += (httpx.TimeoutException, httpx.NetworkError)
+
+# Логгер
+logger = get_logger("http")
+
+# Настройки секции "async_http"
+_a_cfg = get_settings().get("async_http") or {}
+
+# Общий потолок одновременных запросов event loop'а
+_MAX_CONNECTIONS: int = max(1, int(_a_cfg.get("max_connections", 100)))
+
+# Одновременных запросов на один хост (вежливость + лимиты API)
+_PER_HOST: int = max(1, int(_a_cfg.get("per_host", 6)))
+
+# Общий таймаут запроса по умолчанию (сек), включая ожидание ответа целиком
+_TIMEOUT_SEC: float = float(
+    _a_cfg.get("timeout_sec", (get_settings().get("http") or {}).get("timeout_sec", 30))
+)
+
+
+# Асинхронный HTTP для одного event loop: семафоры на хост и общий, таймаут на
+# весь запрос, отмена через cancel() задачи. Ответ - httpx.Response или
+# requests.Response (status_code, headers, text, content, json())
+class AsyncHttp:
+    def __init__(
+        self, max_connections=_MAX_CONNECTIONS, per_host=_PER_HOST, timeout=_TIMEOUT_SEC
+    ):
+        self.per_host = int(per_host)
+        self.timeout = float(timeout)
+        self._global = asyncio.Semaphore(int(max_connections))
+        self._hosts = {}
+        self._client = None
+        if httpx is not None:
+            self._client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=int(max_connections),
+                    max_keepalive_connections=int(max_connections),
+                ),
+                timeout=self.timeout,
+                headers={"User-Agent": get_http_ua()},
+            )
+
+    def _host_slot(self, url):
+        host = (urlparse(url).hostname or "").lower()
+        sem = self._hosts.get(host)
+        if sem is None:
+            sem = self._hosts[host] = asyncio.Semaphore(self.per_host)
+        return sem
+
+    # Аргументы как у requests (params, headers, json, data, files, cookies,
+    # allow_redirects); service - сессия requests для режима без httpx
+    async def request(self, method, url, *, service="default", timeout=None, **kwargs):
+        timeout = float(timeout or self.timeout)
+        allow_redirects = kwargs.pop("allow_redirects", True)
+        async with self._global, self._host_slot(url):
+            if self._client is not None:
+                call = self._client.request(
+                    method,
+                    url,
+                    timeout=timeout,
+                    follow_redirects=allow_redirects,
+                    **kwargs,
+                )
+            else:
+                call = asyncio.to_thread(
+                    get_session(service).request,
+                    method,
+                    url,
+                    timeout=timeout,
+                    allow_redirects=allow_redirects,
+                    **kwargs,
+                )
+            return await asyncio.wait_for(call, timeout)
+
+    # GET с телом потоком, как core.http_client.read_body: тип проверяется
+    # до чтения, тело - не больше max_bytes и до маркера stop_at.
+    # Возвращает (ответ, CappedBody или None для нетекстового типа)
+    async def get_body(
+        self,
+        url,
+        *,
+        service="default",
+        timeout=None,
+        max_bytes=MAX_BODY_BYTES,
+        stop_at=(),
+        types=HTML_TYPES,
+        **kwargs,
+    ):
+        timeout = float(timeout or self.timeout)
+        allow_redirects = kwargs.pop("allow_redirects", True)
+        async with self._global, self._host_slot(url):
+            if self._client is not None:
+                call = self._stream_capped(
+                    url, timeout, allow_redirects, max_bytes, stop_at, types, kwargs
+                )
+            else:
+
+                def _fetch():
+                    resp = get_session(service).get(
+                        url,
+                        timeout=timeout,
+                        allow_redirects=allow_redirects,
+                        stream=True,
+                        **kwargs,
+                    )
+                    return resp, read_body(resp, max_bytes, stop_at, types)
+
+                call = asyncio.to_thread(_fetch)
+            return await asyncio.wait_for(call, timeout)
+
+    async def _stream_capped(
+        self, url, timeout, allow_redirects, max_bytes, stop_at, types, kwargs
+    ):
+        request = self._client.build_request("GET", url, timeout=timeout, **kwargs)
+        resp = await self._client.send(
+            request, stream=True, follow_redirects=allow_redirects
+        )
+        try:
+            if not is_text_response(resp, types):
+                return resp, None
+            body = CappedBody(max_bytes, stop_at)
+            async for chunk in resp.aiter_bytes(CHUNK_SIZE):
+                if chunk and body.feed(chunk):
+                    break
+            return resp, body
+        finally:
+            await resp.aclose()
+
+    # То же текстом: (ответ, текст или None для нетекстового типа)
+    async def get_capped(self, url, **kwargs):
+        resp, body = await self.get_body(url, **kwargs)
+        return resp, None if body is None else body.text(resp.url, resp.encoding)
+
+    async def get(self, url, **kwargs):
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url, **kwargs):
+        return await self.request("POST", url, **kwargs)
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+
+
+# Движок на каждый event loop (asyncio.run в воркере создает свой loop)
+_ENGINES = weakref.WeakKeyDictionary()
+
+
+def get_async_http() -> AsyncHttp:
+    loop = asyncio.get_running_loop()
+    engine = _ENGINES.get(loop)
+    if engine is None:
+        engine = _ENGINES[loop] = AsyncHttp()
+    return engine
+
+
+# Закрыть движок текущего loop'а (в конце корутины, запущенной через asyncio.run)
+async def aclose_async_http():
+    engine = _ENGINES.pop(asyncio.get_running_loop(), None)
+    if engine is not None:
+        await engine.aclose()
+
+
+__all__ = ["AsyncHttp", "RETRY_ERRORS", "aclose_async_http", "get_async_http"]
@@ -0,0 +1,202 @@
+import http.cookiejar
+import os
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from core.log_utils import get_logger
+from core.settings import get_http_ua, get_settings
+
+# Логгер
+logger = get_logger("http")
+
+# Настройки секции "http" (там же UA)
+_http_cfg = get_settings().get("http") or {}
+
+# Соединений keep-alive на хост в пуле сессии (потоки executor'ов делят пул)
+_POOL_SIZE: int = max(1, int(_http_cfg.get("pool_size", 16)))
+
+# Таймаут по умолчанию, если вызывающий его не передал (сек)
+_TIMEOUT_SEC: float = float(_http_cfg.get("timeout_sec", 30))
+
+# Потолок тела ответа при потоковом чтении: 50 МБ страницы или бинарник
+# не буферизуются целиком
+MAX_BODY_BYTES: int = int(float(_http_cfg.get("max_body_mb", 8)) * 1024 * 1024)
+
+# Маркеры, после которых HTML для разбора ссылок дочитывать не нужно
+STOP_AT: tuple = tuple(
+    m.encode().lower() for m in _http_cfg.get("stop_at", ["</body>"]) if m
+)
+
+# Типы тела, которые читаем как HTML; пустой Content-Type - тоже читаем
+HTML_TYPES = (
+    "text/html",
+    "application/xhtml+xml",
+    "text/plain",
+    "text/xml",
+    "application/xml",
+)
+
+# Размер куска при потоковом чтении
+CHUNK_SIZE = 64 * 1024
+
+# Сколько еще дочитываем после маркера stop_at: обычно там только скрипты и
+# </html>, и поток кончается раньше - тогда тело полное
+STOP_TAIL = CHUNK_SIZE
+
+
+# Адаптер с таймаутом по умолчанию: у requests.Session своего нет
+class _TimeoutAdapter(HTTPAdapter):
+    def __init__(self, timeout, **kwargs):
+        self.timeout = timeout
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = self.timeout
+        return super().send(request, **kwargs)
+
+
+# Сессия сервиса: пул соединений с keep-alive, UA и таймаут по умолчанию.
+# Куки не копятся - каждый запрос несет свои (как у модульного requests.get)
+def _new_session():
+    session = requests.Session()
+    session.cookies.set_policy(http.cookiejar.DefaultCookiePolicy(allowed_domains=[]))
+    adapter = _TimeoutAdapter(
+        _TIMEOUT_SEC, pool_connections=_POOL_SIZE, pool_maxsize=_POOL_SIZE
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers["User-Agent"] = get_http_ua()
+    return session
+
+
+# Content-Type ответа подходит для чтения как текст (проверка до чтения тела)
+def is_text_response(resp, types=HTML_TYPES) -> bool:
+    ct = (resp.headers.get("Content-Type") or "").split(";", 1)[0].strip().lower()
+    if not ct or ct in types:
+        return True
+    logger.info("Пропуск тела %s: Content-Type %s", resp.url, ct)
+    return False
+
+
+# Накопитель тела: не больше max_bytes и до первого маркера stop_at
+# (без учета регистра, маркер может прийти на стыке кусков) плюс STOP_TAIL.
+# partial - чтение оборвано до конца потока, тело неполное
+class CappedBody:
+    def __init__(self, max_bytes=MAX_BODY_BYTES, stop_at=()):
+        self.max_bytes = int(max_bytes)
+        self.stop_at = tuple(m.lower() for m in stop_at)
+        self.size = 0
+        self.truncated = False
+        self.stopped = False
+        self._chunks = []
+        self._tail = b""
+        self._keep = max((len(m) for m in self.stop_at), default=1) - 1
+        self._marker_at = None
+
+    @property
+    def partial(self) -> bool:
+        return self.truncated or self.stopped
+
+    # Добавить кусок; True - дальше читать не нужно
+    def feed(self, chunk: bytes) -> bool:
+        if self.size + len(chunk) > self.max_bytes:
+            chunk = chunk[: self.max_bytes - self.size]
+            self.truncated = True
+        self._chunks.append(chunk)
+        self.size += len(chunk)
+        if self._marker_at is not None:
+            self.stopped = self.size - self._marker_at >= STOP_TAIL
+        elif self.stop_at:
+            window = (self._tail + chunk).lower()
+            if any(m in window for m in self.stop_at):
+                self._marker_at = self.size
+            self._tail = window[-self._keep :] if self._keep else b""
+        return self.partial
+
+    # Текст тела; обрезка по лимиту - в лог
+    def text(self, url, encoding=None) -> str:
+        if self.truncated:
+            logger.warning("Тело %s обрезано на %d байт", url, self.size)
+        body = b"".join(self._chunks)
+        try:
+            return body.decode(encoding or "utf-8", errors="replace")
+        except LookupError:
+            return body.decode("utf-8", errors="replace")
+
+
+# Тело ответа requests (stream=True) в пределах лимита; None - тип
+# не текстовый, тело не читалось. Соединение недочитанного ответа
+# закрывается, а не возвращается в пул
+def read_body(resp, max_bytes=MAX_BODY_BYTES, stop_at=(), types=HTML_TYPES):
+    if not is_text_response(resp, types):
+        resp.close()
+        return None
+    body = CappedBody(max_bytes, stop_at)
+    try:
+        for chunk in resp.iter_content(CHUNK_SIZE):
+            if chunk and body.feed(chunk):
+                break
+    finally:
+        resp.close()
+    return body
+
+
+# То же текстом (None - тип не текстовый)
+def read_capped(resp, max_bytes=MAX_BODY_BYTES, stop_at=(), types=HTML_TYPES):
+    body = read_body(resp, max_bytes, stop_at, types)
+    return None if body is None else body.text(resp.url, resp.encoding)
+
+
+# Сессии текущего процесса по сервисам (после fork соединения родителя не берем)
+_SESSIONS = {}
+_SESSIONS_PID = None
+_SESSIONS_LOCK = threading.Lock()
+
+
+# Общая сессия сервиса ("web", "strapi", "coingecko", "ai", ...)
+def get_session(service="default") -> requests.Session:
+    global _SESSIONS, _SESSIONS_PID
+    with _SESSIONS_LOCK:
+        if _SESSIONS_PID != os.getpid():
+            _SESSIONS = {}
+            _SESSIONS_PID = os.getpid()
+        session = _SESSIONS.get(service)
+        if session is None:
+            session = _SESSIONS[service] = _new_session()
+        return session
+
+
+def close_sessions():
+    with _SESSIONS_LOCK:
+        if _SESSIONS_PID == os.getpid():
+            for session in _SESSIONS.values():
+                session.close()
+        _SESSIONS.clear()
+
+
+# После fork блокировка могла остаться захваченной потоком родителя
+def _reinit_after_fork():
+    global _SESSIONS_LOCK
+    _SESSIONS_LOCK = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reinit_after_fork)
+
+
+__all__ = [
+    "CHUNK_SIZE",
+    "CappedBody",
+    "HTML_TYPES",
+    "MAX_BODY_BYTES",
+    "STOP_AT",
+    "STOP_TAIL",
+    "close_sessions",
+    "get_session",
+    "is_text_response",
+    "read_body",
+    "read_capped",
+]
@@ -0,0 +1,173 @@
+import json
+import os
+import time
+import uuid
+
+from core.log_utils import get_logger
+from core.paths import JOURNAL_JSONL
+
+# Логгер
+logger = get_logger("orchestrator")
+
+# Этапы партнера в журнале прогона
+COLLECTED = "collected"
+AI_DONE = "ai_done"
+MAIN_JSON = "main_json"
+PUBLISHED = "published"
+LOGO_UPLOADED = "logo_uploaded"
+
+# Служебные события прогона
+RUN_START = "run_start"
+RUN_END = "run_end"
+
+# Ротация журнала при старте нового прогона (байт)
+JOURNAL_ROTATE_BYTES = 10 * 1024 * 1024
+
+# Файлы-чекпоинты этапов в папке партнера (удаляются после записи main.json)
+COLLECTED_CHECKPOINT = "collected.checkpoint.json"
+AI_CHECKPOINT = "ai.checkpoint.json"
+
+
+# Дописать одну запись (O_APPEND + fsync: строка либо целиком есть, либо ее нет)
+def _append(record, path=JOURNAL_JSONL):
+    line = json.dumps(record, ensure_ascii=False) + "\n"
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd = os.open(path, os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            # хвост оборван падением - начинаем с новой строки
+            size = os.fstat(fd).st_size
+            if size and os.pread(fd, 1, size - 1) != b"\n":
+                line = "\n" + line
+            os.write(fd, line.encode("utf-8"))
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+    except Exception as e:
+        logger.warning("journal: не удалось записать %s: %s", record.get("event"), e)
+
+
+# Чтение журнала (битая последняя строка после падения пропускается)
+def _read(path=JOURNAL_JSONL):
+    records = []
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    continue
+    except FileNotFoundError:
+        pass
+    return records
+
+
+# Отметка этапа партнера
+def record_stage(journal_info, stage, **extra):
+    if not journal_info:
+        return
+    _append(
+        {
+            "event": stage,
+            "run_id": journal_info["run_id"],
+            "key": journal_info["key"],
+            "ts": time.time(),
+            **extra,
+        }
+    )
+
+
+# Последний незавершенный прогон: (run_id, {key: {stage: record}}) или (None, {})
+def find_interrupted_run(path=JOURNAL_JSONL):
+    records = _read(path)
+    run_id = None
+    for rec in records:
+        if rec.get("event") == RUN_START:
+            run_id = rec.get("run_id")
+        elif rec.get("event") == RUN_END and rec.get("run_id") == run_id:
+            run_id = None
+    if not run_id:
+        return None, {}
+
+    progress = {}
+    for rec in records:
+        if rec.get("run_id") != run_id or not rec.get("key"):
+            continue
+        progress.setdefault(rec["key"], {})[rec["event"]] = rec
+    return run_id, progress
+
+
+# Старт прогона: новый run_id или продолжение прерванного (resume=True)
+def open_run(resume=False, path=JOURNAL_JSONL):
+    if resume:
+        run_id, progress = find_interrupted_run(path)
+        if run_id:
+            logger.info(
+                "journal: продолжаем прогон %s (%d партнеров с прогрессом)",
+                run_id,
+                len(progress),
+            )
+            _append({"event": "run_resume", "run_id": run_id, "ts": time.time()}, path)
+            return run_id, progress
+        logger.info("journal: незавершенных прогонов нет, начинаем новый")
+
+    try:
+        if os.path.getsize(path) > JOURNAL_ROTATE_BYTES:
+            os.replace(path, path + ".1")
+    except OSError:
+        pass
+
+    run_id = time.strftime("%Y%m%d-%H%M%S-") + uuid.uuid4().hex[:6]
+    _append({"event": RUN_START, "run_id": run_id, "ts": time.time()}, path)
+    return run_id, {}
+
+
+# Штатное завершение прогона (после него resume уже нечего продолжать)
+def close_run(run_id, path=JOURNAL_JSONL):
+    _append({"event": RUN_END, "run_id": run_id, "ts": time.time()}, path)
+
+
+# Чекпоинт этапа в папке партнера (атомарная замена)
+def save_checkpoint(storage_path, name, data):
+    path = os.path.join(storage_path, name)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+    except Exception as e:
+        logger.warning("journal: чекпоинт %s не сохранен: %s", path, e)
+
+
+def load_checkpoint(storage_path, name):
+    try:
+        with open(os.path.join(storage_path, name), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception:
+        return None
+
+
+def drop_checkpoints(storage_path):
+    for name in (COLLECTED_CHECKPOINT, AI_CHECKPOINT):
+        try:
+            os.remove(os.path.join(storage_path, name))
+        except OSError:
+            pass
+
+
+__all__ = [
+    "AI_CHECKPOINT",
+    "AI_DONE",
+    "COLLECTED",
+    "COLLECTED_CHECKPOINT",
+    "LOGO_UPLOADED",
+    "MAIN_JSON",
+    "PUBLISHED",
+    "close_run",
+    "drop_checkpoints",
+    "find_interrupted_run",
+    "load_checkpoint",
+    "open_run",
+    "record_stage",
+    "save_checkpoint",
+]
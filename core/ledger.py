@@ -0,0 +1,145 @@
+import fcntl
+import hashlib
+import json
+import os
+import re
+import time
+from contextlib import contextmanager
+
+from core.log_utils import get_logger
+from core.paths import LEDGER_JSON
+
+# Логгер
+logger = get_logger("orchestrator")
+
+# Результат проверки свежести партнера
+FRESH = "fresh"
+STALE_SOCIALS = "socials"
+STALE_ALL = "all"
+
+_AGE_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+# Ключ партнера в журнале свежести (контент ИИ зависит от приложения)
+def partner_key(app_name, url):
+    return f"{app_name}|{url}"
+
+
+# Короткий стабильный хэш входных данных
+def inputs_hash(*parts):
+    raw = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16]
+
+
+# Возраст "90m" / "12h" / "7d" / "3600s" / число (часы) -> секунды; пусто/0 -> None
+def parse_age(value):
+    if value in (None, "", 0, "0"):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value) * 3600
+    m = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([smhd]?)\s*", str(value).lower())
+    if not m:
+        raise ValueError(f"Некорректный возраст: {value!r} (пример: 90m, 12h, 7d)")
+    return float(m.group(1)) * _AGE_UNITS[m.group(2) or "h"]
+
+
+# Эксклюзивная блокировка журнала: пишут и воркеры, и потоки публикации
+@contextmanager
+def _locked(path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + ".lock", "a") as lockf:
+        fcntl.flock(lockf, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lockf, fcntl.LOCK_UN)
+
+
+def _read(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return data if isinstance(data, dict) else {}
+    except FileNotFoundError:
+        return {}
+    except Exception as e:
+        logger.warning("ledger: не удалось прочитать %s: %s", path, e)
+        return {}
+
+
+# Загрузка журнала целиком
+def load_ledger(path=LEDGER_JSON):
+    with _locked(path):
+        return _read(path)
+
+
+# Обновление записи партнера (read-modify-write под блокировкой, атомарная замена)
+def update_entry(key, path=LEDGER_JSON, **fields):
+    modify_entry(key, lambda entry: {**entry, **fields}, path=path)
+
+
+# Слияние записи под одной блокировкой: merge(текущая запись) -> новая запись
+# или None (писать нечего). Возвращает запись, которая лежит в журнале
+def modify_entry(key, merge, path=LEDGER_JSON):
+    try:
+        with _locked(path):
+            data = _read(path)
+            entry = merge(dict(data.get(key) or {}))
+            if entry is None:
+                return data.get(key) or {}
+            data[key] = entry
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, path)
+            return entry
+    except Exception as e:
+        logger.warning("ledger: не удалось обновить %s: %s", key, e)
+        return None
+
+
+# Что нужно перезапускать по партнеру: ничего / только сбор / все вместе с ИИ
+def classify(
+    entry,
+    socials_hash,
+    ai_hash,
+    socials_ttl=None,
+    ai_ttl=None,
+    ai_active=True,
+    need_publish=False,
+    now=None,
+):
+    now = now or time.time()
+    collected_at = (entry or {}).get("collected_at")
+    if not collected_at:
+        return STALE_ALL
+
+    if ai_active:
+        ai_at = entry.get("ai_at")
+        if not ai_at or entry.get("ai_hash") != ai_hash:
+            return STALE_ALL
+        if ai_ttl and now - ai_at >= ai_ttl:
+            return STALE_ALL
+
+    if entry.get("socials_hash") != socials_hash:
+        return STALE_SOCIALS
+    if socials_ttl and now - collected_at >= socials_ttl:
+        return STALE_SOCIALS
+    # прошлый прогон собрал, но не опубликовал - догоняем публикацию
+    if need_publish and (entry.get("published_at") or 0) < collected_at:
+        return STALE_SOCIALS
+    return FRESH
+
+
+__all__ = [
+    "FRESH",
+    "STALE_ALL",
+    "STALE_SOCIALS",
+    "classify",
+    "inputs_hash",
+    "load_ledger",
+    "modify_entry",
+    "parse_age",
+    "partner_key",
+    "update_entry",
+]
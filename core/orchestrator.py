@@ -1,4 +1,6 @@
+import argparse
 import asyncio
+import functools
 import json
 import multiprocessing as mp
 import os
@@ -12,21 +14,61 @@ from core.api.ai import (
     ai_generate_short_desc_with_retries,
     load_ai_config,
     load_prompts,
+    set_ai_gate,
 )
 from core.api.strapi import (
-    get_project_category_ids,
+    get_project_category_ids_async,
     try_upload_logo,
 )
-from core.collector import collect_main_data
+from core.async_http import aclose_async_http
+from core.collector import collect_main_data_async
+from core.journal import (
+    AI_CHECKPOINT,
+    AI_DONE,
+    COLLECTED,
+    COLLECTED_CHECKPOINT,
+    LOGO_UPLOADED,
+    MAIN_JSON,
+    PUBLISHED,
+    close_run,
+    drop_checkpoints,
+    load_checkpoint,
+    open_run,
+    record_stage,
+    save_checkpoint,
+)
+from core.ledger import (
+    FRESH,
+    STALE_SOCIALS,
+    classify,
+    inputs_hash,
+    load_ledger,
+    parse_age,
+    partner_key,
+    update_entry,
+)
 from core.log_utils import get_logger
 from core.normalize import brand_from_url
+from core.parser.browser_client import stop_service
+from core.partner_cache import (
+    REVIEW_JSON,
+    load_shared_collected,
+    partner_url_key,
+    prune_shared_cache,
+    save_shared_collected,
+    shared_partner_dir,
+)
 from core.paths import (
     CONFIG_DIR,
     CONFIG_JSON,
     MAIN_TEMPLATE,
+    QUEUE_DB,
     STORAGE_APPS_DIR,
 )
+from core.pipeline import AiGate, PublishStage, StageStats, format_stage_line
+from core.run_report import RunReport
 from core.seo_utils import build_seo_section
+from core.shard import merge_shards, owns, parse_shard
 from core.status import (
     ADD,
     ERROR,
@@ -35,6 +77,22 @@ from core.status import (
     check_mainjson_status,
     log_mainjson_status,
 )
+from core.timing import Timings, cache_event, reset_timings, stage, timings_snapshot
+from core.trace import (
+    TRACE_JSON,
+    enable_tracing,
+    set_trace_context,
+    span,
+    write_chrome_trace,
+)
+from core.work_queue import (
+    FAILED,
+    STAGE_PARTNER,
+    STAGE_PUBLISH,
+    WorkQueue,
+    worker_id,
+)
+from core.workers import ForkPerPartnerRunner, WarmWorkerPool
 
 # Логгеры
 logger = get_logger("orchestrator")
@@ -46,6 +104,9 @@ STORAGE_DIR = STORAGE_APPS_DIR
 
 spinner_frames = ["/", "-", "\\", "|"]
 
+# Общая блокировка вывода: спиннер и финальные строки партнеров не перемешиваются
+_PRINT_LOCK = threading.Lock()
+
 
 # Шаблон main.json
 def load_main_template():
@@ -69,62 +130,58 @@ def save_main_json(storage_path, data):
     return json_path
 
 
-# Анимация спиннера для отображения статуса в терминале
+# Анимация спиннера для отображения статуса в терминале (text - строка или callable)
 def spinner_task(text, stop_event):
     if os.environ.get("DISABLE_CHILD_SPINNER") == "1":
         return
     idx = 0
     while not stop_event.is_set():
         spin = spinner_frames[idx % len(spinner_frames)]
-        print(f"\r[{spin}] {text} ", end="", flush=True)
+        label = text() if callable(text) else text
+        with _PRINT_LOCK:
+            print(f"\r\033[K[{spin}] {label} ", end="", flush=True)
         idx += 1
         time.sleep(0.13)
 
 
-# Воркер для процесса
-def _partner_worker(
-    queue,
-    app_name,
-    domain,
-    url,
-    main_template,
-    prompts,
-    ai_cfg,
-    allowed_categories,
-    strapi_sync,
-    api_url_proj,
-    api_url_cat,
-    api_token,
-    ai_active,
-    http_timeout,
-    http_retries,
-    http_backoff,
-):
-    # в дочернем процессе свой executor и свой event loop
-    os.environ["DISABLE_CHILD_SPINNER"] = "1"
+# Обработка одного задания-партнера в воркере (свой executor и свой event loop)
+# Возвращает (status, тайминги этапов партнера). keep_services - теплый воркер:
+# сервис браузера живет до выхода воркера; иначе процесс на одного партнера
+# закрывает его сам (mp-воркер выходит через os._exit, atexit не сработает)
+def _run_partner_job(job, run_cfg, keep_services=False):
+    # LLM-запросы всех воркеров идут через общий ограничитель стадии AI
+    set_ai_gate(run_cfg.get("ai_gate"))
+    reset_timings()
+    enable_tracing(run_cfg.get("trace_dir"))
+    set_trace_context("worker", app=job["app_name"], partner=job["url"])
     executor = ThreadPoolExecutor(max_workers=8)
     try:
-        status = asyncio.run(
-            process_partner(
-                app_name,
-                domain,
-                url,
-                main_template,
-                prompts,
-                ai_cfg,
-                executor,
-                allowed_categories,
-                strapi_sync=strapi_sync,
-                api_url_proj=api_url_proj,
-                api_url_cat=api_url_cat,
-                api_token=api_token,
-                ai_active=ai_active,
-                spinner_event=None,
-                http_timeout=http_timeout,
-                http_retries=http_retries,
-                http_backoff=http_backoff,
+        with span("partner"):
+            status = asyncio.run(
+                _process_partner_in_loop(
+                    job["app_name"],
+                    job["domain"],
+                    job["url"],
+                    run_cfg["main_template"],
+                    run_cfg["prompts"],
+                    run_cfg["ai_cfg"],
+                    executor,
+                    job["app_categories"],
+                    strapi_sync=run_cfg["strapi_sync"],
+                    api_url_proj=job["api_url_proj"],
+                    api_url_cat=job["api_url_cat"],
+                    api_token=job["api_token"],
+                    ai_active=run_cfg["ai_active"],
+                    spinner_event=None,
+                    http_timeout=run_cfg["http_timeout"],
+                    http_retries=run_cfg["http_retries"],
+                    http_backoff=run_cfg["http_backoff"],
+                    reuse_ai=job.get("reuse_ai", False),
+                    ledger_info=job.get("ledger"),
+                    journal_info=job.get("journal"),
+                    shared_dir=job.get("shared_dir"),
+                )
             )
-        )
     except Exception:
         status = ERROR
     finally:
@@ -132,11 +189,18 @@ def _partner_worker(
             executor.shutdown(wait=False, cancel_futures=True)
         except TypeError:
             executor.shutdown(wait=False)
-    # отдаем статус родителю
+        if not keep_services:
+            stop_service()
+    return status, timings_snapshot()
+
+
+# Партнер в своем event loop (asyncio.run в воркере): движок async_http
+# этого loop'а закрывается вместе с ним
+async def _process_partner_in_loop(*args, **kwargs):
     try:
-        queue.put(status)
-    except Exception:
-        pass
+        return await process_partner(*args, **kwargs)
+    finally:
+        await aclose_async_http()
 
 
 # Асинх обработка одного партнера
@@ -158,6 +222,10 @@ async def process_partner(
     http_timeout=None,
     http_retries=None,
     http_backoff=None,
+    reuse_ai=False,
+    ledger_info=None,
+    journal_info=None,
+    shared_dir=None,
 ):
     spinner_text = f"{app_name} - {url}"
 
@@ -184,12 +252,48 @@ async def process_partner(
                 f"ИИ-генерация отключена (ai_active=False) - {app_name} - {url}"
             )
 
+        # resume: этапы, завершенные в прерванном прогоне, берем из чекпоинтов
+        done_stages = (journal_info or {}).get("done") or []
+        collected = None
+        if COLLECTED in done_stages:
+            collected = load_checkpoint(storage_path, COLLECTED_CHECKPOINT)
+        reused = None
+        if ai_active and AI_DONE in done_stages:
+            reused = load_checkpoint(storage_path, AI_CHECKPOINT)
+        if collected is not None or reused is not None:
+            logger.info(f"[resume] чекпоинты {done_stages} - {app_name} - {url}")
+
+        # партнер уже собран другим приложением в этом прогоне
+        if collected is None and shared_dir:
+            collected = load_shared_collected(shared_dir, storage_path)
+            cache_event("shared_collected", collected is not None)
+            if collected is not None:
+                logger.info(f"[shared] сбор переиспользован - {app_name} - {url}")
+
+        # ИИ-контент еще свежий - берем его из прошлого main.json
+        if reused is None and reuse_ai and ai_active:
+            reused = _load_reusable_ai(storage_path)
+            cache_event("ai_reuse", reused is not None)
+            if reused is not None:
+                logger.info(f"ИИ-контент свежий, переиспользуем - {app_name} - {url}")
+
         loop = asyncio.get_event_loop()
 
         # сбор соцлинков/основных данных (collector)
-        socials_future = loop.run_in_executor(
-            executor, collect_main_data, url, main_template, storage_path
-        )
+        if collected is not None:
+            socials_future = loop.create_future()
+            socials_future.set_result(collected)
+        else:
+            socials_future = asyncio.create_task(
+                _collect_with_checkpoint(
+                    url,
+                    main_template,
+                    storage_path,
+                    journal_info,
+                    shared_dir,
+                    executor,
+                )
+            )
 
         # заготовка данных для ИИ (упрощённый main_data: только name + website)
         main_data_for_ai = dict(main_template)
@@ -198,10 +302,18 @@ async def process_partner(
         main_data_for_ai["socialLinks"]["websiteURL"] = url
 
         # контент по ИИ запускаем параллельно с collect_main_data
-        if ai_active:
+        if ai_active and reused is None:
             ai_content_future = asyncio.create_task(
                 ai_generate_content_markdown(
-                    main_data_for_ai, app_name, domain, prompts, ai_cfg, executor
+                    main_data_for_ai,
+                    app_name,
+                    domain,
+                    prompts,
+                    ai_cfg,
+                    executor,
+                    review_cache_path=(
+                        os.path.join(shared_dir, REVIEW_JSON) if shared_dir else None
+                    ),
                 )
             )
         else:
@@ -229,7 +341,10 @@ async def process_partner(
         short_desc = ""
         categories = []
 
-        if ai_active and ai_content_future is not None:
+        if reused is not None:
+            content_md = reused["contentMarkdown"]
+            short_desc = reused["shortDescription"]
+        elif ai_active and ai_content_future is not None:
             try:
                 CONTENT_TIMEOUT = int(os.environ.get("CONTENT_TIMEOUT_SEC", "240"))
                 content_md = await asyncio.wait_for(
@@ -269,10 +384,12 @@ async def process_partner(
             main_data["contentMarkdown"] = content_md.strip()
 
         # категории -> id (если strapi_sync и есть доступ к api категорий)
-        if not categories:
+        if reused is not None:
+            main_data["project_categories"] = reused["project_categories"]
+        elif not categories:
             main_data["project_categories"] = []
         elif strapi_sync and api_url_cat and api_token:
-            category_ids = get_project_category_ids(
+            category_ids = await get_project_category_ids_async(
                 api_url_cat,
                 api_token,
                 categories,
@@ -285,13 +402,30 @@ async def process_partner(
             main_data["project_categories"] = categories
 
         # строим seo
-        if main_data.get("shortDescription") or main_data.get("contentMarkdown"):
-            main_data["seo"] = await build_seo_section(
-                main_data, prompts, ai_cfg, executor
-            )
+        if reused is not None and reused["seo"]:
+            main_data["seo"] = reused["seo"]
+        elif main_data.get("shortDescription") or main_data.get("contentMarkdown"):
+            with stage("seo"):
+                main_data["seo"] = await build_seo_section(
+                    main_data, prompts, ai_cfg, executor
+                )
         else:
             main_data["seo"] = {}
 
+        # чекпоинт ИИ-этапа (контент + категории + seo)
+        if journal_info and ai_active and reused is None and content_md:
+            save_checkpoint(
+                storage_path,
+                AI_CHECKPOINT,
+                {
+                    "contentMarkdown": main_data.get("contentMarkdown") or "",
+                    "shortDescription": main_data.get("shortDescription") or "",
+                    "project_categories": main_data.get("project_categories") or [],
+                    "seo": main_data.get("seo") or {},
+                },
+            )
+            record_stage(journal_info, AI_DONE)
+
         main_json_path = os.path.join(storage_path, "main.json")
 
         # проверка и сохранение main.json
@@ -323,6 +457,23 @@ async def process_partner(
                 ERROR, app_name, domain, url, error_msg="Неизвестный статус"
             )
 
+        if status in (ADD, UPDATE, SKIP):
+            record_stage(journal_info, MAIN_JSON, status=status)
+            if journal_info:
+                drop_checkpoints(storage_path)
+
+        # отметка в журнале свежести: сбор прошел, ИИ - если реально генерился
+        if ledger_info and status in (ADD, UPDATE, SKIP):
+            fields = {
+                "collected_at": time.time(),
+                "socials_hash": ledger_info["socials_hash"],
+                "status": status,
+            }
+            if ai_active and reused is None and content_md:
+                fields["ai_at"] = fields["collected_at"]
+                fields["ai_hash"] = ledger_info["ai_hash"]
+            update_entry(ledger_info["key"], **fields)
+
     except Exception as e:
         logger.critical(f"Ошибка обработки {url}: {e}")
         status = ERROR
@@ -335,8 +486,340 @@ async def process_partner(
     return status
 
 
+# Сбор данных + чекпоинт этапа для resume + общий кэш для других приложений
+async def _collect_with_checkpoint(
+    url, main_template, storage_path, journal_info, shared_dir=None, executor=None
+):
+    with stage("collect"):
+        main_data = await collect_main_data_async(
+            url, main_template, storage_path, executor
+        )
+    if journal_info:
+        save_checkpoint(storage_path, COLLECTED_CHECKPOINT, main_data)
+        record_stage(journal_info, COLLECTED)
+    if shared_dir:
+        save_shared_collected(shared_dir, main_data, storage_path)
+    return main_data
+
+
+# ИИ-поля прошлого main.json для переиспользования (None - нечего брать)
+def _load_reusable_ai(storage_path):
+    try:
+        with open(os.path.join(storage_path, "main.json"), "r", encoding="utf-8") as f:
+            old = json.load(f)
+    except Exception:
+        return None
+    if not (old.get("contentMarkdown") or "").strip():
+        return None
+    return {
+        "contentMarkdown": old.get("contentMarkdown") or "",
+        "shortDescription": old.get("shortDescription") or "",
+        "project_categories": old.get("project_categories") or [],
+        "seo": old.get("seo") or {},
+    }
+
+
+# Печать финальной строки статуса поверх спиннера
+def print_status_line(line):
+    with _PRINT_LOCK:
+        print(f"\r\033[K{line}", flush=True)
+
+
+# Раннер воркеров: теплый пул или отдельный процесс на каждого партнера
+def _make_runner(ctx, run_cfg, pool_cfg):
+    size = run_cfg["max_parallel_partners"]
+    partner_timeout = run_cfg["partner_timeout"]
+    # убитый посреди LLM-запроса воркер не должен уносить слот AI-стадии
+    gate = run_cfg.get("ai_gate")
+    on_exit = gate.release_pid if gate is not None else None
+    if pool_cfg.get("enabled", False):
+        # теплый воркер держит сервис браузера между партнерами
+        return WarmWorkerPool(
+            ctx,
+            size,
+            functools.partial(_run_partner_job, run_cfg=run_cfg, keep_services=True),
+            partner_timeout,
+            max_jobs=int(pool_cfg.get("max_jobs_per_worker", 20)),
+            max_rss_mb=float(pool_cfg.get("max_rss_mb", 0)),
+            on_exit=on_exit,
+            on_stop=stop_service,
+        )
+    run_job = functools.partial(_run_partner_job, run_cfg=run_cfg)
+    return ForkPerPartnerRunner(ctx, size, run_job, partner_timeout, on_exit=on_exit)
+
+
+# Срез по всем стадиям: партнеры (collect+AI+SEO в воркере), AI, публикация
+def _stage_snapshots(stages, pending=0):
+    snaps = [stages["partner"].snapshot(depth=pending)]
+    if stages.get("ai") is not None:
+        snaps.append(stages["ai"].snapshot())
+    snaps.append(stages["publish"].snapshot())
+    return snaps
+
+
+# Короткая метка стадий для спиннера
+def _stage_label(stages):
+    parts = []
+    ai = stages.get("ai")
+    if ai is not None:
+        a = ai.snapshot()
+        parts.append(f"ai {a['active']}/{a['workers']} wait {a['queued']}")
+    pub = stages["publish"].snapshot()
+    parts.append(f"publish {pub['active']}/{pub['workers']} q={pub['queued']}")
+    return " | ".join(parts)
+
+
+# Планировщик: держит раннер загруженным до лимита, собирает статусы по мере готовности
+def _run_partner_jobs(runner, jobs, stages, spinner_state=None, stats_log_sec=30):
+    pending = list(jobs)
+    partner_stats = stages["partner"]
+    publish = stages["publish"]
+    next_stats_log = time.time() + stats_log_sec
+
+    while pending or runner.in_flight():
+        # досылаем в публикацию то, что не влезло на прошлом тике
+        publish.flush()
+
+        # добираем слоты до лимита (пока очередь публикации не переполнена)
+        while pending and not publish.saturated():
+            if pending[0].get("publish_only"):
+                # resume: сбор/ИИ уже сделаны, задание сразу в публикацию
+                job = pending.pop(0)
+                publish.put(job, job["publish_only"], 0.0)
+                continue
+            if runner.free_slots() <= 0:
+                break
+            # один и тот же сайт не собираем параллельно - ждем общий кэш
+            busy = {partner_url_key(j["url"]) for j in runner.in_flight()}
+            idx = next(
+                (
+                    i
+                    for i, j in enumerate(pending)
+                    if partner_url_key(j["url"]) not in busy
+                ),
+                None,
+            )
+            if idx is None:
+                break
+            runner.submit(pending.pop(idx))
+            partner_stats.begin()
+        partner_stats.observe_depth(len(pending))
+
+        in_flight = runner.in_flight()
+        if spinner_state is not None and in_flight:
+            job = in_flight[0]
+            if len(in_flight) == 1 and not pending:
+                text = f"{job['app_name']} - {job['url']}"
+            else:
+                text = (
+                    f"{job['app_name']} - {len(in_flight)} in flight, "
+                    f"{len(pending)} queued"
+                )
+            spinner_state["text"] = f"{text} | {_stage_label(stages)}"
+
+        # готовые партнеры уходят в стадию публикации, планировщик не ждет Strapi
+        for job, status_main, elapsed in runner.poll():
+            partner_stats.end(elapsed)
+            publish.put(job, status_main, elapsed)
+
+        if stats_log_sec and time.time() >= next_stats_log:
+            snaps = _stage_snapshots(stages, len(pending))
+            logger.info("[stages] %s", format_stage_line(snaps))
+            next_stats_log = time.time() + stats_log_sec
+
+        if pending or runner.in_flight():
+            time.sleep(0.1)
+
+    # добиваем публикацию партнеров этого приложения
+    while publish.pending():
+        publish.flush()
+        if spinner_state is not None:
+            spinner_state["text"] = f"publishing | {_stage_label(stages)}"
+        time.sleep(0.1)
+
+
+# Финал по партнеру (стадия публикации): строка статуса + публикация в Strapi
+# Возвращает итоговый статус партнера для отчета прогона
+def _finalize_partner(job, status_main, elapsed, run_cfg, timings=None):
+    timings = timings or Timings()
+    app_name = job["app_name"]
+    url = job["url"]
+    elapsed = int(elapsed)
+
+    if status_main is None:
+        print_status_line(f"[error] {app_name} - {url} - timeout!")
+        return "timeout"
+
+    if not run_cfg["strapi_sync"]:
+        extra = " [main.json Error]" if status_main == ERROR else ""
+        print_status_line(f"[{status_main}] {app_name} - {url} - {elapsed} sec{extra}")
+        return status_main
+
+    main_json_path = job["main_json_path"]
+    if not os.path.exists(main_json_path):
+        print_status_line(f"[error] {app_name} - {url} - {elapsed} sec [No main.json]")
+        return ERROR
+
+    with open(main_json_path, "r", encoding="utf-8") as fjson:
+        main_data = json.load(fjson)
+
+    api_url_proj = job["api_url_proj"]
+    api_url_cat = job["api_url_cat"]
+    api_token = job["api_token"]
+    http_timeout = run_cfg["http_timeout"]
+    http_retries = run_cfg["http_retries"]
+    http_backoff = run_cfg["http_backoff"]
+
+    if not (api_url_proj and api_token):
+        print_status_line(f"[error] {app_name} - {url} - {elapsed} sec [No API]")
+        return ERROR
+
+    from core.api.strapi import ERROR as STRAPI_ERROR
+    from core.api.strapi import SKIP as STRAPI_SKIP
+    from core.api.strapi import create_project
+
+    journal_info = job.get("journal")
+    publish_flag = bool(run_cfg["will_publish"])
+    if journal_info and journal_info.get("project_id"):
+        # resume: проект уже опубликован в прерванном прогоне, осталось лого
+        status_strapi, project_id = STRAPI_SKIP, journal_info["project_id"]
+    else:
+        with timings.stage("strapi_create"):
+            status_strapi, project_id = create_project(
+                api_url_proj,
+                api_url_cat,
+                api_token,
+                main_data,
+                app_name=app_name,
+                domain=job["domain"],
+                url=url,
+                publish=publish_flag,
+                http_timeout=http_timeout,
+                http_retries=http_retries,
+                http_backoff=http_backoff,
+            )
+
+    if status_strapi == STRAPI_ERROR:
+        final_status = "error"
+        badges = ["Strapi Create Failed"]
+    elif journal_info and journal_info.get("project_id"):
+        final_status = "skip"
+        badges = ["Resumed"]
+    elif status_strapi == STRAPI_SKIP:
+        final_status = "skip"
+        badges = ["Already exists"]
+    else:
+        # успех (создано/обновлено)
+        final_status = status_strapi
+        badges = ["Published" if publish_flag else "Draft"]
+
+    extra = f" [{' | '.join(badges)}]" if badges else ""
+    print_status_line(f"[{final_status}] {app_name} - {url} - {elapsed} sec{extra}")
+
+    if status_strapi != STRAPI_ERROR and job.get("ledger"):
+        update_entry(job["ledger"]["key"], published_at=time.time())
+
+    if status_strapi != STRAPI_ERROR:
+        record_stage(
+            journal_info,
+            PUBLISHED,
+            project_id=project_id,
+            has_logo=bool(main_data.get("svgLogo")),
+        )
+
+    if project_id and status_strapi != STRAPI_ERROR:
+        with timings.stage("logo_upload"):
+            logo = try_upload_logo(
+                main_data,
+                job["storage_path"],
+                api_url_proj,
+                api_token,
+                project_id,
+                http_timeout=http_timeout,
+                http_retries=http_retries,
+                http_backoff=http_backoff,
+            )
+        if logo:
+            record_stage(journal_info, LOGO_UPLOADED)
+
+    return final_status
+
+
+# Аргументы запуска (start.py пробрасывает sys.argv)
+def parse_run_args(argv=None):
+    parser = argparse.ArgumentParser(prog="start.sh")
+    parser.add_argument(
+        "--only-stale",
+        action="store_true",
+        help="обрабатывать только устаревших партнеров (TTL из freshness)",
+    )
+    parser.add_argument(
+        "--max-age",
+        default=None,
+        help="TTL соцсетей/сбора, напр. 12h или 3d (включает --only-stale)",
+    )
+    parser.add_argument(
+        "--ai-max-age",
+        default=None,
+        help="TTL ИИ-контента, напр. 30d (включает --only-stale)",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="продолжить прерванный прогон из storage/journal.jsonl",
+    )
+    parser.add_argument(
+        "--shard",
+        default=None,
+        help="обрабатывать только свой срез партнеров, i/N (нумерация с 1)",
+    )
+    parser.add_argument(
+        "--queue",
+        action="store_true",
+        help="поставить партнеров в storage/queue.db и разбирать их (work stealing)",
+    )
+    parser.add_argument(
+        "--worker",
+        action="store_true",
+        help="только разбирать задания из очереди (доп. воркер на этой/другой машине)",
+    )
+    parser.add_argument(
+        "--trace",
+        action="store_true",
+        help="записать спаны прогона в storage/runs/{run_id}/trace.json",
+    )
+    parser.add_argument(
+        "--merge",
+        nargs="+",
+        metavar="STORAGE_DIR",
+        default=None,
+        help="слить storage шардов (apps, runs, ledger) в локальный storage",
+    )
+    return parser.parse_args(argv)
+
+
+# Настройки свежести: config.json "freshness" + переопределения из CLI
+def _freshness_settings(central_config, args):
+    cfg = central_config.get("freshness") or {}
+    socials_ttl = parse_age(
+        args.max_age if args.max_age is not None else cfg.get("socials_ttl", "24h")
+    )
+    ai_ttl = parse_age(
+        args.ai_max_age if args.ai_max_age is not None else cfg.get("ai_ttl", "30d")
+    )
+    only_stale = bool(
+        args.only_stale
+        or args.max_age is not None
+        or args.ai_max_age is not None
+        or cfg.get("only_stale", False)
+    )
+    return {"only_stale": only_stale, "socials_ttl": socials_ttl, "ai_ttl": ai_ttl}
+
+
 # Главная оркестрация всего пайплайна
-async def orchestrate_all():
+async def orchestrate_all(args=None):
+    args = args or parse_run_args([])
+
     # глобальный список для fallback
     with open(CENTRAL_CONFIG_PATH, "r", encoding="utf-8") as f:
         central_config = json.load(f)
@@ -348,193 +831,496 @@ async def orchestrate_all():
     strapi_sync = strapi_cfg.get("strapi_sync", central_config.get("strapi_sync", True))
     strapi_publish_cfg = strapi_cfg.get("strapi_publish", True)
 
-    # HTTP из конфига (централизованно)
-    http_timeout = float(strapi_cfg["http_timeout_sec"])
-    http_retries = int(strapi_cfg["http_retries"])
-    http_backoff = float(strapi_cfg["http_backoff"])
-
-    main_template = load_main_template()
-    prompts = load_prompts()
-    ai_cfg = load_ai_config()
-
     from core.api.ai import is_ai_enabled
 
+    ai_cfg = load_ai_config()
     ai_active = is_ai_enabled(ai_cfg)
 
-    will_publish = bool(strapi_publish_cfg and ai_active)
-
-    # таймаут на одного партнера (сек)
-    PARTNER_TIMEOUT = int(central_config.get("partner_timeout_sec", 400))
+    # общие настройки прогона, которые уходят в каждый воркер
+    run_cfg = {
+        "main_template": load_main_template(),
+        "prompts": load_prompts(),
+        "ai_cfg": ai_cfg,
+        "ai_active": ai_active,
+        "strapi_sync": strapi_sync,
+        "will_publish": bool(strapi_publish_cfg and ai_active),
+        # HTTP из конфига (централизованно)
+        "http_timeout": float(strapi_cfg["http_timeout_sec"]),
+        "http_retries": int(strapi_cfg["http_retries"]),
+        "http_backoff": float(strapi_cfg["http_backoff"]),
+        # таймаут на одного партнера (сек)
+        "partner_timeout": int(central_config.get("partner_timeout_sec", 400)),
+        # сколько партнеров обрабатывается одновременно
+        "max_parallel_partners": max(
+            1, int(central_config.get("max_parallel_partners", 1))
+        ),
+    }
 
     try:
         ctx = mp.get_context("fork")
     except ValueError:
         ctx = mp.get_context("spawn")
 
-    for app in central_config["apps"]:
-        if not app.get("enabled", True):
-            continue
+    # стадии пайплайна: у каждой свой лимит воркеров
+    stages_cfg = central_config.get("stages") or {}
+    ai_workers = stages_cfg.get("ai_workers") or run_cfg["max_parallel_partners"]
+    run_cfg["ai_gate"] = AiGate(ctx, int(ai_workers)) if ai_active else None
+    stats_log_sec = float(stages_cfg.get("stats_log_sec", 30))
+
+    # журнал свежести: входные хэши и TTL
+    run_cfg["freshness"] = _freshness_settings(central_config, args)
+    run_cfg["ledger"] = load_ledger()
+    run_cfg["socials_inputs"] = inputs_hash(run_cfg["main_template"])
+    run_cfg["ai_inputs"] = inputs_hash(
+        run_cfg["prompts"],
+        {k: v.get("model") for k, v in (ai_cfg.get("groups") or {}).items()},
+    )
+    if run_cfg["freshness"]["only_stale"]:
+        logger.info("Режим only-stale: %s", run_cfg["freshness"])
+
+    # журнал прогона: новый run_id или продолжение прерванного;
+    # чистый воркер очереди свой прогон не ведет (задания несут run_id постановщика)
+    if args.worker:
+        run_id = time.strftime("worker-%Y%m%d-%H%M%S-") + str(os.getpid())
+        progress = {}
+    else:
+        run_id, progress = open_run(resume=args.resume)
+    run_cfg["journal_run_id"] = run_id
+    run_cfg["journal_progress"] = progress
+    if args.resume and progress:
+        print(f"[resume] run {run_id}: {len(progress)} partners with progress")
+
+    # шард: нода обрабатывает только свой срез партнеров
+    run_cfg["shard"] = parse_shard(args.shard)
+    if run_cfg["shard"]:
+        print(f"[shard] {args.shard}")
+    report = RunReport(run_id, shard=args.shard)
+
+    # трассировка (chrome trace_event): включается до старта воркеров
+    run_cfg["trace_dir"] = None
+    if args.trace or central_config.get("trace", False):
+        run_cfg["trace_dir"] = os.path.join(report.run_dir, "trace")
+        enable_tracing(run_cfg["trace_dir"])
+        set_trace_context("orchestrator")
+
+    # глобальный набор партнеров: общие для нескольких приложений собираем один раз
+    run_cfg["shared_urls"] = set()
+    if not args.worker:
+        prune_shared_cache(run_id)
+        run_cfg["shared_urls"] = _shared_partner_urls(
+            central_config["apps"], run_cfg["shard"]
+        )
 
-        app_name = app["app"]
-        app_categories = app.get("categories") or allowed_categories
+    # очередь заданий (--queue / --worker)
+    work_queue = None
+    if args.queue or args.worker:
+        queue_cfg = central_config.get("work_queue") or {}
+        work_queue = WorkQueue(
+            path=queue_cfg.get("path") or QUEUE_DB,
+            lease_sec=float(queue_cfg.get("lease_sec", 120)),
+            max_attempts=int(queue_cfg.get("max_attempts", 2)),
+            journal_mode=queue_cfg.get("journal_mode", "WAL"),
+        )
 
-        print(f"[app] {app_name} start")
+    # публикация + строка отчета прогона по каждому партнеру
+    def publish_partner(job, status_main, elapsed):
+        # тайминги воркера (сбор/ИИ/SEO) + стадии публикации
+        timings = Timings()
+        timings.merge(job.get("timings"))
+        try:
+            with span("publish", app=job["app_name"], partner=job["url"]):
+                final_status = _finalize_partner(
+                    job, status_main, elapsed, run_cfg, timings
+                )
+        except Exception as e:
+            # партнер не теряется из отчета: ошибка публикации = error
+            logger.error("publish: ошибка %s - %s: %s", job["app_name"], job["url"], e)
+            print_status_line(
+                f"[error] {job['app_name']} - {job['url']} - publish failed"
+            )
+            final_status = ERROR
+        if work_queue is not None and job.get("_qid"):
+            if final_status == ERROR:
+                work_queue.fail(job["_qid"], worker_id(), "publish failed")
+            else:
+                work_queue.complete(job["_qid"], worker_id())
+        report.add_partner(
+            {
+                "app": job["app_name"],
+                "url": job["url"],
+                "domain": job["domain"],
+                "status": status_main or "timeout",
+                "final_status": final_status,
+                "elapsed": round(elapsed, 1),
+                **timings.snapshot(),
+            }
+        )
 
-        app_config_path = os.path.join(APPS_CONFIG_DIR, f"{app_name}.json")
-        if not os.path.exists(app_config_path):
-            logger.warning(f"Config for app {app_name} not found, skipping")
+    stages = {
+        "partner": StageStats("partner", run_cfg["max_parallel_partners"]),
+        "ai": run_cfg["ai_gate"],
+        "publish": PublishStage(
+            publish_partner,
+            workers=int(stages_cfg.get("publish_workers", 2)),
+            queue_size=int(stages_cfg.get("publish_queue_size", 8)),
+        ),
+    }
+
+    # пул теплых воркеров живет весь прогон (через все приложения)
+    runner = _make_runner(ctx, run_cfg, central_config.get("worker_pool") or {})
+    try:
+        if work_queue is not None:
+            if args.queue:
+                # ставим задания всех приложений и сами же их разбираем
+                queue_run_id = run_id
+                enqueued = _enqueue_all(
+                    work_queue, central_config["apps"], allowed_categories, run_cfg
+                )
+                print(f"[queue] {enqueued} jobs enqueued -> {work_queue.path}")
+            else:
+                # доп. воркер разбирает только последний поставленный прогон:
+                # хвосты старых прогонов в той же очереди не трогаем
+                queue_run_id = work_queue.latest_run()
+                if queue_run_id:
+                    print(f"[queue] run {queue_run_id} <- {work_queue.path}")
+                else:
+                    print(f"[queue] nothing queued in {work_queue.path}")
+            if queue_run_id:
+                _run_queue_worker(
+                    work_queue, runner, stages, queue_run_id, stats_log_sec
+                )
+        else:
+            for app in central_config["apps"]:
+                if not app.get("enabled", True):
+                    continue
+                _orchestrate_app(
+                    app, allowed_categories, runner, stages, run_cfg, stats_log_sec
+                )
+    finally:
+        runner.close()
+        stages["publish"].close()
+        if work_queue is not None:
+            work_queue.close()
+
+    # прогон дошел до конца - resume его больше не подхватит
+    if not args.worker:
+        close_run(run_id)
+
+    # итог по стадиям: где было узкое место
+    snaps = _stage_snapshots(stages)
+    summary = format_stage_line(snaps)
+    logger.info("[stages] итог: %s", summary)
+    print_status_line(f"[stages] {summary}")
+    report.write_summary(pipeline=snaps)
+    print_status_line(f"[report] {report.run_dir}")
+    if run_cfg["trace_dir"]:
+        trace_path = os.path.join(report.run_dir, TRACE_JSON)
+        events = write_chrome_trace(run_cfg["trace_dir"], trace_path)
+        print_status_line(f"[trace] {events} events -> {trace_path}")
+
+
+# Партнеры (своего шарда), которые встречаются в нескольких включенных приложениях
+def _shared_partner_urls(apps, shard=None):
+    seen = {}
+    for app in apps:
+        if not app.get("enabled", True):
             continue
+        app_config_path = os.path.join(APPS_CONFIG_DIR, f"{app['app']}.json")
+        try:
+            with open(app_config_path, "r", encoding="utf-8") as f:
+                partners = json.load(f).get("partners") or []
+        except Exception:
+            continue
+        for url in partners:
+            if not owns(url, shard):
+                continue
+            seen.setdefault(partner_url_key(url), set()).add(app["app"])
+
+    shared = {key for key, app_names in seen.items() if len(app_names) > 1}
+    logger.info(
+        "Партнеров всего: %d уникальных, общих для нескольких приложений: %d",
+        len(seen),
+        len(shared),
+    )
+    return shared
+
+
+# Разметка задания по прогрессу прерванного прогона: "done" / "publish" / "run"
+def _resume_job(job, progress, need_publish):
+    published = progress.get(PUBLISHED)
+    if published and (LOGO_UPLOADED in progress or not published.get("has_logo")):
+        return "done"
+    main_json = progress.get(MAIN_JSON)
+    if main_json and not need_publish:
+        return "done"
+    if main_json:
+        # main.json уже записан - сразу в стадию публикации
+        job["publish_only"] = main_json.get("status") or SKIP
+        if published and published.get("project_id"):
+            job["journal"]["project_id"] = published["project_id"]
+        return "publish"
+    job["journal"]["done"] = list(progress)
+    return "run"
+
+
+# Задания по партнерам приложения (шард, resume, свежесть); None - нет конфига
+def _build_app_jobs(app, allowed_categories, run_cfg):
+    app_name = app["app"]
+    app_categories = app.get("categories") or allowed_categories
+
+    app_config_path = os.path.join(APPS_CONFIG_DIR, f"{app_name}.json")
+    if not os.path.exists(app_config_path):
+        logger.warning(f"Config for app {app_name} not found, skipping")
+        return None
+
+    with open(app_config_path, "r", encoding="utf-8") as f:
+        app_config = json.load(f)
+
+    freshness = run_cfg["freshness"]
+    need_publish = bool(
+        run_cfg["strapi_sync"] and app.get("api_url_proj") and app.get("api_token")
+    )
+    ai_hash = inputs_hash(run_cfg["ai_inputs"], app_name, app_categories)
+
+    jobs = []
+    fresh_count = 0
+    resumed_count = 0
+    foreign_count = 0
+    for url in app_config["partners"]:
+        if not owns(url, run_cfg["shard"]):
+            foreign_count += 1
+            continue
+        domain = brand_from_url(url) or "project"
+        storage_path = os.path.join(STORAGE_DIR, app_name, domain)
+        ledger_info = {
+            "key": partner_key(app_name, url),
+            "socials_hash": inputs_hash(run_cfg["socials_inputs"], url),
+            "ai_hash": inputs_hash(ai_hash, url),
+        }
+        job = {
+            "app_name": app_name,
+            "url": url,
+            "domain": domain,
+            "storage_path": storage_path,
+            "main_json_path": os.path.join(storage_path, "main.json"),
+            "app_categories": app_categories,
+            "api_url_proj": app.get("api_url_proj", ""),
+            "api_url_cat": app.get("api_url_cat", ""),
+            "api_token": app.get("api_token", ""),
+            "reuse_ai": False,
+            "ledger": ledger_info,
+            "journal": {"run_id": run_cfg["journal_run_id"], "key": ledger_info["key"]},
+            "shared_dir": (
+                shared_partner_dir(run_cfg["journal_run_id"], url)
+                if partner_url_key(url) in run_cfg["shared_urls"]
+                else None
+            ),
+        }
+
+        # resume: пропускаем законченные этапы прерванного прогона
+        progress = run_cfg["journal_progress"].get(ledger_info["key"])
+        if progress:
+            resume_state = _resume_job(job, progress, need_publish)
+            if resume_state == "done":
+                resumed_count += 1
+                continue
+            if resume_state == "publish":
+                jobs.append(job)
+                continue
 
-        with open(app_config_path, "r", encoding="utf-8") as f:
-            app_config = json.load(f)
-
-        for url in app_config["partners"]:
-            api_url_proj = app.get("api_url_proj", "")
-            api_url_cat = app.get("api_url_cat", "")
-            api_token = app.get("api_token", "")
+        # свежие партнеры пропускаются целиком, у "socials" ИИ-контент берется старый
+        if freshness["only_stale"]:
+            state = classify(
+                run_cfg["ledger"].get(ledger_info["key"]),
+                ledger_info["socials_hash"],
+                ledger_info["ai_hash"],
+                socials_ttl=freshness["socials_ttl"],
+                ai_ttl=freshness["ai_ttl"],
+                ai_active=run_cfg["ai_active"],
+                need_publish=need_publish,
+            )
+            if state == FRESH:
+                fresh_count += 1
+                logger.info(f"[fresh] {app_name} - {url}")
+                continue
+            job["reuse_ai"] = state == STALE_SOCIALS
+
+        jobs.append(job)
+
+    if foreign_count:
+        print(f"[shard] {app_name}: {foreign_count} partners belong to other shards")
+    if fresh_count:
+        print(f"[app] {app_name}: {fresh_count} fresh skipped, {len(jobs)} stale")
+    if resumed_count:
+        print(f"[resume] {app_name}: {resumed_count} already finished")
+    return jobs
+
+
+# Родительский спиннер: одна строка в терминале на все воркеры
+def _start_spinner(text):
+    spinner_state = {"text": text}
+    stop_event = threading.Event()
+    thread = threading.Thread(
+        target=spinner_task,
+        args=(lambda: spinner_state["text"], stop_event),
+    )
+    thread.start()
+    return spinner_state, stop_event, thread
+
+
+# Оркестрация партнеров одного приложения
+def _orchestrate_app(
+    app, allowed_categories, runner, stages, run_cfg, stats_log_sec=30
+):
+    app_name = app["app"]
+    print(f"[app] {app_name} start")
 
-            domain = brand_from_url(url) or "project"
-            storage_path = os.path.join(STORAGE_DIR, app_name, domain)
-            main_json_path = os.path.join(storage_path, "main.json")
+    jobs = _build_app_jobs(app, allowed_categories, run_cfg)
+    if jobs is None:
+        return
 
-            start_time = time.time()
+    # родительский спиннер (одна строка в терминале на все воркеры приложения)
+    spinner_state, ext_stop_event, ext_spinner_thread = _start_spinner(app_name)
 
-            # родительский спиннер (одна строка в терминале)
-            spinner_text = f"{app_name} - {url}"
-            ext_stop_event = threading.Event()
-            ext_spinner_thread = threading.Thread(
-                target=spinner_task, args=(spinner_text, ext_stop_event)
-            )
-            ext_spinner_thread.start()
-
-            # дочерний процесс + очередь для возврата статуса
-            q = ctx.Queue()
-            p = ctx.Process(
-                target=_partner_worker,
-                args=(
-                    q,
-                    app_name,
-                    domain,
-                    url,
-                    main_template,
-                    prompts,
-                    ai_cfg,
-                    app_categories,
-                    strapi_sync,
-                    api_url_proj,
-                    api_url_cat,
-                    api_token,
-                    ai_active,
-                    http_timeout,
-                    http_retries,
-                    http_backoff,
-                ),
+    try:
+        with span("app", app=app_name, partners=len(jobs)):
+            _run_partner_jobs(
+                runner,
+                jobs,
+                stages,
+                spinner_state=spinner_state,
+                stats_log_sec=stats_log_sec,
             )
-            p.start()
-            # ждем завершения с таймаутом
-            p.join(PARTNER_TIMEOUT)
-            if p.is_alive():
-                # таймаут: останавливаем красивый спиннер, печатаем error, жестко убиваем воркер
-                ext_stop_event.set()
-                ext_spinner_thread.join()
-
-                print(f"\r[error] {app_name} - {url} - timeout!", end="", flush=True)
-                print()
-
-                # жесткая рубка
-                p.terminate()
-                p.join()
-                continue
-
-            # воркер завершился сам - забираем его статус
-            try:
-                status_main = q.get_nowait()
-            except Exception:
-                status_main = "ok" if (p.exitcode == 0) else ERROR
-
-            # останавливаем спиннер перед печатью финала
-            ext_stop_event.set()
-            ext_spinner_thread.join()
-
-            elapsed = int(time.time() - start_time)
-
-            if not strapi_sync:
-                extra = " [main.json Error]" if status_main == ERROR else ""
-                print(
-                    f"\r[{status_main}] {app_name} - {url} - {elapsed} sec{extra}",
-                    end="",
-                    flush=True,
-                )
-                print()
-                continue
+    finally:
+        ext_stop_event.set()
+        ext_spinner_thread.join()
 
-            if not os.path.exists(main_json_path):
-                print(f"[error] {app_name} - {url} - {elapsed} sec [No main.json]")
-                continue
+    print_status_line(f"[app] {app_name} done")
 
-            with open(main_json_path, "r", encoding="utf-8") as fjson:
-                main_data = json.load(fjson)
-
-            if api_url_proj and api_token:
-                from core.api.strapi import ERROR as STRAPI_ERROR
-                from core.api.strapi import SKIP as STRAPI_SKIP
-                from core.api.strapi import create_project
-
-                publish_flag = bool(will_publish)
-                status_strapi, project_id = create_project(
-                    api_url_proj,
-                    api_url_cat,
-                    api_token,
-                    main_data,
-                    app_name=app_name,
-                    domain=domain,
-                    url=url,
-                    publish=publish_flag,
-                    http_timeout=http_timeout,
-                    http_retries=http_retries,
-                    http_backoff=http_backoff,
-                )
 
-                if status_strapi == STRAPI_ERROR:
-                    final_status = "error"
-                    badges = ["Strapi Create Failed"]
-                elif status_strapi == STRAPI_SKIP:
-                    final_status = "skip"
-                    badges = ["Already exists"]
+# Постановка заданий всех включенных приложений в очередь
+def _enqueue_all(work_queue, apps, allowed_categories, run_cfg):
+    run_id = run_cfg["journal_run_id"]
+    enqueued = 0
+    for app in apps:
+        if not app.get("enabled", True):
+            continue
+        for job in _build_app_jobs(app, allowed_categories, run_cfg) or []:
+            stage = STAGE_PUBLISH if job.get("publish_only") else STAGE_PARTNER
+            if work_queue.enqueue(run_id, stage, job["ledger"]["key"], job):
+                enqueued += 1
+    return enqueued
+
+
+# Задание из очереди на этой машине: пути storage пересчитываются локально
+def _localize_job(job):
+    job = dict(job)
+    job["storage_path"] = os.path.join(STORAGE_DIR, job["app_name"], job["domain"])
+    job["main_json_path"] = os.path.join(job["storage_path"], "main.json")
+    if job.get("shared_dir"):
+        job["shared_dir"] = shared_partner_dir(job["journal"]["run_id"], job["url"])
+    return job
+
+
+# Воркер очереди: берет задания в аренду, держит heartbeat, отдает результат
+def _run_queue_worker(work_queue, runner, stages, run_id, stats_log_sec=30):
+    owner = worker_id()
+    partner_stats = stages["partner"]
+    publish = stages["publish"]
+    heartbeat_sec = max(1.0, work_queue.lease_sec / 3)
+    next_heartbeat = time.time() + heartbeat_sec
+    next_stats_log = time.time() + stats_log_sec
+    next_claim = 0.0
+
+    spinner_state, stop_event, spinner_thread = _start_spinner(f"queue {owner}")
+    try:
+        while True:
+            # досылаем в публикацию то, что не влезло на прошлом тике
+            publish.flush()
+
+            # берем задания, пока есть слоты и место в очереди публикации
+            claimed_any = False
+            while (
+                runner.free_slots() > 0
+                and not publish.saturated()
+                and time.time() >= next_claim
+            ):
+                item = work_queue.claim(owner, run_id)
+                if item is None:
+                    # очередь пуста - не дергаем блокировку SQLite каждый тик
+                    next_claim = time.time() + 1.0
+                    break
+                claimed_any = True
+                job = _localize_job(item["payload"])
+                job["_qid"] = item["id"]
+                if item["stage"] == STAGE_PUBLISH:
+                    publish.put(job, job["publish_only"], job.get("elapsed", 0.0))
                 else:
-                    # успех (создано/обновлено)
-                    final_status = status_strapi
-                    badges = ["Published" if publish_flag else "Draft"]
+                    runner.submit(job)
+                    partner_stats.begin()
+
+            for job, status_main, elapsed in runner.poll():
+                partner_stats.end(elapsed)
+                qid = job.pop("_qid")
+                if status_main is None:
+                    # таймаут: возвращаем в очередь, пока есть попытки
+                    if work_queue.fail(qid, owner, "timeout") == FAILED:
+                        publish.put(job, None, elapsed)
+                    else:
+                        logger.warning(f"[queue] timeout, retry - {job['url']}")
+                    continue
+                work_queue.complete(qid, owner)
+                # публикация - отдельное задание, сразу в аренде у этого воркера
+                pub_job = dict(job, publish_only=status_main, elapsed=elapsed)
+                pub_job["_qid"] = work_queue.enqueue(
+                    job["journal"]["run_id"],
+                    STAGE_PUBLISH,
+                    job["ledger"]["key"],
+                    {k: v for k, v in pub_job.items() if k != "_qid"},
+                    owner=owner,
+                )
+                publish.put(pub_job, status_main, elapsed)
 
-                extra = f" [{' | '.join(badges)}]" if badges else ""
+            now = time.time()
+            if now >= next_heartbeat:
+                work_queue.heartbeat(owner)
+                next_heartbeat = now + heartbeat_sec
 
-                print(
-                    f"\r[{final_status}] {app_name} - {url} - {elapsed} sec{extra}",
-                    end="",
-                    flush=True,
+            in_flight = runner.in_flight()
+            spinner_state["text"] = (
+                f"queue - {len(in_flight)} in flight | {_stage_label(stages)}"
+            )
+            if stats_log_sec and now >= next_stats_log:
+                logger.info(
+                    "[queue] %s | %s",
+                    work_queue.counts(run_id),
+                    format_stage_line(_stage_snapshots(stages)),
                 )
-                print()
-
-                if project_id and status_strapi != STRAPI_ERROR:
-                    try_upload_logo(
-                        main_data,
-                        storage_path,
-                        api_url_proj,
-                        api_token,
-                        project_id,
-                        http_timeout=http_timeout,
-                        http_retries=http_retries,
-                        http_backoff=http_backoff,
-                    )
-            else:
-                print(f"[error] {app_name} - {url} - {elapsed} sec [No API]")
+                next_stats_log = now + stats_log_sec
+
+            idle = not claimed_any and not in_flight and not publish.pending()
+            if idle and work_queue.pending(run_id) == 0:
+                break
+            # чужие аренды еще идут - ждем: истекшие вернутся в очередь
+            time.sleep(1.0 if idle else 0.1)
+    finally:
+        stop_event.set()
+        spinner_thread.join()
 
-        print(f"[app] {app_name} done")
+    print_status_line(f"[queue] done: {work_queue.counts(run_id)}")
 
 
 # Запуск пайплайна
-def run_pipeline():
-    asyncio.run(orchestrate_all())
+def run_pipeline(argv=None):
+    args = parse_run_args(argv)
+    if args.merge:
+        merged_dir, summary = merge_shards(args.merge)
+        print(
+            f"[merge] {summary['partners']} partners, "
+            f"{summary['files_merged']} files -> {merged_dir}"
+        )
+        return
+    asyncio.run(orchestrate_all(args))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,241 @@
+from __future__ import annotations
+
+import atexit
+import itertools
+import json
+import os
+import subprocess
+import threading
+import time
+from typing import Dict, List
+
+from core.log_utils import get_logger
+from core.paths import LOGS_DIR
+from core.settings import get_settings
+from core.timing import add_stage
+
+# Логгер
+logger = get_logger("browser")
+
+# Скрипт браузерного фетча (CLI и режим сервиса --serve)
+SCRIPT_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "browser_fetch.js"
+)
+
+# stderr сервиса (console.error из browser_fetch.js)
+SERVICE_LOG = os.path.join(LOGS_DIR, "browser.log")
+
+# Настройки секции "browser"
+_b_cfg = get_settings().get("browser") or {}
+
+# Долгоживущий сервис вместо запуска node + Chromium на каждый вызов
+_SERVICE_ENABLED: bool = bool(_b_cfg.get("service", True))
+
+# Пул страниц сервиса: одновременных страниц и навигаций на один контекст
+_MAX_PAGES: int = max(1, int(_b_cfg.get("max_pages", 4)))
+_CONTEXT_MAX_USES: int = max(1, int(_b_cfg.get("context_max_uses", 20)))
+
+# Быстрый режим: не грузить картинки/медиа/шрифты/стили и стороннюю аналитику
+_BLOCK_RESOURCES: bool = bool(_b_cfg.get("block_resources", True))
+
+# Как часто писать метрики пула в лог (сек)
+_STATS_LOG_SEC: float = float(_b_cfg.get("stats_log_sec", 60))
+
+
+# Клиент сервиса browser_fetch.js --serve (JSON-RPC построчно через stdin/stdout)
+class BrowserService:
+    def __init__(self):
+        self.proc = None
+        self._ids = itertools.count(1)
+        self._write_lock = threading.Lock()
+        self._pending: Dict[int, dict] = {}
+        self._pending_lock = threading.Lock()
+        self.last_stats: dict = {}
+        self._next_stats_log = 0.0
+
+    def alive(self) -> bool:
+        return self.proc is not None and self.proc.poll() is None
+
+    def start(self):
+        log = open(SERVICE_LOG, "a", encoding="utf-8")
+        try:
+            self.proc = subprocess.Popen(
+                [
+                    "node",
+                    SCRIPT_PATH,
+                    "--serve",
+                    "--maxPages",
+                    str(_MAX_PAGES),
+                    "--contextMaxUses",
+                    str(_CONTEXT_MAX_USES),
+                ],
+                cwd=os.path.dirname(SCRIPT_PATH),
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=log,
+                text=True,
+                encoding="utf-8",
+                bufsize=1,
+            )
+        finally:
+            log.close()
+        threading.Thread(target=self._read_loop, daemon=True).start()
+        logger.info("browser service: запущен pid=%s", self.proc.pid)
+
+    # Разбор ответов: каждый будит своего ожидающего по id
+    def _read_loop(self):
+        proc = self.proc
+        for line in proc.stdout:
+            try:
+                msg = json.loads(line)
+            except ValueError:
+                continue
+            with self._pending_lock:
+                waiter = self._pending.pop(msg.get("id"), None)
+            if waiter is not None:
+                waiter["msg"] = msg
+                waiter["event"].set()
+        # сервис завершился - будим всех, кто еще ждет
+        with self._pending_lock:
+            waiters = list(self._pending.values())
+            self._pending.clear()
+        for waiter in waiters:
+            waiter["event"].set()
+
+    def call(self, method: str, params: dict, timeout: float) -> dict:
+        req_id = next(self._ids)
+        waiter = {"event": threading.Event(), "msg": None}
+        with self._pending_lock:
+            self._pending[req_id] = waiter
+        line = json.dumps({"id": req_id, "method": method, "params": params})
+        try:
+            with self._write_lock:
+                self.proc.stdin.write(line + "\n")
+                self.proc.stdin.flush()
+        except Exception:
+            with self._pending_lock:
+                self._pending.pop(req_id, None)
+            raise
+        if not waiter["event"].wait(timeout):
+            with self._pending_lock:
+                self._pending.pop(req_id, None)
+            raise subprocess.TimeoutExpired(["browser_fetch.js", method], timeout)
+        msg = waiter["msg"]
+        if msg is None:
+            raise RuntimeError("browser service завершился")
+        if msg.get("error"):
+            raise RuntimeError(msg["error"])
+        result = msg.get("result") or {}
+        if result.get("pool"):
+            self._observe_pool(result["pool"])
+        return result
+
+    # Метрики пула страниц (ожидание в очереди, загрузка) - периодически в лог
+    def _observe_pool(self, stats: dict):
+        self.last_stats = stats
+        now = time.time()
+        if _STATS_LOG_SEC and now >= self._next_stats_log:
+            self._next_stats_log = now + _STATS_LOG_SEC
+            logger.info("browser service pid=%s pool: %s", self.proc.pid, stats)
+
+    def stats(self, timeout: float = 10) -> dict:
+        return self.call("stats", {}, timeout)
+
+    def stop(self):
+        if self.proc is None:
+            return
+        if self.last_stats:
+            logger.info(
+                "browser service pid=%s pool итог: %s", self.proc.pid, self.last_stats
+            )
+        try:
+            self.proc.stdin.close()
+            self.proc.wait(timeout=10)
+        except Exception:
+            self.proc.kill()
+        self.proc = None
+
+
+# Сервис текущего процесса (после fork у воркера - свой)
+_SERVICE = None
+_SERVICE_PID = None
+_SERVICE_LOCK = threading.Lock()
+
+
+def _get_service() -> BrowserService:
+    global _SERVICE, _SERVICE_PID
+    with _SERVICE_LOCK:
+        if _SERVICE is None or _SERVICE_PID != os.getpid() or not _SERVICE.alive():
+            _SERVICE = BrowserService()
+            _SERVICE.start()
+            _SERVICE_PID = os.getpid()
+        return _SERVICE
+
+
+@atexit.register
+def stop_service() -> None:
+    global _SERVICE
+    if _SERVICE is not None and _SERVICE_PID == os.getpid():
+        _SERVICE.stop()
+    _SERVICE = None
+
+
+# Аргументы быстрого режима для вызова (None - по настройке browser.block_resources)
+def block_args(enabled=None) -> List[str]:
+    if enabled is None:
+        enabled = _BLOCK_RESOURCES
+    return ["--block", "true" if enabled else "false"]
+
+
+# Вызов browser_fetch.js с аргументами CLI: через сервис, при сбое - отдельный процесс.
+# Возвращает CompletedProcess (stdout - ровно то, что печатает CLI)
+def run_browser_fetch(args: List[str], timeout: float) -> subprocess.CompletedProcess:
+    args = [str(a) for a in args]
+    if _SERVICE_ENABLED:
+        try:
+            # дедлайн сервиса чуть раньше нашего таймаута: страница закроется там
+            deadline_ms = int(max(1.0, timeout - 2) * 1000)
+            result = _get_service().call(
+                "fetch", {"argv": args, "deadlineMs": deadline_ms}, timeout
+            )
+            add_stage("browser_wait", float(result.get("waitMs") or 0) / 1000)
+            return subprocess.CompletedProcess(
+                ["node", SCRIPT_PATH, *args],
+                int(result.get("code") or 0),
+                result.get("stdout") or "",
+                "",
+            )
+        except subprocess.TimeoutExpired:
+            raise
+        except Exception as e:
+            logger.warning(
+                "browser service недоступен (%s), запускаем node напрямую", e
+            )
+
+    return subprocess.run(
+        ["node", SCRIPT_PATH, *args],
+        cwd=os.path.dirname(SCRIPT_PATH),
+        capture_output=True,
+        text=True,
+        timeout=timeout,
+    )
+
+
+# Метрики пула страниц сервиса этого процесса (пусто, если сервис не запущен)
+def service_stats() -> dict:
+    service = _SERVICE
+    if service is None or _SERVICE_PID != os.getpid() or not service.alive():
+        return {}
+    try:
+        return service.stats()
+    except Exception:
+        return dict(service.last_stats)
+
+
+__all__ = [
+    "BrowserService",
+    "block_args",
+    "run_browser_fetch",
+    "service_stats",
+    "stop_service",
+]
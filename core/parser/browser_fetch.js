@@ -1,3 +1,4 @@
+const readline = require('readline');
 const { chromium } = require('playwright');
 const { newInjectedContext } = require('fingerprint-injector');
 
@@ -10,8 +11,57 @@ try {
   // не критично - будет использоваться только fingerprint-injector
 }
 
+// Аргументы запуска Chromium (CLI и режим сервиса)
+const LAUNCH_ARGS = [
+  '--no-sandbox',
+  '--disable-dev-shm-usage',
+  '--disable-gpu',
+  '--disable-blink-features=AutomationControlled',
+];
+
 // Разрешенные режимы ожидания навигации
-const WAIT_STATES = new Set(['load', 'domcontentloaded', 'networkidle', 'commit', 'nowait']);
+const WAIT_STATES = new Set(['load', 'domcontentloaded', 'networkidle', 'commit', 'nowait', 'social']);
+
+// Цель навигации для --wait social: соцсети (как SOCIAL_PATTERNS в web.py) или карточка профиля
+const GOAL_SOCIAL_HOSTS = [
+  'twitter.com', 'x.com', 'discord.gg', 'discord.com', 't.me', 'telegram.me',
+  'youtube.com', 'youtu.be', 'linkedin.com', 'reddit.com', 'medium.com', 'github.com',
+];
+const GOAL_SELECTOR = '.profile-card, .profile-website, [data-testid="UserProfileHeader_Items"]';
+
+// Быстрый режим (--block): типы ресурсов, которые не грузим
+const BLOCKED_RESOURCE_TYPES = new Set(['image', 'media', 'font', 'stylesheet']);
+
+// Быстрый режим: сторонняя аналитика и пиксели (домен и его поддомены)
+const BLOCKED_HOSTS = [
+  'google-analytics.com',
+  'googletagmanager.com',
+  'googleadservices.com',
+  'googlesyndication.com',
+  'doubleclick.net',
+  'connect.facebook.net',
+  'analytics.twitter.com',
+  'static.ads-twitter.com',
+  'ads.linkedin.com',
+  'snap.licdn.com',
+  'bat.bing.com',
+  'clarity.ms',
+  'hotjar.com',
+  'hotjar.io',
+  'mixpanel.com',
+  'segment.com',
+  'segment.io',
+  'amplitude.com',
+  'heapanalytics.com',
+  'fullstory.com',
+  'plausible.io',
+  'mc.yandex.ru',
+  'analytics.tiktok.com',
+  'cdn.mxpnl.com',
+];
+
+// Сколько URL заблокированных картинок запоминаем (аватар X ищется среди них)
+const MAX_RECORDED_IMAGES = 200;
 
 // Паттерны для детектирования антибот-страниц (Cloudflare и пр.)
 const ANTI_BOT_PATTERNS = [
@@ -59,9 +109,34 @@ function parseArgs(argv) {
       args.profile = argv[++i];
     } else if (a === '--cookiesPath') {
       args.cookiesPath = argv[++i];
+    } else if (a === '--cookieStore') {
+      args.cookieStore = argv[++i];
     } else if (a === '--scrollPages') {
       args.scrollPages = Math.max(1, Number(argv[++i]) || 1);
     }
+    // селектор цели для --wait social (по умолчанию - карточка профиля)
+    else if (a === '--goalSelector') {
+      args.goalSelector = String(argv[++i] || '');
+    }
+    // быстрый режим: не грузить картинки/медиа/шрифты/стили и аналитику
+    else if (a === '--block') {
+      args.block = String(argv[++i] || 'true').toLowerCase() !== 'false';
+    } else if (a === '--blockHosts') {
+      const csv = String(argv[++i] || '').trim();
+      args.blockHosts = csv
+        ? csv.split(',').map(s => s.trim().toLowerCase()).filter(Boolean)
+        : [];
+    }
+    // жесткий дедлайн на весь запрос (мс), по истечении страница закрывается
+    else if (a === '--deadline') {
+      args.deadline = Math.max(0, Number(argv[++i]) || 0);
+    }
+    // настройки пула режима сервиса
+    else if (a === '--maxPages') {
+      args.maxPages = Math.max(1, Number(argv[++i]) || 1);
+    } else if (a === '--contextMaxUses') {
+      args.contextMaxUses = Math.max(1, Number(argv[++i]) || 1);
+    }
     else if (a === '--twitterProfile') {
       args.twitterProfile = String(argv[++i] || 'true').toLowerCase() !== 'false';
     }
@@ -215,8 +290,9 @@ async function buildContextWithFingerprint(browser, {
   }
 }
 
-// Надежная навигация с несколькими режимами ожидания
-async function robustGoto(page, targetUrl, waitUntil, timeout) {
+// Надежная навигация с несколькими режимами ожидания.
+// settle=false - не ждать networkidle после перехода (его заменяет ожидание цели)
+async function robustGoto(page, targetUrl, waitUntil, timeout, settle = true) {
   const perTry = Math.min(timeout, 20000);
   const primary = (waitUntil === 'networkidle') ? 'domcontentloaded' : (waitUntil || 'domcontentloaded');
 
@@ -231,7 +307,9 @@ async function robustGoto(page, targetUrl, waitUntil, timeout) {
     try {
       const r = await page.goto(targetUrl, opt);
       try { await page.waitForLoadState('domcontentloaded', { timeout: 5000 }); } catch {}
-      try { await page.waitForLoadState('networkidle',      { timeout: 5000 }); } catch {}
+      if (settle) {
+        try { await page.waitForLoadState('networkidle',      { timeout: 5000 }); } catch {}
+      }
       return r;
     } catch (e) {
       console.error('goto failed with', opt.waitUntil, e?.message || e);
@@ -261,6 +339,99 @@ async function waitForAnySocialHost(page, hosts, ms) {
   } catch {}
 }
 
+// Цель достигнута: в DOM есть ссылка на один из хостов (кроме самого сайта) или селектор
+async function waitForGoal(page, hosts, selector, ms) {
+  try {
+    await page.waitForFunction(([arr, sel]) => {
+      if (sel && document.querySelector(sel)) return true;
+      const H = (arr || []).map(s => String(s || '').toLowerCase());
+      const own = location.hostname.toLowerCase();
+      for (const a of document.querySelectorAll('a[href]')) {
+        let host = '';
+        try { host = new URL(a.getAttribute('href'), location.href).hostname.toLowerCase(); } catch { continue; }
+        if (!host || host === own) continue;
+        if (H.some(h => host === h || host.endsWith('.' + h))) return true;
+      }
+      return false;
+    }, [hosts, selector], { timeout: ms, polling: 250 });
+    return true;
+  } catch {
+    return false;
+  }
+}
+
+// Ожидание по цели (--wait social): выходим, как только цель в DOM;
+// networkidle и скролл - только если сразу не нашлось
+async function reachGoal(page, { hosts, selector, scrollPages, timeout }) {
+  const startedAt = Date.now();
+  const budget = Math.min(8000, Math.max(2000, timeout / 4));
+  const done = (met, via) => ({ met, via, ms: Date.now() - startedAt });
+
+  const first = await Promise.race([
+    waitForGoal(page, hosts, selector, budget).then((met) => (met ? 'goal' : 'idle')),
+    page.waitForLoadState('networkidle', { timeout: budget }).then(() => 'idle', () => 'idle'),
+  ]);
+  if (first === 'goal') return done(true, 'dom');
+
+  if (await waitForGoal(page, hosts, selector, 300)) return done(true, 'networkidle');
+
+  await scrollPage(page, scrollPages);
+  const met = await waitForGoal(page, hosts, selector, 1500);
+  return done(met, met ? 'scroll' : 'none');
+}
+
+// Хост URL в нижнем регистре ('' для невалидного)
+function hostOf(url) {
+  try { return new URL(url).hostname.toLowerCase(); } catch { return ''; }
+}
+
+// Хост из списка блокировки (сам домен или его поддомен)
+function isBlockedHost(requestUrl, hosts) {
+  const host = hostOf(requestUrl);
+  if (!host) return false;
+  return hosts.some((h) => host === h || host.endsWith('.' + h));
+}
+
+// Быстрый режим: перехват запросов страницы. Картинки не скачиваются, но их URL
+// запоминаются (аватар профиля берется из них, если его нет в DOM)
+async function installResourceBlocking(page, extraHosts, blocked) {
+  const hosts = BLOCKED_HOSTS.concat(extraHosts || []);
+  await page.route('**/*', (route) => {
+    const req = route.request();
+    const type = req.resourceType();
+    const reqUrl = req.url();
+    if (BLOCKED_RESOURCE_TYPES.has(type) || isBlockedHost(reqUrl, hosts)) {
+      blocked.count++;
+      if (type === 'image' && blocked.images.length < MAX_RECORDED_IMAGES) {
+        blocked.images.push(reqUrl);
+      }
+      return route.abort('blockedbyclient').catch(() => {});
+    }
+    return route.continue().catch(() => {});
+  });
+}
+
+// Хранилище кук хоста (--cookieStore, ведет cookie_store.py): пишется только после
+// успешной навигации вместе с UA (допуск Cloudflare привязан к нему). Антибот-страница
+// значит, что сохраненный допуск больше не действует - файл удаляем
+function updateCookieStore(storePath, { ua, antiBot, cookies }) {
+  const fs = require('fs');
+  const path = require('path');
+  try {
+    if (antiBot && antiBot.detected) {
+      fs.rmSync(storePath, { force: true });
+      return;
+    }
+    if (!Array.isArray(cookies) || !cookies.length) return;
+    fs.mkdirSync(path.dirname(storePath), { recursive: true });
+    const tmp = `${storePath}.${process.pid}.${Math.random().toString(36).slice(2)}.tmp`;
+    fs.writeFileSync(tmp, JSON.stringify({ ua: ua || '', savedAt: Date.now() / 1000, cookies }));
+    fs.renameSync(tmp, storePath);
+  } catch (e) {
+    console.error('cookie store write failed:', e && (e.message || e));
+  }
+}
+
 // Простой скролл по странице для загрузки ленивого контента
 async function scrollPage(page, pagesCount) {
   if (!pagesCount || pagesCount <= 0) return;
@@ -275,6 +446,139 @@ async function scrollPage(page, pagesCount) {
   } catch {}
 }
 
+// Пул страниц режима сервиса: лимит одновременных страниц + переиспользование контекстов.
+// Контекст берется повторно только с тем же отпечатком (ua/fp/headers/js) и для того же
+// хоста: отпечаток строится под targetUrl, как в разовом запуске. После каждого
+// запроса куки чистятся, контекст пересоздается после N навигаций или антибота
+class PagePool {
+  constructor(getBrowser, { maxPages = 4, contextMaxUses = 20 } = {}) {
+    this.getBrowser = getBrowser;
+    this.maxPages = maxPages;
+    this.contextMaxUses = contextMaxUses;
+    this.active = 0;
+    this.waiters = [];
+    this.idle = new Map();
+    this.browser = null;
+    this.metrics = {
+      served: 0,
+      timedOutInQueue: 0,
+      waitMsTotal: 0,
+      waitMsMax: 0,
+      pageMsTotal: 0,
+      contextsCreated: 0,
+      contextsReused: 0,
+      contextsRecycled: 0,
+      deadlineKills: 0,
+    };
+  }
+
+  // Слот страницы; в очереди ждем не дольше дедлайна запроса
+  _slot(deadlineAt) {
+    if (this.active < this.maxPages) {
+      this.active++;
+      return Promise.resolve();
+    }
+    return new Promise((resolve, reject) => {
+      const waiter = { resolve, timer: null };
+      if (deadlineAt) {
+        waiter.timer = setTimeout(() => {
+          this.waiters = this.waiters.filter((w) => w !== waiter);
+          this.metrics.timedOutInQueue++;
+          reject(new Error('deadline exceeded in page queue'));
+        }, Math.max(0, deadlineAt - Date.now()));
+      }
+      this.waiters.push(waiter);
+    });
+  }
+
+  // Слот переходит следующему в очереди или освобождается
+  _freeSlot() {
+    const next = this.waiters.shift();
+    if (next) {
+      if (next.timer) clearTimeout(next.timer);
+      next.resolve();
+    } else {
+      this.active--;
+    }
+  }
+
+  _idleCount() {
+    let n = 0;
+    for (const list of this.idle.values()) n += list.length;
+    return n;
+  }
+
+  async acquire(fp, targetUrl, deadlineAt) {
+    const queuedAt = Date.now();
+    await this._slot(deadlineAt);
+    const waitMs = Date.now() - queuedAt;
+    this.metrics.waitMsTotal += waitMs;
+    this.metrics.waitMsMax = Math.max(this.metrics.waitMsMax, waitMs);
+
+    try {
+      const browser = await this.getBrowser();
+      if (browser !== this.browser) {
+        // браузер перезапущен - старые контексты больше не годятся
+        this.idle.clear();
+        this.browser = browser;
+      }
+
+      const key = JSON.stringify([hostOf(targetUrl), fp]);
+      let entry = (this.idle.get(key) || []).pop();
+      if (entry) {
+        this.metrics.contextsReused++;
+      } else {
+        const context = await buildContextWithFingerprint(browser, { targetUrl, ...fp });
+        entry = { key, uses: 0, context };
+        this.metrics.contextsCreated++;
+      }
+      const page = await entry.context.newPage();
+      return { entry, page, waitMs, startedAt: Date.now() };
+    } catch (e) {
+      this._freeSlot();
+      throw e;
+    }
+  }
+
+  // Возврат: страница закрывается всегда, контекст - в пул или на пересоздание
+  async release(lease, { recycle = false } = {}) {
+    const { entry, page } = lease;
+    try { await page.close(); } catch {}
+    entry.uses++;
+    this.metrics.served++;
+    this.metrics.pageMsTotal += Date.now() - lease.startedAt;
+
+    let keep = !recycle && entry.uses < this.contextMaxUses && this._idleCount() < this.maxPages;
+    if (keep) {
+      // изоляция запросов: куки прошлого запроса следующему не достаются
+      try { await entry.context.clearCookies(); } catch { keep = false; }
+    }
+    if (keep) {
+      const list = this.idle.get(entry.key) || [];
+      list.push(entry);
+      this.idle.set(entry.key, list);
+    } else {
+      this.metrics.contextsRecycled++;
+      try { await entry.context.close(); } catch {}
+    }
+    this._freeSlot();
+  }
+
+  stats() {
+    const m = this.metrics;
+    const served = Math.max(1, m.served);
+    return {
+      maxPages: this.maxPages,
+      active: this.active,
+      queued: this.waiters.length,
+      idleContexts: this._idleCount(),
+      ...m,
+      waitMsAvg: Math.round(m.waitMsTotal / served),
+      pageMsAvg: Math.round(m.pageMsTotal / served),
+    };
+  }
+}
+
 // Основная функция браузерного фетча
 async function browserFetch(opts) {
   const {
@@ -296,30 +600,40 @@ async function browserFetch(opts) {
     captureNet = false,
     waitSocialHosts = [],
     cookiesPath,
+    cookieStore,
     scrollPages = 1,
     proxy,
     profile,
     twitterProfile = false,
     nitter = false,
+    // пул страниц сервиса (--serve); без него - свой запуск Chromium на вызов
+    pool = null,
+    deadline = 0,
+    block = false,
+    blockHosts = [],
+    goalSelector = GOAL_SELECTOR,
   } = opts || {};
 
   if (!url) throw new Error('url is required');
 
-  const waitUntil = WAIT_STATES.has(wait) ? (wait === 'nowait' ? null : wait) : 'domcontentloaded';
+  // social - переход до domcontentloaded, дальше ожидание цели (reachGoal)
+  const goalMode = wait === 'social';
+  const waitUntil = WAIT_STATES.has(wait) && !goalMode
+    ? (wait === 'nowait' ? null : wait)
+    : 'domcontentloaded';
 
-  const launchArgs = [
-    '--no-sandbox',
-    '--disable-dev-shm-usage',
-    '--disable-gpu',
-    '--disable-blink-features=AutomationControlled',
-  ];
+  // прокси задается на запуске браузера - с ним общий браузер не годится
+  const useShared = !!pool && !(proxy && Object.keys(proxy).length);
+
+  // дедлайн на весь запрос (с учетом ретраев и ожидания в пуле)
+  const deadlineAt = deadline ? Date.now() + deadline : 0;
 
   const consoleLogs = [];
   const netlog = [];
 
   const attempt = async () => {
     const startedAt = Date.now();
-    const launchOpts = { headless: true, args: launchArgs };
+    const launchOpts = { headless: true, args: LAUNCH_ARGS };
 
     if (proxy && Object.keys(proxy).length) {
       launchOpts.proxy = proxy;
@@ -327,26 +641,44 @@ async function browserFetch(opts) {
 
     let browser = null;
     let context = null;
+    let page = null;
+    let lease = null;
+    let deadlineTimer = null;
+    let deadlineHit = false;
+    // контекст после сбоя/антибота/дедлайна в пул не возвращаем
+    let recycle = true;
+
+    const fp = { ua, js, headers, fpDevice, fpOS, fpLocales, fpViewport };
 
     try {
-      browser = await chromium.launch(launchOpts);
-
-      context = await buildContextWithFingerprint(browser, {
-        targetUrl: url,
-        ua,
-        js,
-        headers,
-        fpDevice,
-        fpOS,
-        fpLocales,
-        fpViewport,
-      });
+      if (useShared) {
+        lease = await pool.acquire(fp, url, deadlineAt);
+        context = lease.entry.context;
+        page = lease.page;
+      } else {
+        browser = await chromium.launch(launchOpts);
+        context = await buildContextWithFingerprint(browser, { targetUrl: url, ...fp });
+        page = await context.newPage();
+      }
+
+      // по дедлайну страница закрывается - все дальнейшие операции с ней падают
+      if (deadlineAt) {
+        deadlineTimer = setTimeout(() => {
+          deadlineHit = true;
+          if (pool) pool.metrics.deadlineKills++;
+          page.close().catch(() => {});
+        }, Math.max(0, deadlineAt - Date.now()));
+      }
 
       if (Array.isArray(cookies) && cookies.length) {
         try { await context.addCookies(cookies); } catch {}
       }
 
-      const page = await context.newPage();
+      // перехват на уровне страницы: контекст из пула остается чистым
+      const blocked = { count: 0, images: [] };
+      if (block) {
+        await installResourceBlocking(page, blockHosts, blocked);
+      }
 
       // перехватываем window.open, чтобы видеть, куда страница пытается уйти при кликах
       await page.addInitScript(() => {
@@ -405,13 +737,23 @@ async function browserFetch(opts) {
         });
       }
 
-      const resp = await robustGoto(page, url, waitUntil, timeout);
+      const resp = await robustGoto(page, url, waitUntil, timeout, !goalMode);
 
-      // легкое ожидание появления ссылок (по хостам) - чисто навигация, без логики соцсетей
-      await waitForAnySocialHost(page, waitSocialHosts, 7000);
+      let goal = null;
+      if (goalMode) {
+        goal = await reachGoal(page, {
+          hosts: waitSocialHosts.length ? waitSocialHosts : GOAL_SOCIAL_HOSTS,
+          selector: goalSelector,
+          scrollPages,
+          timeout,
+        });
+      } else {
+        // легкое ожидание появления ссылок (по хостам) - чисто навигация, без логики соцсетей
+        await waitForAnySocialHost(page, waitSocialHosts, 7000);
 
-      // скролл для ленивого контента
-      await scrollPage(page, scrollPages);
+        // скролл для ленивого контента
+        await scrollPage(page, scrollPages);
+      }
 
       // отдельный прогрев для Nitter-профилей: дождаться карточки и еще немного проскроллить
       if (nitter) {
@@ -553,6 +895,9 @@ async function browserFetch(opts) {
       }
 
       const antiBot = await detectAntiBot(page, resp);
+      if (cookieStore) {
+        updateCookieStore(cookieStore, { ua, antiBot, cookies: cookiesOut });
+      }
       const timing = { startedAt, finishedAt: Date.now(), ms: Date.now() - startedAt };
 
       // если это X-профиль и нас явно попросили - собираем профиль прямо в браузере
@@ -721,16 +1066,36 @@ async function browserFetch(opts) {
         result.netlog = netlog;
       }
 
+      if (goal) {
+        result.goal = goal;
+      }
+
       // просто пробрасываем все URL, открытые через window.open
       if (openedUrls.length) {
         result.openedUrls = openedUrls;
       }
 
+      if (block) {
+        // аватар X не скачан, но его URL виден среди заблокированных картинок
+        if (twitter_profile && !twitter_profile.avatar) {
+          twitter_profile.avatar =
+            blocked.images.find((u) => /pbs\.twimg\.com\/profile_images\//i.test(u)) || '';
+        }
+        result.blocked = { requests: blocked.count, images: blocked.images };
+      }
+
+      if (deadlineHit) throw new Error(`deadline exceeded (${deadline} ms)`);
+      recycle = !!antiBot.detected;
+      if (lease) result.pool = { waitMs: lease.waitMs };
+
       return result;
 
     } finally {
+      if (deadlineTimer) clearTimeout(deadlineTimer);
       try {
-        if (browser) {
+        if (lease) {
+          await pool.release(lease, { recycle });
+        } else if (browser) {
           await browser.close();
         } else if (context) {
           await context.close();
@@ -741,6 +1106,7 @@ async function browserFetch(opts) {
 
   let lastError = null;
   for (let i = 0; i < Math.max(1, retries); i++) {
+    if (i > 0 && deadlineAt && Date.now() >= deadlineAt) break;
     try {
       const res = await attempt();
       return res;
@@ -766,61 +1132,153 @@ async function browserFetch(opts) {
   };
 }
 
+// Ответ CLI для ошибки запуска
+function formatCliError(url, error) {
+  return JSON.stringify({
+    ok: false,
+    status: 0,
+    url: url || null,
+    error: String(error),
+  });
+}
+
+// Ответ CLI в stdout (тот же формат отдает и режим сервиса)
+function formatCliOutput(args, result) {
+  // специальный компактный формат для --raw (совместимость с twitter.py / Nitter)
+  if (args.raw) {
+    const instance = (() => {
+      try {
+        const u = result.finalUrl || result.url || args.url;
+        return new URL(u).origin;
+      } catch {
+        return '';
+      }
+    })();
+
+    return JSON.stringify({
+      ok: !!(result && result.ok !== false),
+      html: result.html || '',
+      status: result.status || 0,
+      antiBot: result.antiBot || { detected: false, kind: '', server: '' },
+      instance,
+    });
+  }
+  return JSON.stringify(result, null, 2);
+}
+
+// Режим сервиса: один теплый Chromium, JSON-RPC построчно через stdin/stdout.
+// Запрос: {"id": 1, "method": "fetch", "params": {"argv": [url, "--html", ...], "deadlineMs": 60000}}
+// Ответ:  {"id": 1, "result": {"stdout": "<то же, что печатает CLI>", "code": 0, "waitMs": 0, "pool": {...}}}
+// Метрики пула: {"id": 2, "method": "stats"}
+async function serve(serveArgs = {}) {
+  let browserPromise = null;
+
+  // браузер поднимается лениво и перезапускается, если упал
+  const getBrowser = () => {
+    if (!browserPromise) {
+      browserPromise = chromium.launch({ headless: true, args: LAUNCH_ARGS }).then((b) => {
+        b.on('disconnected', () => { browserPromise = null; });
+        return b;
+      });
+      browserPromise.catch(() => { browserPromise = null; });
+    }
+    return browserPromise;
+  };
+
+  const pool = new PagePool(getBrowser, {
+    maxPages: serveArgs.maxPages || 4,
+    contextMaxUses: serveArgs.contextMaxUses || 20,
+  });
+
+  const send = (msg) => {
+    try { process.stdout.write(JSON.stringify(msg) + '\n'); } catch {}
+  };
+
+  const handle = async (req) => {
+    const { id, method, params } = req || {};
+    if (method === 'ping') {
+      send({ id, result: { ok: true, pid: process.pid } });
+      return;
+    }
+    if (method === 'stats') {
+      send({ id, result: pool.stats() });
+      return;
+    }
+    if (method !== 'fetch') {
+      send({ id, error: `unknown method: ${method}` });
+      return;
+    }
+
+    const args = parseArgs(['node', 'browser_fetch.js', ...((params && params.argv) || [])]);
+    if (!args.url) {
+      send({ id, result: { stdout: formatCliError(null, 'url is required'), code: 1 } });
+      return;
+    }
+    if (params && params.deadlineMs) args.deadline = Number(params.deadlineMs) || 0;
+    try {
+      const result = await browserFetch({ ...args, pool });
+      const waitMs = (result.pool && result.pool.waitMs) || 0;
+      delete result.pool;
+      send({
+        id,
+        result: { stdout: formatCliOutput(args, result), code: 0, waitMs, pool: pool.stats() },
+      });
+    } catch (e) {
+      send({
+        id,
+        result: { stdout: formatCliError(args.url, e && (e.message || e)), code: 1, pool: pool.stats() },
+      });
+    }
+  };
+
+  // запросы обрабатываются параллельно, не больше maxPages страниц одновременно
+  const inflight = new Set();
+  const rl = readline.createInterface({ input: process.stdin });
+  rl.on('line', (line) => {
+    let req = null;
+    try { req = JSON.parse(line); } catch { return; }
+    const task = handle(req).finally(() => inflight.delete(task));
+    inflight.add(task);
+  });
+
+  // stdin закрыт (родитель вышел или умер) - дожидаемся начатых запросов и выходим
+  rl.on('close', async () => {
+    await Promise.allSettled(Array.from(inflight));
+    try {
+      const b = browserPromise && await browserPromise;
+      if (b) await b.close();
+    } catch {}
+    process.exit(0);
+  });
+}
+
 // Точка входа при запуске файла как CLI-скрипта
 async function main() {
   if (require.main !== module) return;
 
+  if (process.argv.includes('--serve')) {
+    await serve(parseArgs(process.argv));
+    return;
+  }
+
   const args = parseArgs(process.argv);
 
   if (!args.url) {
-    process.stdout.write(JSON.stringify({
-      ok: false,
-      status: 0,
-      url: null,
-      error: 'url is required',
-    }));
+    process.stdout.write(formatCliError(null, 'url is required'));
     process.exitCode = 1;
     return;
   }
 
   try {
     const result = await browserFetch(args);
-
-    // специальный компактный формат для --raw (совместимость с twitter.py / Nitter)
-    if (args.raw) {
-      const instance = (() => {
-        try {
-          const u = result.finalUrl || result.url || args.url;
-          return new URL(u).origin;
-        } catch {
-          return '';
-        }
-      })();
-
-      const out = {
-        ok: !!(result && result.ok !== false),
-        html: result.html || '',
-        status: result.status || 0,
-        antiBot: result.antiBot || { detected: false, kind: '', server: '' },
-        instance,
-      };
-
-      process.stdout.write(JSON.stringify(out));
-    } else {
-      process.stdout.write(JSON.stringify(result, null, 2));
-    }
+    process.stdout.write(formatCliOutput(args, result));
   } catch (e) {
-    process.stdout.write(JSON.stringify({
-      ok: false,
-      status: 0,
-      url: args.url || null,
-      error: String(e && (e.message || e)),
-    }));
+    process.stdout.write(formatCliError(args.url, e && (e.message || e)));
     process.exitCode = 1;
   }
 }
 
-module.exports = { browserFetch, parseArgs };
+module.exports = { PagePool, browserFetch, formatCliOutput, parseArgs, serve };
 
 // Автозапуск main при прямом вызове
 main();
\ No newline at end of file
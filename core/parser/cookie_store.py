@@ -0,0 +1,102 @@
+import json
+import os
+import re
+import time
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from core.log_utils import get_logger
+from core.paths import STORAGE_COOKIES_DIR
+from core.settings import get_http_ua, get_settings
+
+# Логгер
+logger = get_logger("browser")
+
+# Настройки секции "cookies"
+_c_cfg = get_settings().get("cookies") or {}
+
+# Хранилище кук по хостам (допуск Cloudflare/Nitter переживает прогон)
+_ENABLED: bool = bool(_c_cfg.get("enabled", True))
+
+# Срок жизни записи хоста; у куки со своим expires действует и он
+_TTL_SEC: float = float(_c_cfg.get("ttl_hours", 12)) * 3600
+
+
+# Хост без www - ключ хранилища
+def cookie_host(url: str) -> str:
+    host = (urlparse(url or "").hostname or "").lower()
+    return host[4:] if host.startswith("www.") else host
+
+
+# Файл хоста: storage/cookies/{host}.json (пишет browser_fetch.js --cookieStore)
+def store_path(url: str) -> str:
+    host = re.sub(r"[^a-z0-9.\-]", "_", cookie_host(url)) or "_"
+    return os.path.join(STORAGE_COOKIES_DIR, f"{host}.json")
+
+
+# Сохраненное состояние хоста {ua, savedAt, cookies} без истекших кук или None
+def load_state(url: str) -> Optional[dict]:
+    if not _ENABLED or not cookie_host(url):
+        return None
+    path = store_path(url)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.debug("cookie store: не удалось прочитать %s: %s", path, e)
+        return None
+
+    now = time.time()
+    if now - float(state.get("savedAt") or 0) > _TTL_SEC:
+        return None
+    cookies = [
+        c
+        for c in state.get("cookies") or []
+        if isinstance(c, dict)
+        and c.get("name")
+        and (float(c.get("expires") or -1) < 0 or float(c["expires"]) > now)
+    ]
+    if not cookies:
+        return None
+    return {"ua": state.get("ua") or "", "cookies": cookies}
+
+
+# UA и куки для запроса к хосту: с сохраненным допуском - тот же UA, что его получил
+def session_for(url: str, default_ua: str = "") -> Tuple[str, List[dict]]:
+    state = load_state(url)
+    if state and state["ua"]:
+        return state["ua"], state["cookies"]
+    return default_ua or get_http_ua(), []
+
+
+# Аргументы browser_fetch.js: сохраненные куки + запись обратно после успеха
+def browser_cookie_args(url: str, cookies: List[dict]) -> List[str]:
+    if not _ENABLED or not cookie_host(url):
+        return []
+    args = ["--cookieStore", store_path(url)]
+    if cookies:
+        args.extend(["--cookies", json.dumps(cookies, ensure_ascii=False)])
+    return args
+
+
+# Куки для requests: только те, что браузер отдал бы этому хосту
+def http_cookies(url: str, cookies: List[dict]) -> Dict[str, str]:
+    host = (urlparse(url or "").hostname or "").lower()
+    out: Dict[str, str] = {}
+    for c in cookies:
+        domain = str(c.get("domain") or "").lower().lstrip(".")
+        if domain and (host == domain or host.endswith("." + domain)):
+            out[c["name"]] = str(c.get("value") or "")
+    return out
+
+
+__all__ = [
+    "browser_cookie_args",
+    "cookie_host",
+    "http_cookies",
+    "load_state",
+    "session_for",
+    "store_path",
+]
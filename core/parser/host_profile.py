@@ -0,0 +1,160 @@
+import os
+import threading
+import time
+from typing import Optional
+
+from core.ledger import load_ledger, modify_entry
+from core.log_utils import get_logger
+from core.parser.cookie_store import cookie_host
+from core.paths import HOST_PROFILES_JSON
+from core.settings import get_settings
+
+# Логгер
+logger = get_logger("web")
+
+# Способы загрузки страницы
+HTTP = "http"
+BROWSER = "browser"
+
+# Настройки секции "host_profile"
+_h_cfg = get_settings().get("host_profile") or {}
+
+# Память по хостам: хватает ли requests или сразу нужен браузер
+_ENABLED: bool = bool(_h_cfg.get("enabled", True))
+
+# Через сколько перепроверять хост (сайт мог снять Cloudflare или уйти в SPA)
+_TTL_SEC: float = float(_h_cfg.get("ttl_hours", 72)) * 3600
+
+# Сглаживание задержки: новое значение входит с этим весом
+_EWMA_ALPHA = 0.3
+
+
+# Профили в памяти процесса: файл перечитывается, только если его изменил
+# кто-то другой (сверка mtime/размера вместо чтения JSON на каждый fetch)
+_CACHE = {}
+_CACHE_STAMP = None
+_CACHE_LOCK = threading.Lock()
+
+
+def _file_stamp():
+    try:
+        st = os.stat(HOST_PROFILES_JSON)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _profile(host):
+    global _CACHE, _CACHE_STAMP
+    stamp = _file_stamp()
+    with _CACHE_LOCK:
+        if stamp != _CACHE_STAMP:
+            _CACHE = load_ledger(HOST_PROFILES_JSON)
+            _CACHE_STAMP = stamp
+        return _CACHE.get(host) or {}
+
+
+def _remember(host, entry):
+    with _CACHE_LOCK:
+        _CACHE[host] = entry
+
+
+# Новая запись способа по прошлой и одному наблюдению
+def _apply(prev, now, usable, elapsed, antibot):
+    cur = dict(prev, at=now)
+    if usable is not None:
+        # срок вердикта считается от последней проверки, а не от любого замера
+        cur["usable"] = bool(usable)
+        cur["checked_at"] = now
+    if elapsed is not None:
+        ms = elapsed * 1000
+        cur["ms"] = round(
+            ms
+            if "ms" not in prev
+            else _EWMA_ALPHA * ms + (1 - _EWMA_ALPHA) * prev["ms"]
+        )
+    if antibot is not None:
+        cur["antibot"] = bool(antibot)
+    return cur
+
+
+# Писать на диск, только если поменялся вердикт/антибот или вердикт пора
+# продлить (иначе он истечет по TTL, хотя подтверждается каждый раз)
+def _must_persist(prev, cur):
+    if "usable" in cur and prev.get("usable") != cur["usable"]:
+        return True
+    if "antibot" in cur and prev.get("antibot") != cur["antibot"]:
+        return True
+    refreshed = float(cur.get("checked_at") or 0) - float(prev.get("checked_at") or 0)
+    return _TTL_SEC > 0 and refreshed >= _TTL_SEC / 4
+
+
+# Наблюдение по хосту для способа method: usable - дал ли он пригодную страницу
+# (соцссылки, не антибот), elapsed - время загрузки. None - прошлое значение не меняем.
+# Задержка копится в памяти и уходит на диск вместе с изменением вердикта
+def record_outcome(
+    url: str,
+    method: str,
+    usable: Optional[bool] = None,
+    elapsed: Optional[float] = None,
+    antibot: Optional[bool] = None,
+) -> None:
+    host = cookie_host(url)
+    if not _ENABLED or not host:
+        return
+    if antibot:
+        usable = False
+    now = time.time()
+    entry = _profile(host)
+    prev = entry.get(method) or {}
+    cur = _apply(prev, now, usable, elapsed, antibot)
+    if not _must_persist(prev, cur):
+        _remember(host, dict(entry, **{method: cur}))
+        return
+
+    # слияние с тем, что лежит в файле, под одной блокировкой: наблюдения
+    # параллельных воркеров не затирают друг друга
+    def _merge(disk):
+        rec = _apply(disk.get(method) or {}, now, usable, elapsed, antibot)
+        if "ms" in cur:
+            rec["ms"] = cur["ms"]
+        return dict(disk, **{method: rec})
+
+    saved = modify_entry(host, _merge, path=HOST_PROFILES_JSON)
+    _remember(host, saved if saved is not None else dict(entry, **{method: cur}))
+
+
+# Способ, который сработал для хоста в последний раз: "http", "browser" или None
+# (нет данных, запись устарела или не помогло ни то, ни другое - пробуем как обычно)
+def preferred_method(url: str) -> Optional[str]:
+    host = cookie_host(url)
+    if not _ENABLED or not host:
+        return None
+    entry = _profile(host)
+    now = time.time()
+
+    def _fresh(rec):
+        return bool(rec) and now - float(rec.get("checked_at") or 0) <= _TTL_SEC
+
+    http = entry.get(HTTP)
+    if not _fresh(http) or "usable" not in http:
+        return None
+    if http["usable"]:
+        return HTTP
+    browser = entry.get(BROWSER)
+    if _fresh(browser) and browser.get("usable") is False:
+        return None
+    return BROWSER
+
+
+# После fork блокировка могла остаться захваченной потоком родителя
+def _reinit_after_fork():
+    global _CACHE_LOCK
+    _CACHE_LOCK = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reinit_after_fork)
+
+
+__all__ = ["BROWSER", "HTTP", "preferred_method", "record_outcome"]
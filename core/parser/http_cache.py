@@ -0,0 +1,338 @@
+import gzip
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional
+from urllib.parse import urlparse
+
+from core.ledger import parse_age
+from core.log_utils import get_logger
+from core.parser.url_classify import classify_host
+from core.paths import HTTP_CACHE_DIR
+from core.settings import get_settings
+
+# Логгер
+logger = get_logger("web")
+
+# Режимы загрузки (часть ключа кэша)
+MODE_HTTP = "http"
+MODE_BROWSER = "browser"
+MODE_NITTER = "nitter"
+
+# Настройки секции "http_cache"
+_hc_cfg = get_settings().get("http_cache") or {}
+
+# Кэш страниц на диске (переживает fork-воркеры и перезапуски)
+_ENABLED: bool = bool(_hc_cfg.get("enabled", True))
+
+# Файлы блокировок single-flight между процессами: склейка имеет смысл,
+# только когда результат лидера ложится в этот кэш
+FLIGHT_LOCK_DIR = os.path.join(HTTP_CACHE_DIR, "locks") if _ENABLED else None
+
+# Потолок размера (сжатые тела); сверх него вытесняются давно не читанные записи
+_MAX_BYTES: int = int(float(_hc_cfg.get("max_mb", 512)) * 1024 * 1024)
+
+# TTL по классу хоста
+_TTL_DEFAULTS = {
+    "homepage": "12h",
+    "aggregator": "6h",
+    "nitter": "6h",
+    "oembed": "7d",
+}
+_TTL_SEC = {
+    cls: parse_age((_hc_cfg.get("ttl") or {}).get(cls, default)) or 0
+    for cls, default in _TTL_DEFAULTS.items()
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    mode TEXT NOT NULL,
+    body_sha TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    etag TEXT,
+    last_modified TEXT,
+    meta TEXT,
+    stored_at REAL NOT NULL,
+    expires_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_lru ON entries (accessed_at);
+"""
+
+
+# Класс хоста для TTL
+def host_class(url, mode=MODE_HTTP):
+    if mode == MODE_NITTER:
+        return "nitter"
+    p = urlparse(url or "")
+    host = (p.hostname or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+    if host in ("youtube.com", "youtu.be") and p.path.startswith("/oembed"):
+        return "oembed"
+    if classify_host(host).aggregator:
+        return "aggregator"
+    return "homepage"
+
+
+def ttl_for(url, mode=MODE_HTTP):
+    return _TTL_SEC[host_class(url, mode)]
+
+
+# Кэш страниц: индекс в SQLite, тела - gzip-файлы по хэшу содержимого
+# (одинаковые ответы разных URL/режимов хранятся один раз)
+class HttpCache:
+    def __init__(self, root=HTTP_CACHE_DIR, max_bytes=_MAX_BYTES):
+        self.root = root
+        self.max_bytes = int(max_bytes)
+        os.makedirs(os.path.join(root, "blobs"), exist_ok=True)
+        self._lock = threading.RLock()
+        self.conn = sqlite3.connect(
+            os.path.join(root, "index.db"),
+            timeout=30,
+            isolation_level=None,
+            check_same_thread=False,
+        )
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA busy_timeout=30000")
+        self.conn.executescript(_SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+    @staticmethod
+    def _key(url, mode):
+        return hashlib.sha1(f"{mode}|{url}".encode("utf-8")).hexdigest()
+
+    def _blob_path(self, sha):
+        return os.path.join(self.root, "blobs", sha[:2], f"{sha}.gz")
+
+    # Запись {body, fresh, etag, last_modified, meta} или None.
+    # Устаревшая отдается только с валидаторами - для условного GET
+    def get(self, url, mode):
+        now = time.time()
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT * FROM entries WHERE key = ?", (self._key(url, mode),)
+            ).fetchone()
+            if row is None:
+                return None
+            fresh = row["expires_at"] > now
+            if not fresh and not (row["etag"] or row["last_modified"]):
+                return None
+            self.conn.execute(
+                "UPDATE entries SET accessed_at = ? WHERE key = ?", (now, row["key"])
+            )
+        try:
+            with gzip.open(
+                self._blob_path(row["body_sha"]), "rt", encoding="utf-8"
+            ) as f:
+                body = f.read()
+        except Exception:
+            self._delete(row["key"])
+            return None
+        return {
+            "body": body,
+            "fresh": fresh,
+            "etag": row["etag"] or "",
+            "last_modified": row["last_modified"] or "",
+            "meta": json.loads(row["meta"] or "{}"),
+        }
+
+    # Транзакция записи между процессами (BEGIN IMMEDIATE): наличие тела,
+    # его запись или удаление и строка индекса меняются как одно целое, иначе
+    # чужой _drop_blob может удалить тело, на которое только что сослались
+    @contextmanager
+    def _txn(self):
+        with self._lock:
+            outer = not self.conn.in_transaction
+            if outer:
+                self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield
+            except BaseException:
+                if outer:
+                    self.conn.execute("ROLLBACK")
+                raise
+            if outer:
+                self.conn.execute("COMMIT")
+
+    def _write_tmp(self, path, raw):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with gzip.open(tmp_path, "wb") as f:
+            f.write(raw)
+        return tmp_path
+
+    def put(self, url, mode, body, ttl, etag=None, last_modified=None, meta=None):
+        raw = (body or "").encode("utf-8")
+        sha = hashlib.sha256(raw).hexdigest()
+        path = self._blob_path(sha)
+        # сжатие - до блокировки индекса; под ней только проверка и rename
+        tmp_path = None if os.path.exists(path) else self._write_tmp(path, raw)
+        now = time.time()
+        with self._txn():
+            if not os.path.exists(path):
+                # тело успели удалить между проверкой и транзакцией
+                os.replace(tmp_path or self._write_tmp(path, raw), path)
+            elif tmp_path:
+                os.remove(tmp_path)
+            old = self.conn.execute(
+                "SELECT body_sha FROM entries WHERE key = ?", (self._key(url, mode),)
+            ).fetchone()
+            self.conn.execute(
+                "INSERT OR REPLACE INTO entries (key, url, mode, body_sha, size, etag, "
+                "last_modified, meta, stored_at, expires_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    self._key(url, mode),
+                    url,
+                    mode,
+                    sha,
+                    os.path.getsize(path),
+                    etag or None,
+                    last_modified or None,
+                    json.dumps(meta or {}, ensure_ascii=False),
+                    now,
+                    now + float(ttl),
+                    now,
+                ),
+            )
+            if old is not None and old["body_sha"] != sha:
+                self._drop_blob(old["body_sha"])
+        self._evict()
+
+    # 304 Not Modified: тело прежнее, продлеваем срок
+    def refresh(self, url, mode, ttl):
+        now = time.time()
+        with self._lock:
+            self.conn.execute(
+                "UPDATE entries SET expires_at = ?, accessed_at = ? WHERE key = ?",
+                (now + float(ttl), now, self._key(url, mode)),
+            )
+
+    def _delete(self, key):
+        with self._txn():
+            row = self.conn.execute(
+                "SELECT body_sha FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            self.conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            if row is not None:
+                self._drop_blob(row["body_sha"])
+
+    # Тело удаляется, когда на него больше не ссылается ни одна запись
+    def _drop_blob(self, sha):
+        used = self.conn.execute(
+            "SELECT 1 FROM entries WHERE body_sha = ? LIMIT 1", (sha,)
+        ).fetchone()
+        if used is None:
+            try:
+                os.remove(self._blob_path(sha))
+            except FileNotFoundError:
+                pass
+
+    # LRU: вытесняем по времени последнего чтения до 90% потолка
+    def _evict(self):
+        with self._lock:
+            total = self.conn.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM entries"
+            ).fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            target = int(self.max_bytes * 0.9)
+            evicted = 0
+            for row in self.conn.execute(
+                "SELECT key, size FROM entries ORDER BY accessed_at"
+            ).fetchall():
+                if total <= target:
+                    break
+                self._delete(row["key"])
+                total -= row["size"]
+                evicted += 1
+        logger.info("http cache: вытеснено %d записей (LRU)", evicted)
+
+
+# Кэш текущего процесса (соединение SQLite после fork не переиспользуем)
+_CACHE = None
+_CACHE_PID = None
+_CACHE_LOCK = threading.Lock()
+
+
+def _get_cache() -> Optional[HttpCache]:
+    global _CACHE, _CACHE_PID
+    if not _ENABLED:
+        return None
+    with _CACHE_LOCK:
+        if _CACHE is None or _CACHE_PID != os.getpid():
+            try:
+                _CACHE = HttpCache()
+            except Exception as e:
+                logger.warning("http cache: недоступен: %s", e)
+                return None
+            _CACHE_PID = os.getpid()
+        return _CACHE
+
+
+def cache_get(url, mode=MODE_HTTP):
+    cache = _get_cache()
+    if cache is None:
+        return None
+    try:
+        return cache.get(url, mode)
+    except Exception as e:
+        logger.warning("http cache: ошибка чтения %s: %s", url, e)
+        return None
+
+
+def cache_put(url, mode, body, etag=None, last_modified=None, meta=None):
+    cache = _get_cache()
+    ttl = ttl_for(url, mode)
+    if cache is None or not body or ttl <= 0:
+        return
+    try:
+        cache.put(url, mode, body, ttl, etag, last_modified, meta)
+    except Exception as e:
+        logger.warning("http cache: ошибка записи %s: %s", url, e)
+
+
+def cache_refresh(url, mode=MODE_HTTP):
+    cache = _get_cache()
+    if cache is None:
+        return
+    try:
+        cache.refresh(url, mode, ttl_for(url, mode))
+    except Exception as e:
+        logger.warning("http cache: ошибка продления %s: %s", url, e)
+
+
+# Заголовки условного GET по устаревшей записи
+def conditional_headers(hit) -> dict:
+    headers = {}
+    if hit and hit.get("etag"):
+        headers["If-None-Match"] = hit["etag"]
+    if hit and hit.get("last_modified"):
+        headers["If-Modified-Since"] = hit["last_modified"]
+    return headers
+
+
+__all__ = [
+    "FLIGHT_LOCK_DIR",
+    "HttpCache",
+    "MODE_BROWSER",
+    "MODE_HTTP",
+    "MODE_NITTER",
+    "cache_get",
+    "cache_put",
+    "cache_refresh",
+    "conditional_headers",
+    "host_class",
+    "ttl_for",
+]
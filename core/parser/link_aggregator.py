@@ -2,12 +2,12 @@ from __future__ import annotations
 
 import re
 from typing import Dict, List, Tuple
-from urllib.parse import parse_qs, unquote, urljoin, urlparse
+from urllib.parse import parse_qs, unquote, urlparse
 
-from bs4 import BeautifulSoup
 from core.log_utils import get_logger
+from core.parser.page import ParsedPage, as_page
+from core.parser.url_classify import SOCIAL_KEYS, classify_url
 from core.parser.web import fetch_url_html
-from core.settings import get_settings
 
 logger = get_logger("link_aggregator")
 
@@ -24,63 +24,41 @@ def force_https(url: str) -> str:
     return u
 
 
-# Возврат домена без www из url
-def _host(u: str) -> str:
-    try:
-        return urlparse(u).netloc.lower().replace("www.", "")
-    except Exception:
-        return ""
-
-
-# Загрузка списка доменов-агрегаторов из config.json
-try:
-    _cfg = get_settings()
-    LINK_COLLECTION_DOMAINS = {
-        (d or "").lower().replace("www.", "")
-        for d in _cfg.get("link_collections", [])
-        if d
-    }
-except Exception as e:
-    logger.warning("link_aggregator: ошибка чтения config: %s", e)
-    LINK_COLLECTION_DOMAINS = set()
-
-
 # Проверка ссылки линк-агрегатора
 def is_link_aggregator(url: str) -> bool:
-    h = _host(url)
-    return any(h == d or h.endswith("." + d) for d in LINK_COLLECTION_DOMAINS)
+    return classify_url(url).aggregator
+
+
+# Соцсети в любом месте ссылки (в т.ч. внутри редиректа): хост после
+# каждого "//", в порядке вхождения
+def _embedded_social_keys(href: str):
+    pos = href.find("//")
+    while pos >= 0:
+        key = classify_url(href[pos:]).social
+        if key:
+            yield key
+        pos = href.find("//", pos + 1)
 
 
 # Соцсети из HTML без фильтрации агрегаторов
-def extract_socials_raw_from_html(html: str, base_url: str) -> Dict[str, str]:
-    SOCIAL_PATTS = {
-        "twitterURL": re.compile(r"(?:^|//)(?:www\.)?(?:twitter\.com|x\.com)/", re.I),
-        "discordURL": re.compile(r"(?:^|//)(?:www\.)?discord\.(?:gg|com)/", re.I),
-        "telegramURL": re.compile(r"(?:^|//)(?:www\.)?(?:t\.me|telegram\.me)/", re.I),
-        "youtubeURL": re.compile(
-            r"(?:^|//)(?:www\.)?(?:youtube\.com|youtu\.be)/", re.I
-        ),
-        "linkedinURL": re.compile(r"(?:^|//)(?:www\.)?linkedin\.com/", re.I),
-        "redditURL": re.compile(r"(?:^|//)(?:www\.)?reddit\.com/", re.I),
-        "mediumURL": re.compile(r"(?:^|//)(?:www\.)?medium\.com/", re.I),
-        "githubURL": re.compile(r"(?:^|//)(?:www\.)?github\.com/", re.I),
-    }
-    soup = BeautifulSoup(html or "", "html.parser")
-
-    out = {k: "" for k in list(SOCIAL_PATTS.keys()) + ["websiteURL"]}
+def extract_socials_raw_from_html(
+    html: str | ParsedPage, base_url: str
+) -> Dict[str, str]:
+    page = as_page(html, base_url)
+
+    out = {k: "" for k in (*SOCIAL_KEYS, "websiteURL")}
     candidates_all: List[tuple[str, str]] = []
 
-    for a in soup.find_all("a", href=True):
-        raw = a["href"]
-        href = force_https(urljoin(base_url, raw))
+    for a, href in page.links(base_url):
+        href = force_https(href)
         href = _unwrap_redirect(href)
         href = force_https(href)
-        txt = a.get_text(" ", strip=True) or ""
+        txt = a.text
         candidates_all.append((href, txt))
 
         # соцсети
-        for key, patt in SOCIAL_PATTS.items():
-            if not out[key] and patt.search(href):
+        for key in _embedded_social_keys(href):
+            if not out[key]:
                 out[key] = href
 
     # website по метке
@@ -93,7 +71,7 @@ def extract_socials_raw_from_html(html: str, base_url: str) -> Dict[str, str]:
     if not website:
 
         def _is_social(u: str) -> bool:
-            return any(p.search(u) for p in SOCIAL_PATTS.values())
+            return next(_embedded_social_keys(u), None) is not None
 
         for href, _ in candidates_all:
             if (
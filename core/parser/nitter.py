@@ -1,18 +1,22 @@
 from __future__ import annotations
 
 import json
-import os
 import random
 import re
-import subprocess
 import time
 from typing import Dict, List, Tuple
 from urllib.parse import unquote, urljoin, urlparse
 
 from bs4 import BeautifulSoup
 from core.log_utils import get_logger
-from core.paths import PROJECT_ROOT
+from core.parser.browser_client import block_args, run_browser_fetch
+from core.parser.cookie_store import browser_cookie_args, session_for
+from core.parser.http_cache import FLIGHT_LOCK_DIR, MODE_NITTER, cache_get, cache_put
+from core.parser.page import ParsedPage, as_page, page_html
 from core.settings import get_http_ua, get_settings
+from core.singleflight import SingleFlight
+from core.timing import cache_event, timed
+from core.trace import span
 
 # Логгер для всего, что связано с Nitter (в логах будет [nitter])
 logger = get_logger("nitter")
@@ -230,14 +234,13 @@ def _html_matches_handle(html: str, handle: str) -> bool:
 
 # Вспомогательная функция: запуск browser_fetch.js в режиме raw для Nitter-URL
 def _run_nitter_fetch(url: str, timeout_sec: int) -> tuple[str, int, str]:
-    script_path = os.path.join(PROJECT_ROOT, "core", "parser", "browser_fetch.js")
+    # пройденная JS-проверка инстанса (куки + UA) переиспользуется между прогонами
+    ua, cookies = session_for(url, _HTTP_UA_NITTER)
     args = [
-        "node",
-        script_path,
         url,
         "--raw",
         "--ua",
-        _HTTP_UA_NITTER,
+        ua,
         "--wait",
         "networkidle",
         "--retries",
@@ -254,16 +257,13 @@ def _run_nitter_fetch(url: str, timeout_sec: int) -> tuple[str, int, str]:
         "1366x768",
         "--nitter",
         "true",
+        *block_args(),
+        *browser_cookie_args(url, cookies),
     ]
 
     try:
-        res = subprocess.run(
-            args,
-            cwd=os.path.dirname(script_path),
-            capture_output=True,
-            text=True,
-            timeout=max(timeout_sec + 8, 25),
-        )
+        with span("browser_fetch.js", url=url, mode="nitter"):
+            res = run_browser_fetch(args, timeout=max(timeout_sec + 8, 25))
     except Exception as e:
         logger.debug("nitter: ошибка запуска browser_fetch.js для %s: %s", url, e)
         return "", 0, "runner_failed"
@@ -337,11 +337,11 @@ def _find_profile_card(soup: BeautifulSoup, handle: str):
 
 # Вспомогательная функция: легкий парс BIO/аватарки для логов
 def _probe_profile(
-    html: str, inst_base: str, handle: str
+    html: str | ParsedPage, inst_base: str, handle: str
 ) -> tuple[str, str, list[str]]:
-    if not html:
+    if not page_html(html):
         return "", "", []
-    soup = BeautifulSoup(html, "html.parser")
+    soup = as_page(html, inst_base).soup
 
     base_root = force_https(inst_base).rstrip("/")
 
@@ -485,11 +485,23 @@ def reset_state() -> None:
     _RR_STATE["idx"] = 0
 
 
+# Параллельные запросы одного handle - один проход по инстансам (и между
+# воркерами: результат лидера ложится в дисковый кэш)
+_PROFILE_FLIGHT = SingleFlight("nitter", lock_dir=FLIGHT_LOCK_DIR)
+
+
 # Функция: получить HTML профиля через Nitter (с логами и баном инстансов)
+@timed("nitter")
 def fetch_profile_html(handle: str, probe_log: bool = True) -> tuple[str, str]:
     handle = (handle or "").strip()
     if not handle:
         return "", ""
+    return _PROFILE_FLIGHT.do(
+        handle.lower(), lambda: _fetch_profile_html(handle, probe_log)
+    )
+
+
+def _fetch_profile_html(handle: str, probe_log: bool) -> tuple[str, str]:
     handle_lc = handle.lower()
 
     if not _ENABLED or not _INSTANCES:
@@ -497,9 +509,18 @@ def fetch_profile_html(handle: str, probe_log: bool = True) -> tuple[str, str]:
 
     # кэш на handle
     cached = _NITTER_HTML_CACHE.get(handle_lc)
+    cache_event("nitter", bool(cached))
     if cached:
         return cached
 
+    # дисковый кэш проверенного HTML профиля (с любого инстанса)
+    hit = cache_get(handle_lc, MODE_NITTER)
+    cache_event("nitter_disk", bool(hit and hit["fresh"]))
+    if hit and hit["fresh"]:
+        cached = (hit["body"], hit["meta"].get("base") or "")
+        _NITTER_HTML_CACHE[handle_lc] = cached
+        return cached
+
     # глобальный лимит попыток по handle
     used = _HANDLE_TRIES.get(handle_lc, 0)
     if used >= _MAX_INS:
@@ -546,6 +567,7 @@ def fetch_profile_html(handle: str, probe_log: bool = True) -> tuple[str, str]:
         # валидация HTML профиля
         if html and _html_matches_handle(html, handle) and not _looks_antibot(html):
             _NITTER_HTML_CACHE[handle_lc] = (html, base)
+            cache_put(handle_lc, MODE_NITTER, html, meta={"base": base})
             return html, base
 
         # если явный антибот/ошибки - баним инстанс
@@ -598,7 +620,8 @@ def parse_profile(url_or_handle: str) -> dict:
     if not html or not inst:
         return {}
 
-    soup = BeautifulSoup(html, "html.parser")
+    page = as_page(html, inst)
+    soup = page.soup
 
     # имя профиля
     name_tag = soup.select_one(".profile-card-fullname") or soup.select_one(
@@ -607,7 +630,7 @@ def parse_profile(url_or_handle: str) -> dict:
     name = (name_tag.get_text(strip=True) if name_tag else "") or ""
 
     # ссылки/аватар через probe
-    avatar_raw, avatar_norm, links = _probe_profile(html, inst, handle)
+    avatar_raw, avatar_norm, links = _probe_profile(page, inst, handle)
     avatar_norm = _normalize_avatar(avatar_norm or "")
 
     return {
@@ -0,0 +1,442 @@
+from __future__ import annotations
+
+import json
+import threading
+from collections import OrderedDict
+from html.parser import HTMLParser
+from typing import NamedTuple
+from urllib.parse import urljoin
+
+from bs4 import BeautifulSoup
+from core.log_utils import get_logger
+from core.settings import get_settings
+
+try:
+    from lxml import etree  # C-парсер для BeautifulSoup и сканера страниц
+except ImportError:  # без lxml работает встроенный html.parser
+    etree = None
+
+# Логгер
+logger = get_logger("web")
+
+# Бэкенды BeautifulSoup: быстрый C-парсер и встроенный
+LXML = "lxml"
+HTML_PARSER = "html.parser"
+
+
+# Бэкенд из настройки "html_parser.backend": auto - lxml, если установлен
+def _choose_backend(name: str) -> str:
+    name = (name or "auto").strip().lower()
+    if name in ("auto", LXML) and etree is not None:
+        return LXML
+    if name == LXML:
+        logger.warning("html_parser: lxml не установлен - используется html.parser")
+    elif name not in ("auto", HTML_PARSER):
+        logger.warning(
+            "html_parser: неизвестный backend %r - используется html.parser", name
+        )
+    return HTML_PARSER
+
+
+# Парсер BeautifulSoup для всех страниц
+_PARSER = _choose_backend((get_settings().get("html_parser") or {}).get("backend"))
+
+# Сколько последних разобранных страниц держать (главная, docs, агрегаторы)
+_MAX_PAGES = 16
+
+# Теги без закрывающего (закрываются сразу, как у BeautifulSoup)
+_VOID_TAGS = frozenset(
+    (
+        "area base basefont bgsound br col command embed frame hr image img input "
+        "isindex keygen link menuitem meta nextid param source spacer track wbr"
+    ).split()
+)
+
+# Текст внутри этих тегов не входит в текст ссылки (как get_text у BeautifulSoup)
+_NO_TEXT_TAGS = frozenset(("script", "style", "template", "rt", "rp"))
+
+# Зоны страницы для соцссылок
+_ZONE_TAGS = frozenset(("header", "nav", "footer"))
+
+
+# Ссылка страницы: href как в атрибуте, видимый текст (get_text(" ", strip=True))
+# и ближайшая зона: header / nav / footer / body
+class Anchor(NamedTuple):
+    href: str
+    text: str
+    zone: str
+
+
+# Потоковый проход по html без построения дерева: ссылки с зонами и текстом,
+# <title>, <meta>, JSON-LD (бэкенд html.parser). Вложенность тегов ведется по
+# правилам BeautifulSoup с html.parser (void-теги, закрытие до ближайшего
+# такого же открытого тега), поэтому зоны совпадают с разбором через soup
+class _PageScanner(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.anchors = []
+        self.meta = {}
+        self.json_ld = []
+        self.title = ""
+        # индексы ссылок в header/nav, footer и первом блоке верхнего уровня
+        self.header_nav, self.footer, self.top_block = [], [], []
+        # открытые body: [глубина, номер текущего ребенка]; ссылки внутри
+        # детей body по номеру ребенка; номера последних детей закрытых body
+        self._bodies = []
+        self._child_links = {}
+        self._last_children = []
+        self._seq = 0
+        self._stack = []
+        self._texts = {}
+        self._counts = {"header": 0, "nav": 0, "footer": 0, "no_text": 0}
+        self._zones = []
+        self._top_open = False
+        self._top_done = False
+        self._title_nodes = None
+        self._title_depth = None
+        self._ld_parts = None
+        self._data = []
+        # закрытые сразу void-теги: их явный </img> soup пропускает целиком
+        self._closed_void = []
+
+    # Текст между тегами копится целиком (одна строка soup)
+    def handle_data(self, data):
+        self._data.append(data)
+
+    # Комментарии и служебные конструкции разрывают текст, как в soup
+    # (в <title> это отдельные строки-дети)
+    def handle_comment(self, data):
+        self._flush()
+        if self._title_nodes is not None:
+            self._title_nodes[-1].append(data)
+
+    def handle_decl(self, decl):
+        self.handle_comment(decl)
+
+    def handle_pi(self, data):
+        self.handle_comment(data)
+
+    def _flush(self):
+        if not self._data:
+            return
+        data = "".join(self._data)
+        self._data = []
+        if self._ld_parts is not None:
+            self._ld_parts.append(data)
+        if self._title_nodes is not None:
+            self._title_nodes[-1].append(data)
+        if self._texts and not self._counts["no_text"]:
+            s = data.strip()
+            if s:
+                for parts in self._texts.values():
+                    parts.append(s)
+
+    def handle_starttag(self, tag, attrs):
+        void = tag in _VOID_TAGS
+        self._start(tag, attrs, void)
+        if void:
+            self._closed_void.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        self._start(tag, attrs, True)
+
+    def _start(self, tag, attrs, closed):
+        self._flush()
+        a = {}
+        for key, value in attrs:
+            a[key] = "" if value is None else value
+
+        # прямой ребенок body - кандидат в "последний элемент body"
+        depth = len(self._stack)
+        self._seq += 1
+        for body in self._bodies:
+            if depth == body[0] + 1:
+                body[1] = self._seq
+        top = False
+        if depth == 0 and not self._top_done and tag in ("div", "section"):
+            self._top_done = top = True
+
+        if tag == "a" and "href" in a:
+            idx = len(self.anchors)
+            zone = self._zones[-1] if self._zones else "body"
+            self.anchors.append(Anchor(a["href"], "", zone))
+            if self._counts["header"] or self._counts["nav"]:
+                self.header_nav.append(idx)
+            if self._counts["footer"]:
+                self.footer.append(idx)
+            if self._top_open or top:
+                self.top_block.append(idx)
+            # ссылка - потомок ребенка body (сам ребенок в свою зону не входит)
+            for body_depth, child in self._bodies:
+                if depth > body_depth + 1:
+                    self._child_links.setdefault(child, []).append(idx)
+            if not closed:
+                self._texts[idx] = []
+        elif tag == "meta" and "content" in a:
+            for attr in ("property", "name"):
+                key = (a.get(attr) or "").strip().lower()
+                if key and key not in self.meta:
+                    self.meta[key] = a["content"]
+
+        # внутри <title> - мини-дерево для title.string
+        child = None
+        if self._title_nodes is not None:
+            child = []
+            self._title_nodes[-1].append(child)
+
+        if closed:
+            return
+
+        self._stack.append(
+            (tag, len(self.anchors) - 1 if tag == "a" and "href" in a else None, top)
+        )
+        if tag in _ZONE_TAGS:
+            self._counts[tag] += 1
+            self._zones.append(tag)
+        if tag in _NO_TEXT_TAGS:
+            self._counts["no_text"] += 1
+        if top:
+            self._top_open = True
+        if tag == "body":
+            self._bodies.append([depth, None])
+        if child is not None:
+            self._title_nodes.append(child)
+        elif tag == "title" and self._title_depth is None:
+            self._title_nodes = [[]]
+            self._title_depth = depth
+        if tag == "script" and a.get("type") == "application/ld+json":
+            self._ld_parts = []
+
+    def handle_endtag(self, tag):
+        if tag in self._closed_void:
+            self._closed_void.remove(tag)
+            return
+        self._flush()
+        if tag in _VOID_TAGS or not any(t == tag for t, _, _ in self._stack):
+            return
+        while self._stack:
+            name, idx, top = self._stack.pop()
+            self._close(name, idx, top, len(self._stack))
+            if name == tag:
+                break
+
+    # Закрытие тега: снятие зон, фиксация текста ссылки, title и JSON-LD
+    def _close(self, name, idx, top, depth):
+        if name in _ZONE_TAGS:
+            self._counts[name] -= 1
+            self._zones.pop()
+        if name in _NO_TEXT_TAGS:
+            self._counts["no_text"] -= 1
+        if top:
+            self._top_open = False
+        if name == "body" and self._bodies and self._bodies[-1][0] == depth:
+            child = self._bodies.pop()[1]
+            if child is not None:
+                self._last_children.append(child)
+        if idx is not None and idx in self._texts:
+            a = self.anchors[idx]
+            self.anchors[idx] = a._replace(text=" ".join(self._texts.pop(idx)))
+        if self._title_nodes is not None:
+            if depth == self._title_depth:
+                self.title = (_single_string(self._title_nodes[0]) or "").strip()
+                self._title_nodes = None
+                self._title_depth = -1
+            else:
+                self._title_nodes.pop()
+        if name == "script" and self._ld_parts is not None:
+            try:
+                data = json.loads("".join(self._ld_parts))
+                self.json_ld.extend(data if isinstance(data, list) else [data])
+            except Exception:
+                pass
+            self._ld_parts = None
+
+    def close(self):
+        super().close()
+        self._finish()
+
+    def _finish(self):
+        self._flush()
+        while self._stack:
+            name, idx, top = self._stack.pop()
+            self._close(name, idx, top, len(self._stack))
+
+    # Ссылки по зонам в порядке обхода: header/nav, footer, первый блок
+    # верхнего уровня, последний элемент body (как select_one("body >
+    # :last-child") - первый по документу, если body несколько)
+    def zone_order(self) -> list[int]:
+        last_body = []
+        if self._last_children:
+            last_body = self._child_links.get(min(self._last_children), [])
+        return self.header_nav + self.footer + self.top_block + last_body
+
+
+# Тот же проход на токенизаторе libxml2 (бэкенд lxml): парсер в C шлет события
+# target-интерфейса, состояние и правила вложенности - от _PageScanner. Так же
+# BeautifulSoup строит дерево с lxml, поэтому зоны совпадают и с этим бэкендом
+class _LxmlPageScanner(_PageScanner):
+    def start(self, tag, attrib):
+        self._start(tag, attrib.items(), tag in _VOID_TAGS)
+
+    def end(self, tag):
+        self.handle_endtag(tag)
+
+    def data(self, data):
+        self._data.append(data)
+
+    def comment(self, text):
+        self.handle_comment(text)
+
+    def doctype(self, name, pubid, system):
+        self.handle_comment(name or "")
+
+    def pi(self, target, data=None):
+        self.handle_comment(f"{target} {data or ''}")
+
+    def close(self):
+        self._finish()
+        return self
+
+
+# Как Tag.string: единственный ребенок-строка (через цепочку единственных детей)
+def _single_string(children):
+    while len(children) == 1:
+        child = children[0]
+        if isinstance(child, str):
+            return child
+        children = child
+    return None
+
+
+# Страница, разобранная один раз. Ссылки, зоны, <title>, meta и JSON-LD
+# собираются одним потоковым проходом без дерева; soup строится лениво -
+# только если экстрактору нужен DOM. Все индексы переиспользуются всеми
+# экстракторами; дерево общее - экстракторы его не меняют
+class ParsedPage:
+    def __init__(self, html: str = "", base_url: str = "", soup=None):
+        self.html = html or ""
+        self.base_url = base_url or ""
+        self._soup = soup
+        self._scan = None
+        self._links = {}
+        self._zone_links = {}
+
+    @property
+    def soup(self) -> BeautifulSoup:
+        if self._soup is None:
+            self._soup = parse_html(self.html)
+        return self._soup
+
+    # Проход тем же бэкендом, что строит soup; если lxml не справился - html.parser
+    def _scanned(self) -> _PageScanner:
+        if self._scan is None:
+            if _PARSER == LXML:
+                try:
+                    parser = etree.HTMLParser(target=_LxmlPageScanner(), recover=True)
+                    parser.feed(self.html)
+                    self._scan = parser.close()
+                    return self._scan
+                except Exception as e:
+                    logger.debug("page scan (lxml): %s", e)
+            scanner = _PageScanner()
+            try:
+                scanner.feed(self.html)
+                scanner.close()
+            except Exception as e:
+                logger.debug("page scan: %s", e)
+            self._scan = scanner
+        return self._scan
+
+    # Все <a href> в порядке документа
+    @property
+    def anchors(self) -> list[Anchor]:
+        return self._scanned().anchors
+
+    # (Anchor, абсолютный href) для всех ссылок страницы
+    def links(self, base_url: str = "") -> list[tuple]:
+        base = base_url or self.base_url
+        out = self._links.get(base)
+        if out is None:
+            out = self._links[base] = [(a, urljoin(base, a.href)) for a in self.anchors]
+        return out
+
+    # (Anchor, абсолютный href) по зонам, где обычно живут соцссылки:
+    # header/nav, footer, первый блок верхнего уровня, последний элемент body
+    def zone_links(self, base_url: str = "") -> list[tuple]:
+        base = base_url or self.base_url
+        out = self._zone_links.get(base)
+        if out is None:
+            links = self.links(base)
+            out = self._zone_links[base] = [
+                links[i] for i in self._scanned().zone_order()
+            ]
+        return out
+
+    # meta name/property (в нижнем регистре) -> content, первое вхождение
+    @property
+    def meta(self) -> dict:
+        return self._scanned().meta
+
+    # Объекты из <script type="application/ld+json"> (битые блоки пропускаются)
+    @property
+    def json_ld(self) -> list:
+        return self._scanned().json_ld
+
+    @property
+    def title(self) -> str:
+        return self._scanned().title
+
+
+# Разбор html выбранным бэкендом; если lxml не справился - html.parser
+def parse_html(html: str, backend: str = "") -> BeautifulSoup:
+    backend = backend or _PARSER
+    if backend != HTML_PARSER:
+        try:
+            return BeautifulSoup(html or "", backend)
+        except Exception as e:
+            logger.debug(
+                "html_parser: %s не разобрал страницу (%s) - html.parser", backend, e
+            )
+    return BeautifulSoup(html or "", HTML_PARSER)
+
+
+# Последние разобранные страницы по тексту html: одна и та же строка из
+# FETCHED_HTML_CACHE, пришедшая в разные экстракторы, парсится один раз
+_PAGES: OrderedDict[str, ParsedPage] = OrderedDict()
+_PAGES_LOCK = threading.Lock()
+
+
+# ParsedPage для html-строки, готовой страницы или уже собранного soup
+def as_page(html, base_url: str = "") -> ParsedPage:
+    if isinstance(html, ParsedPage):
+        return html
+    if isinstance(html, BeautifulSoup):
+        return ParsedPage(str(html), base_url, soup=html)
+    html = html or ""
+    with _PAGES_LOCK:
+        page = _PAGES.get(html)
+        if page is not None:
+            _PAGES.move_to_end(html)
+            return page
+        page = _PAGES[html] = ParsedPage(html, base_url)
+        while len(_PAGES) > _MAX_PAGES:
+            _PAGES.popitem(last=False)
+    return page
+
+
+# Текст страницы: для ParsedPage - исходный html
+def page_html(html) -> str:
+    if isinstance(html, ParsedPage):
+        return html.html
+    return html or ""
+
+
+__all__ = [
+    "Anchor",
+    "HTML_PARSER",
+    "LXML",
+    "ParsedPage",
+    "as_page",
+    "page_html",
+    "parse_html",
+]
@@ -3,14 +3,14 @@ from __future__ import annotations
 import json
 import os
 import re
-import subprocess
 from typing import Dict, List, Tuple
-from urllib.parse import unquote, urljoin, urlparse
+from urllib.parse import unquote, urlparse
 
-import requests
-from bs4 import BeautifulSoup
+from core.http_client import get_session
 from core.log_utils import get_logger
 from core.parser import nitter as nitter_mod
+from core.parser.browser_client import block_args, run_browser_fetch
+from core.parser.cookie_store import browser_cookie_args, session_for
 from core.parser.link_aggregator import (
     extract_socials_from_aggregator,
     is_link_aggregator,
@@ -21,9 +21,13 @@ from core.parser.link_aggregator import (
 from core.parser.link_aggregator import (
     verify_aggregator_belongs as _verify_agg_belongs,
 )
+from core.parser.page import ParsedPage, as_page
+from core.parser.url_classify import classify_host
 from core.parser.web import fetch_url_html
 from core.paths import PROJECT_ROOT
 from core.settings import get_http_ua
+from core.timing import cache_event, timed
+from core.trace import span
 
 logger = get_logger("twitter")
 
@@ -148,7 +152,7 @@ _PLAYWRIGHT_LOGGED: set[str] = set()
 
 # Вспомогательная функция: распарсить HTML X-профиля (после Playwright) - ссылки, имя, аватар
 def _parse_x_profile_html(html: str) -> Dict[str, object]:
-    soup = BeautifulSoup(html or "", "html.parser")
+    soup = as_page(html).soup
 
     # display name
     name = ""
@@ -210,21 +214,12 @@ def _parse_x_profile_html(html: str) -> Dict[str, object]:
                     h_text = _host(url_from_text)
 
                     # режем служебные домены
-                    if (
-                        h_text
-                        and h_text not in ("x.com", "twitter.com", "t.co")
-                        and not h_text.endswith(".x.com")
-                        and not h_text.endswith(".twimg.com")
-                    ):
+                    if h_text and not classify_host(h_text).x_service:
                         links.add(url_from_text)
                 continue
 
             # обычные внешние ссылки из BIO, кроме служебных
-            if (
-                h in ("x.com", "twitter.com", "t.co")
-                or h.endswith(".x.com")
-                or h.endswith(".twimg.com")
-            ):
+            if classify_host(h).x_service:
                 continue
 
             links.add(u)
@@ -237,11 +232,7 @@ def _parse_x_profile_html(html: str) -> Dict[str, object]:
                 continue
 
             host_name = _host("https://" + naked)
-            if (
-                host_name in ("t.co", "x.com", "twitter.com")
-                or host_name.endswith(".x.com")
-                or host_name.endswith(".twimg.com")
-            ):
+            if classify_host(host_name).x_service:
                 continue
 
             # если этот домен уже содержится внутри какой-то найденной ссылки - скип
@@ -269,12 +260,7 @@ def _parse_x_profile_html(html: str) -> Dict[str, object]:
                 if re.match(r"^[a-zA-Z0-9-]+\.[a-zA-Z]{2,}(?:/[^\s]+)?$", text):
                     url_from_text = force_https("https://" + text)
                     h_text = _host(url_from_text)
-                    if (
-                        h_text
-                        and h_text not in ("x.com", "twitter.com", "t.co")
-                        and not h_text.endswith(".x.com")
-                        and not h_text.endswith(".twimg.com")
-                    ):
+                    if h_text and not classify_host(h_text).x_service:
                         links.add(url_from_text)
                 continue
 
@@ -282,11 +268,7 @@ def _parse_x_profile_html(html: str) -> Dict[str, object]:
             if href.startswith("http"):
                 u_norm = force_https(href)
                 h = _host(u_norm)
-                if (
-                    h in ("x.com", "twitter.com", "t.co")
-                    or h.endswith(".x.com")
-                    or h.endswith(".twimg.com")
-                ):
+                if classify_host(h).x_service:
                     continue
                 links.add(u_norm)
 
@@ -385,8 +367,6 @@ def _extract_first_json_object(s: str) -> dict:
 def get_links_from_x_profile(
     profile_url: str, need_avatar: bool = True
 ) -> Dict[str, object]:
-    script_path = os.path.join(ROOT_DIR, "core", "parser", "browser_fetch.js")
-
     orig_url = (profile_url or "").strip()
     if not orig_url:
         return {"links": [], "avatar": "", "name": ""}
@@ -395,6 +375,7 @@ def get_links_from_x_profile(
 
     # кэш по каноническому URL
     cached = _PARSED_X_PROFILE_CACHE.get(safe_url)
+    cache_event("x_profile", bool(cached))
     if cached:
         has_avatar = bool((cached.get("avatar") or "").strip())
         if (not need_avatar) or has_avatar:
@@ -458,32 +439,31 @@ def get_links_from_x_profile(
     )
 
     def _run_once(u: str):
-        ua = get_http_ua()
+        ua, cookies = session_for(u)
         try:
-            return subprocess.run(
-                [
-                    "node",
-                    script_path,
-                    u,
-                    "--html",
-                    "--twitterProfile",
-                    "true",
-                    "--wait",
-                    "domcontentloaded",
-                    "--ua",
-                    ua,
-                    "--timeout",
-                    "45000",
-                    "--scrollPages",
-                    "2",
-                    "--waitSocialHosts",
-                    "t.co,discord.gg,github.com,linktr.ee,t.me,youtube.com,medium.com,reddit.com",
-                ],
-                cwd=os.path.dirname(script_path),
-                capture_output=True,
-                text=True,
-                timeout=90,
-            )
+            with span("browser_fetch.js", url=u, mode="x_profile"):
+                return run_browser_fetch(
+                    [
+                        u,
+                        "--html",
+                        "--twitterProfile",
+                        "true",
+                        "--wait",
+                        "domcontentloaded",
+                        "--ua",
+                        ua,
+                        "--timeout",
+                        "45000",
+                        "--scrollPages",
+                        "2",
+                        "--waitSocialHosts",
+                        "t.co,discord.gg,github.com,linktr.ee,t.me,youtube.com,medium.com,reddit.com",
+                        # аватар не качается: URL берется из DOM или перехваченных запросов
+                        *block_args(),
+                        *browser_cookie_args(u, cookies),
+                    ],
+                    timeout=90,
+                )
         except Exception as e:
             logger.warning("Ошибка запуска browser_fetch.js для %s: %s", u, e)
             return None
@@ -536,11 +516,7 @@ def get_links_from_x_profile(
                             continue
 
                         # служебные домены X/Twitter/t.co полностью выкидываем из links
-                        if (
-                            h in ("x.com", "twitter.com", "t.co")
-                            or h.endswith(".x.com")
-                            or h.endswith(".twimg.com")
-                        ):
+                        if classify_host(h).x_service:
                             continue
 
                         filtered_links.append(u)
@@ -627,12 +603,7 @@ def get_links_from_x_profile(
                         continue
                     u_norm = force_https(l)
                     h = _host(u_norm)
-                    if (
-                        not h
-                        or h in ("x.com", "twitter.com", "t.co")
-                        or h.endswith(".x.com")
-                        or h.endswith(".twimg.com")
-                    ):
+                    if not h or classify_host(h).x_service:
                         # выкидываем всё, что относится к самому X/Twitter
                         continue
                     browser_links.append(u_norm)
@@ -679,12 +650,7 @@ def get_links_from_x_profile(
                                     continue
                                 u_norm = force_https(l)
                                 h = _host(u_norm)
-                                if (
-                                    not h
-                                    or h in ("x.com", "twitter.com", "t.co")
-                                    or h.endswith(".x.com")
-                                    or h.endswith(".twimg.com")
-                                ):
+                                if not h or classify_host(h).x_service:
                                     continue
                                 bio_log_links.append(u_norm)
                             # убираем дубли, сохраняя порядок
@@ -753,13 +719,12 @@ def get_links_from_x_profile(
 
 
 # Функция: найти все X-профили в HTML (по ссылкам <a> и "голым" упоминаниям)
-def extract_twitter_profiles(html: str, base_url: str) -> List[str]:
-    soup = BeautifulSoup(html or "", "html.parser")
+def extract_twitter_profiles(html: str | ParsedPage, base_url: str) -> List[str]:
+    page = as_page(html, base_url)
     profiles = set()
 
     # ссылки из <a>
-    for a in soup.find_all("a", href=True):
-        raw = urljoin(base_url, a["href"])
+    for _, raw in page.links(base_url):
         if not re.search(r"(twitter\.com|x\.com)", raw, re.I):
             continue
         if re.search(r"/status/|/share|/intent|/search|/hashtag/", raw, re.I):
@@ -776,7 +741,7 @@ def extract_twitter_profiles(html: str, base_url: str) -> List[str]:
             profiles.add(clean)
 
     # "голые" упоминания
-    text = html or ""
+    text = page.html
     for m in re.finditer(
         r"https?://(?:www\.)?(?:x\.com|twitter\.com)/([A-Za-z0-9_]{1,15})(?![A-Za-z0-9_/])",
         text,
@@ -798,11 +763,9 @@ def extract_twitter_profiles(html: str, base_url: str) -> List[str]:
 
 
 # Функция: найти ссылки на линк-агрегаторы (linktree и т.п.) на странице
-def extract_link_collection_urls(html: str, base_url: str) -> List[str]:
-    soup = BeautifulSoup(html or "", "html.parser")
+def extract_link_collection_urls(html: str | ParsedPage, base_url: str) -> List[str]:
     urls = []
-    for a in soup.find_all("a", href=True):
-        href = urljoin(base_url, a["href"])
+    for _, href in as_page(html, base_url).links(base_url):
         if is_link_aggregator(href):
             urls.append(force_https(href))
     return urls
@@ -878,7 +841,7 @@ def _agg_has_site_and_handle(agg_url: str, site_domain: str, handle: str) -> str
     except Exception:
         return ""
     try:
-        soup = BeautifulSoup(html or "", "html.parser")
+        page = as_page(html, agg_url)
     except Exception:
         return ""
 
@@ -886,8 +849,8 @@ def _agg_has_site_and_handle(agg_url: str, site_domain: str, handle: str) -> str
     handle_ok = False
     handle_lc = (handle or "").lower()
 
-    for a in soup.find_all("a", href=True):
-        href = force_https(urljoin(agg_url, a["href"]))
+    for _, href in page.links(agg_url):
+        href = force_https(href)
         host = _host(href)
 
         if site_domain and host.endswith(site_domain):
@@ -1070,7 +1033,7 @@ def select_verified_twitter(
     socials: dict,
     site_domain: str,
     brand_token: str,
-    html: str,
+    html: str | ParsedPage,
     url: str,
     trust_home: bool = False,
 ) -> tuple[str, dict, str, str]:
@@ -1121,7 +1084,7 @@ def select_verified_twitter(
 
     candidates_ordered = list(browser_twitter_ordered)
 
-    def _extract_twitter_profiles_from(html_text: str, base: str):
+    def _extract_twitter_profiles_from(html_text: str | ParsedPage, base: str):
         try:
             return extract_twitter_profiles(html_text, base)
         except Exception:
@@ -1311,6 +1274,7 @@ def select_verified_twitter(
 
 
 # Функция: скачать аватар X-профиля и сохранить в storage_dir/filename
+@timed("avatar")
 def download_twitter_avatar(
     avatar_url: str | None,
     twitter_url: str | None,
@@ -1381,7 +1345,7 @@ def download_twitter_avatar(
         retryable = {403, 429, 500, 502, 503, 504}
         for i in range(tries):
             try:
-                r = requests.get(
+                r = get_session("media").get(
                     url_img,
                     timeout=timeout,
                     headers=headers,
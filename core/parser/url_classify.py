@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+from functools import lru_cache
+from typing import NamedTuple
+from urllib.parse import urlsplit
+
+from core.settings import get_settings
+
+# Соцсети по хосту: хост -> ключ socialLinks (порядок = порядок ключей в выдаче)
+SOCIAL_HOSTS = {
+    "twitter.com": "twitterURL",
+    "x.com": "twitterURL",
+    "discord.gg": "discordURL",
+    "discord.com": "discordURL",
+    "t.me": "telegramURL",
+    "telegram.me": "telegramURL",
+    "youtube.com": "youtubeURL",
+    "youtu.be": "youtubeURL",
+    "linkedin.com": "linkedinURL",
+    "reddit.com": "redditURL",
+    "medium.com": "mediumURL",
+    "github.com": "githubURL",
+}
+
+# Ключи соцсетей без повторов (twitterURL, discordURL, ...)
+SOCIAL_KEYS = tuple(dict.fromkeys(SOCIAL_HOSTS.values()))
+
+# Соцсети с региональным поддоменом в одну метку (uk.linkedin.com). У остальных
+# поддомен - служебный (docs.github.com, help.x.com, studio.youtube.com)
+_SOCIAL_SUBDOMAINS = {"linkedin.com"}
+
+# Служебные домены X вместе с поддоменами: профили, редирект t.co, CDN картинок
+X_SERVICE_HOSTS = ("x.com", "twitter.com", "t.co", "twimg.com")
+
+# Домены-агрегаторы ссылок из config.json (linktr.ee и т.п.), вместе с поддоменами
+LINK_COLLECTION_DOMAINS = {
+    (d or "").lower().replace("www.", "")
+    for d in get_settings().get("link_collections", [])
+    if d
+}
+
+
+# Что известно о хосте: ключ соцсети или "", линк-агрегатор, служебный домен X
+class HostClass(NamedTuple):
+    social: str = ""
+    aggregator: bool = False
+    x_service: bool = False
+
+
+# Индекс по суффиксам хоста: "linkedin.com" -> [ключ, ключ и для поддомена в
+# одну метку, агрегатор, служебный X]. Поиск - по одному словарю на каждую
+# метку хоста
+def _build_index():
+    index = {}
+    for host, key in SOCIAL_HOSTS.items():
+        entry = index.setdefault(host, ["", False, False, False])
+        entry[0] = key
+        entry[1] = host in _SOCIAL_SUBDOMAINS
+    for host in LINK_COLLECTION_DOMAINS:
+        index.setdefault(host, ["", False, False, False])[2] = True
+    for host in X_SERVICE_HOSTS:
+        index.setdefault(host, ["", False, False, False])[3] = True
+    return index
+
+
+_INDEX = _build_index()
+
+_EMPTY = HostClass()
+
+
+# Класс хоста (без учета регистра и ведущего www.)
+@lru_cache(maxsize=4096)
+def classify_host(host: str) -> HostClass:
+    host = (host or "").lower().rstrip(".")
+    if host.startswith("www."):
+        host = host[4:]
+    social, aggregator, x_service = "", False, False
+    suffix, depth = host, 0
+    while suffix:
+        entry = _INDEX.get(suffix)
+        if entry is not None:
+            if not social and (depth == 0 or (depth == 1 and entry[1])):
+                social = entry[0]
+            aggregator = aggregator or entry[2]
+            x_service = x_service or entry[3]
+        dot = suffix.find(".")
+        if dot < 0:
+            break
+        suffix, depth = suffix[dot + 1 :], depth + 1
+    if not (social or aggregator or x_service):
+        return _EMPTY
+    return HostClass(social, aggregator, x_service)
+
+
+# Класс хоста ссылки; относительные ссылки и мусор - пустой класс. Соцсеть -
+# только с путем после хоста: "https://x.com" без "/" - не ссылка на профиль
+@lru_cache(maxsize=8192)
+def classify_url(url: str) -> HostClass:
+    try:
+        parts = urlsplit((url or "").strip())
+        host = parts.hostname
+    except ValueError:
+        return _EMPTY
+    if not host:
+        return _EMPTY
+    cls = classify_host(host)
+    if cls.social and not parts.path:
+        if not (cls.aggregator or cls.x_service):
+            return _EMPTY
+        return cls._replace(social="")
+    return cls
+
+
+__all__ = [
+    "HostClass",
+    "LINK_COLLECTION_DOMAINS",
+    "SOCIAL_HOSTS",
+    "SOCIAL_KEYS",
+    "X_SERVICE_HOSTS",
+    "classify_host",
+    "classify_url",
+]
@@ -1,16 +1,37 @@
 from __future__ import annotations
 
+import asyncio
 import json
-import os
 import re
-import subprocess
+import time
 from urllib.parse import urljoin, urlparse
 
-import requests
-from bs4 import BeautifulSoup
+from core.async_http import get_async_http
+from core.http_client import STOP_AT, get_session, read_body
 from core.log_utils import get_logger
 from core.normalize import clean_project_name, is_bad_name
-from core.settings import get_http_ua
+from core.parser.browser_client import block_args, run_browser_fetch
+from core.parser.cookie_store import browser_cookie_args, http_cookies, session_for
+from core.parser.host_profile import BROWSER, HTTP, preferred_method, record_outcome
+from core.parser.http_cache import (
+    FLIGHT_LOCK_DIR,
+    MODE_BROWSER,
+    MODE_HTTP,
+    cache_get,
+    cache_put,
+    cache_refresh,
+    conditional_headers,
+)
+from core.parser.page import ParsedPage, as_page, page_html
+from core.parser.url_classify import (
+    SOCIAL_HOSTS,
+    SOCIAL_KEYS,
+    classify_host,
+    classify_url,
+)
+from core.singleflight import SingleFlight
+from core.timing import cache_event, timed
+from core.trace import span
 
 # Логгер
 logger = get_logger("web")
@@ -20,31 +41,9 @@ FETCHED_HTML_CACHE: dict[str, str] = {}
 PARSED_INTERNALS_CACHE: dict[str, list[str]] = {}
 PARSED_DOCS_LINKS_LOGGED: set[str] = set()
 
-# Регулярки для соцсетей
-SOCIAL_PATTERNS = {
-    "twitterURL": re.compile(r"^https?://(?:www\.)?(?:twitter\.com|x\.com)/", re.I),
-    "discordURL": re.compile(r"^https?://(?:www\.)?discord\.(?:gg|com)/", re.I),
-    "telegramURL": re.compile(r"^https?://(?:www\.)?(?:t\.me|telegram\.me)/", re.I),
-    "youtubeURL": re.compile(r"^https?://(?:www\.)?(?:youtube\.com|youtu\.be)/", re.I),
-    "linkedinURL": re.compile(r"^https?://(?:[a-z0-9\-]+\.)?linkedin\.com/", re.I),
-    "redditURL": re.compile(r"^https?://(?:www\.)?reddit\.com/", re.I),
-    "mediumURL": re.compile(r"^https?://(?:www\.)?medium\.com/", re.I),
-    "githubURL": re.compile(r"^https?://(?:www\.)?github\.com/", re.I),
-    "websiteURL": re.compile(
-        r"^https?://(?!(?:www\.)?(?:twitter\.com|x\.com|discord\.gg|discord\.com|t\.me|telegram\.me|"
-        r"youtube\.com|youtu\.be|linkedin\.com|reddit\.com|medium\.com|github\.com))",
-        re.I,
-    ),
-    "documentURL": re.compile(r"docs\.", re.I),
-}
-
-
-# Host из URL без www
-def _host(u: str) -> str:
-    try:
-        return urlparse(u).netloc.lower().replace("www.", "")
-    except Exception:
-        return ""
+# Параллельные запросы одного URL (агрегаторы, общие партнеры) - одна загрузка,
+# в том числе из разных воркеров: второй берет ответ из дискового кэша
+_FETCH_FLIGHT = SingleFlight("fetch_url_html", lock_dir=FLIGHT_LOCK_DIR)
 
 
 # Доменное имя верхнего уровня (без www), как строку netloc
@@ -58,7 +57,7 @@ def get_domain_name(url: str) -> str:
 
 # Имя проекта по многослойной стратегии
 def extract_project_name(
-    html: str,
+    html: str | ParsedPage,
     base_url: str,
     twitter_display_name: str = "",
 ) -> str:
@@ -69,7 +68,7 @@ def extract_project_name(
 
     # если прилетел json от browser_fetch.js - пробуем поля тайтла/сайта
     try:
-        j = json.loads(html or "{}")
+        j = json.loads(page_html(html) or "{}")
         if isinstance(j, dict):
             for key in ("pageTitle", "title", "ogSiteName", "siteName"):
                 val = clean_project_name(str(j.get(key, "")).strip())
@@ -78,14 +77,12 @@ def extract_project_name(
     except Exception:
         pass
 
-    soup = BeautifulSoup(html or "", "html.parser")
+    page = as_page(html, base_url)
 
     # og:site_name
-    meta_site = soup.select_one(
-        "meta[property='og:site_name'][content], meta[name='og:site_name'][content]"
-    )
-    if meta_site and meta_site.get("content"):
-        val = clean_project_name(meta_site.get("content", "").strip())
+    site_name = page.meta.get("og:site_name", "")
+    if site_name:
+        val = clean_project_name(site_name.strip())
         if val and not is_bad_name(val):
             return val
 
@@ -96,9 +93,7 @@ def extract_project_name(
     except Exception:
         domain_token = ""
 
-    raw_title = ""
-    if soup.title and soup.title.string:
-        raw_title = soup.title.string.strip()
+    raw_title = page.title
 
     if raw_title:
         # разбиваем по частым разделителям
@@ -125,7 +120,7 @@ def extract_project_name(
                 return best
 
     # header/nav: alt у логотипа → h1 (с фильтром мусора)
-    header = soup.select_one("header") or soup.select_one("nav")
+    header = page.soup.select_one("header") or page.soup.select_one("nav")
     if header:
         img = header.select_one("img[alt]")
         if img and img.get("alt"):
@@ -158,21 +153,30 @@ def _looks_like_browser_json(s: str) -> bool:
         return False
 
 
+# Страница JS-проверки антибота вместо сайта (строже, чем is_html_suspicious:
+# простое упоминание cloudflare, например CDN, сюда не попадает)
+def is_antibot_html(html: str) -> bool:
+    low = (html or "").lower()
+    return (
+        "cf-browser-verification" in low
+        or "challenge-platform" in low
+        or "just a moment..." in low
+        or "checking your browser" in low
+        or "verifying you are human" in low
+    )
+
+
 # Грубая эвристика "страница подозрительна/антибот"
-def is_html_suspicious(html: str) -> bool:
+def is_html_suspicious(html: str | ParsedPage) -> bool:
+    page = html if isinstance(html, ParsedPage) else None
+    html = page_html(html)
     if not html:
         return True
 
     low = html.lower()
 
     # cloudflare/антибот-страницы
-    if (
-        "cf-browser-verification" in low
-        or "cloudflare" in low
-        or "just a moment..." in low
-        or "checking your browser" in low
-        or "verifying you are human" in low
-    ):
+    if "cloudflare" in low or is_antibot_html(html):
         return True
 
     # типичные SPA/Next/Nuxt/React-оболочки без реальных ссылок
@@ -181,41 +185,26 @@ def is_html_suspicious(html: str) -> bool:
         or 'id="__nuxt"' in low
         or 'id="root"' in low
         or 'id="app"' in low
-    ) and not has_social_links(html):
+    ) and not has_social_links(page or html):
         return True
 
     # короткий HTML без реальных ссылок - почти всегда заглушка/редирект/антибот
-    if len(html) < 2500 and not has_social_links(html):
+    if len(html) < 2500 and not has_social_links(page or html):
         return True
 
     return False
 
 
 # В html хотя бы одна соцссылка по доменам
-def has_social_links(html: str) -> bool:
-    if not html:
+def has_social_links(html: str | ParsedPage) -> bool:
+    if not page_html(html):
         return False
 
-    soup = BeautifulSoup(html, "html.parser")
-
-    social_domains = (
-        "twitter.com",
-        "x.com",
-        "discord.gg",
-        "discord.com",
-        "t.me",
-        "telegram.me",
-        "github.com",
-        "medium.com",
-        "reddit.com",
-        "linkedin.com",
-        "youtube.com",
-        "youtu.be",
-    )
+    page = as_page(html)
 
-    for a in soup.find_all("a", href=True):
-        href = a["href"]
-        if any(dom in href for dom in social_domains):
+    # хост ссылки по индексу соцсетей, а не подстрокой (netflix.com - не x.com)
+    for a in page.anchors:
+        if classify_url(a.href).social:
             return True
 
     return False
@@ -234,116 +223,243 @@ def force_https(url: str) -> str:
 
 
 # Обертка поверх browser_fetch.js
+@timed("browser")
 def fetch_url_html_playwright(url: str, timeout: int = 60) -> str:
-    script_path = os.path.join(
-        os.path.dirname(os.path.abspath(__file__)), "browser_fetch.js"
-    )
-
-    def _run(args, label):
-        try:
-            ua = get_http_ua()
-            full_args = list(args)
-            if ua:
-                full_args.extend(["--ua", ua])
-
-            result = subprocess.run(
-                ["node", script_path, *full_args],
-                cwd=os.path.dirname(script_path),
-                capture_output=True,
-                text=True,
-                timeout=timeout,
-            )
-            if result.returncode == 0:
-                # Было: logger.info("Playwright (%s) ок: %s", label, url)
-                logger.info("Парс %s (Playwright): ok", url)
-                return result.stdout or ""
-            logger.warning(
-                "Playwright (%s) error for %s: %s",
-                label,
-                url,
-                (result.stderr or "").strip(),
-            )
-            return result.stdout or result.stderr or ""
-        except Exception as e:
-            logger.warning("Playwright (%s) упал для %s: %s", label, url, e)
-            return ""
+    # одна навигация: html + text + openedUrls. Выход, как только в DOM есть
+    # ссылки на соцсети; networkidle и скролл - только как запасной вариант.
+    # Картинки, шрифты, стили и аналитика для ссылок не нужны (быстрый режим)
+    args = [
+        url,
+        "--html",
+        "--text",
+        "--wait",
+        "social",
+        "--waitSocialHosts",
+        ",".join(SOCIAL_HOSTS),
+        "--scrollPages",
+        "4",
+        *block_args(),
+    ]
+    # сохраненные куки хоста (допуск антибота) - с тем же UA, что их получил
+    ua, cookies = session_for(url)
+    args.extend(browser_cookie_args(url, cookies))
+    if ua:
+        args.extend(["--ua", ua])
 
-    # попытка 1: обычный режим - просим отдать HTML
-    out = _run(
-        [
-            url,
-            "--html",
-            "--wait",
-            "networkidle",
-            "--scrollPages",
-            "4",
-        ],
-        "normal",
+    try:
+        with span("browser_fetch.js", url=url, mode="social"):
+            result = run_browser_fetch(args, timeout=timeout)
+    except Exception as e:
+        logger.warning("Playwright упал для %s: %s", url, e)
+        return ""
+    if result.returncode == 0:
+        logger.info("Парс %s (Playwright): ok", url)
+        return result.stdout or ""
+    logger.warning(
+        "Playwright error for %s: %s",
+        url,
+        (result.stderr or result.stdout or "").strip(),
     )
-    if out and out.strip():
-        return out
-
-    # попытка 2: raw (html + text + метаданные)
-    out_raw = _run([url, "--raw"], "raw")
-    return out_raw or out
+    return result.stdout or result.stderr or ""
 
 
 # Основной fetch c политикой prefer=('auto'|'http'|'browser'), антибот-эвристики и кэш
 def fetch_url_html(url: str, *, prefer: str = "auto", timeout: int = 30) -> str:
-    # x.com/twitter.com
-    h = _host(url)
-    if h in ("x.com", "twitter.com"):
-        prefer = "browser"
+    with span("fetch_url_html", url=url, prefer=prefer):
+        return _FETCH_FLIGHT.do(
+            (url, prefer),
+            lambda: _fetch_url_html(url, prefer=prefer, timeout=timeout),
+        )
 
-    # кэш по URL и стратегии
+
+def _fetch_url_html(url: str, *, prefer: str = "auto", timeout: int = 30) -> str:
+    cache_event("html", url in FETCHED_HTML_CACHE)
     if url in FETCHED_HTML_CACHE:
         return FETCHED_HTML_CACHE[url]
+    prefer = _resolve_prefer(url, prefer)
 
-    # requests
     if prefer == "http":
-        headers = {"User-Agent": get_http_ua()}
-        try:
-            resp = requests.get(
-                url, headers=headers, timeout=timeout, allow_redirects=True
-            )
-            html = resp.text or ""
-        except Exception as e:
-            logger.warning("requests error %s: %s", url, e)
-            html = ""
+        html = _http_get(url, timeout) or ""
         FETCHED_HTML_CACHE[url] = html
         return html
 
     # браузер
     if prefer == "browser":
-        out = fetch_url_html_playwright(url)
+        out = _browser_get(url)
         FETCHED_HTML_CACHE[url] = out
         return out
 
     # auto: requests → браузер
-    headers = {"User-Agent": get_http_ua()}
+    html = _http_get(url, timeout)
+
+    # не HTML (PDF, архив) - браузер тоже не поможет
+    if html is None:
+        FETCHED_HTML_CACHE[url] = ""
+        return ""
+
+    if _needs_browser(url, html):
+        out = _browser_get(url)
+        FETCHED_HTML_CACHE[url] = out or html
+        return FETCHED_HTML_CACHE[url]
+
+    FETCHED_HTML_CACHE[url] = html
+    return html
+
+
+# Асинхронный вариант fetch_url_html: HTTP в event loop (core.async_http),
+# браузер - в потоке. Кэши, склейка запросов и профиль хоста общие с синхронным
+async def fetch_url_html_async(
+    url: str, *, prefer: str = "auto", timeout: int = 30
+) -> str:
+    with span("fetch_url_html", url=url, prefer=prefer):
+        return await _FETCH_FLIGHT.ado(
+            (url, prefer),
+            lambda: _fetch_url_html_async(url, prefer=prefer, timeout=timeout),
+        )
+
+
+async def _fetch_url_html_async(
+    url: str, *, prefer: str = "auto", timeout: int = 30
+) -> str:
+    cache_event("html", url in FETCHED_HTML_CACHE)
+    if url in FETCHED_HTML_CACHE:
+        return FETCHED_HTML_CACHE[url]
+    prefer = _resolve_prefer(url, prefer)
+
     html = ""
+    if prefer != "browser":
+        html = await _http_get_async(url, timeout)
+    if html is None:
+        html = ""
+    elif prefer == "browser" or (prefer == "auto" and _needs_browser(url, html)):
+        out = await asyncio.to_thread(_browser_get, url)
+        html = out or html
+
+    FETCHED_HTML_CACHE[url] = html
+    return html
+
+
+# auto: ответ requests не годится (пусто, SPA-оболочка, антибот) - нужен браузер
+def _needs_browser(url: str, html: str) -> bool:
+    if html and not is_html_suspicious(html):
+        return False
+    if html:
+        # страница пришла, но без ссылок - в следующий раз этот хост сразу
+        # в браузер; вердикт перепроверится по TTL
+        record_outcome(url, HTTP, False)
+    return True
+
+
+# Итоговый способ загрузки: x.com - только браузер; auto - по профилю хоста
+def _resolve_prefer(url: str, prefer: str) -> str:
+    if classify_host(urlparse(url).hostname or "").social == "twitterURL":
+        return "browser"
+    # auto: профиль хоста знает, что сработало в прошлый раз
+    if prefer == "auto" and preferred_method(url) == BROWSER:
+        logger.info("Парс %s: по профилю хоста сразу Playwright", url)
+        return "browser"
+    return prefer
+
+
+# Запись дискового кэша и аргументы запроса: свежая запись - без сети,
+# устаревшая - условный GET. Куки хоста (с допуском, уже полученным браузером,
+# фолбэк не нужен) и его UA
+def _http_prepare(url: str, timeout: int):
+    hit = cache_get(url, MODE_HTTP)
+    cache_event("http_disk", bool(hit and hit["fresh"]))
+    ua, cookies = session_for(url)
+    return hit, {
+        "headers": {"User-Agent": ua, **conditional_headers(hit)},
+        "cookies": http_cookies(url, cookies),
+        "timeout": timeout,
+        "allow_redirects": True,
+    }
+
+
+def _http_get(url: str, timeout: int) -> str | None:
+    hit, kwargs = _http_prepare(url, timeout)
+    if hit and hit["fresh"]:
+        return hit["body"]
+    started = time.perf_counter()
     try:
-        resp = requests.get(url, headers=headers, timeout=timeout, allow_redirects=True)
-        html = resp.text or ""
+        resp = get_session("web").get(url, stream=True, **kwargs)
+        body = read_body(resp, stop_at=STOP_AT)
     except Exception as e:
         logger.warning("requests error %s: %s", url, e)
+        return ""
+    return _http_finish(url, hit, resp, body, started)
 
-    if (not html) or is_html_suspicious(html):
-        out = fetch_url_html_playwright(url)
-        FETCHED_HTML_CACHE[url] = out or html
-        return FETCHED_HTML_CACHE[url]
 
-    FETCHED_HTML_CACHE[url] = html
+async def _http_get_async(url: str, timeout: int) -> str | None:
+    hit, kwargs = _http_prepare(url, timeout)
+    if hit and hit["fresh"]:
+        return hit["body"]
+    started = time.perf_counter()
+    try:
+        resp, body = await get_async_http().get_body(
+            url, service="web", stop_at=STOP_AT, **kwargs
+        )
+    except Exception as e:
+        logger.warning("async http error %s: %s", url, e)
+        return ""
+    return _http_finish(url, hit, resp, body, started)
+
+
+# Ответ -> HTML: 304 продлевает кэш; антибот и время ответа - в профиль хоста.
+# body=None - тело не HTML (PDF, картинка, архив): None и выше, браузер не нужен.
+# Тело, оборванное по лимиту или маркеру, в кэш не пишется: это не вся страница
+def _http_finish(url: str, hit, resp, body, started: float) -> str | None:
+    if resp.status_code == 304 and hit:
+        cache_refresh(url, MODE_HTTP)
+        return hit["body"]
+    if body is None:
+        return None
+    html = body.text(resp.url, resp.encoding)
+    antibot = is_antibot_html(html)
+    record_outcome(url, HTTP, elapsed=time.perf_counter() - started, antibot=antibot)
+    if body.partial:
+        logger.info("Парс %s: тело прочитано не целиком, в кэш не пишем", url)
+    elif resp.status_code == 200 and not antibot:
+        cache_put(
+            url,
+            MODE_HTTP,
+            html,
+            etag=resp.headers.get("ETag"),
+            last_modified=resp.headers.get("Last-Modified"),
+        )
     return html
 
 
+# Playwright; пригодность ответа и время - в профиль хоста
+def _browser_get(url: str) -> str:
+    hit = cache_get(url, MODE_BROWSER)
+    cache_event("browser_disk", bool(hit and hit["fresh"]))
+    if hit and hit["fresh"]:
+        return hit["body"]
+
+    started = time.perf_counter()
+    out = fetch_url_html_playwright(url)
+    try:
+        payload = json.loads(out) if out else {}
+    except ValueError:
+        payload = {}
+    usable = (
+        isinstance(payload, dict)
+        and payload.get("ok") is not False
+        and bool(payload.get("html") or payload.get("text"))
+    )
+    record_outcome(url, BROWSER, usable, time.perf_counter() - started)
+    if usable:
+        cache_put(url, MODE_BROWSER, out)
+    return out
+
+
 # Лучшая docs-ссылка
-def find_best_docs_link(soup: BeautifulSoup, base_url: str) -> str:
+def find_best_docs_link(page: ParsedPage, base_url: str) -> str:
+    page = as_page(page, base_url)
     candidates: list[tuple[str, str]] = []
-    for a in soup.find_all("a", href=True):
-        href = a["href"]
-        text = (a.text or "").strip().lower()
-        href_full = urljoin(base_url, href)
+    for a, href_full in page.links(base_url):
+        text = a.text.lower()
         if any(
             k in text for k in ("docs", "documentation", "developer docs", "developers")
         ):
@@ -380,9 +496,7 @@ def find_best_docs_link(soup: BeautifulSoup, base_url: str) -> str:
         filtered.sort(key=lambda t: _score(t[1]))
         doc_url = filtered[0][1]
     else:
-        all_hrefs = [
-            urljoin(base_url, a["href"]) for a in soup.find_all("a", href=True)
-        ]
+        all_hrefs = [href for _, href in page.links(base_url)]
         for href in all_hrefs:
             parsed = urlparse(href)
             if re.match(r".*/docs/?$", parsed.path) or parsed.netloc.startswith(
@@ -397,9 +511,13 @@ def find_best_docs_link(soup: BeautifulSoup, base_url: str) -> str:
 
 
 # Парс всех соцссылок/док с html либо из json browser_fetch
-def extract_social_links(html: str, base_url: str, is_main_page: bool = False) -> dict:
+def extract_social_links(
+    html: str | ParsedPage, base_url: str, is_main_page: bool = False
+) -> dict:
     browser_json = None
     opened_urls: list[str] = []
+    page = html if isinstance(html, ParsedPage) else None
+    html = page_html(html)
 
     try:
         j = json.loads(html)
@@ -440,76 +558,43 @@ def extract_social_links(html: str, base_url: str, is_main_page: bool = False) -
             # html лежит внутри json
             if isinstance(j.get("html"), str) and j["html"].strip():
                 html = j["html"]
+                page = None
     except Exception:
         browser_json = None
 
-    # вспомогательный парсер соцлинков из любого soup
-    def _collect_socials_from_soup(soup_obj, base) -> dict:
-        links_local = {k: "" for k in SOCIAL_PATTERNS if k != "documentURL"}
-
-        # кандидаты только из шапки/навигации/футера
-        zones_local = []
-        zones_local.extend(soup_obj.select("header, nav"))
-        zones_local.extend(soup_obj.select("footer"))
-        zones_local.append(soup_obj.find(["div", "section"], recursive=False))
-        zones_local.append(soup_obj.select_one("body > :last-child"))
-
-        def _scan_zone(node):
-            if not node:
-                return
-            for a in node.find_all("a", href=True):
-                abs_href = urljoin(base, a["href"])
-                for key, pattern in SOCIAL_PATTERNS.items():
-                    if key == "documentURL":
-                        continue
-                    if pattern.search(abs_href):
-                        if not links_local.get(key):
-                            links_local[key] = abs_href
-
-        for z in zones_local:
-            _scan_zone(z)
+    # вспомогательный парсер соцлинков из разобранной страницы
+    def _collect_socials_from_page(page_obj: ParsedPage, base) -> dict:
+        links_local = {k: "" for k in (*SOCIAL_KEYS, "websiteURL")}
+
+        # кандидаты только из шапки/навигации/футера; websiteURL здесь
+        # не заполняется - ниже он всегда равен base
+        def _scan_links(pairs):
+            for _, abs_href in pairs:
+                key = classify_url(abs_href).social
+                if key and not links_local[key]:
+                    links_local[key] = abs_href
+
+        _scan_links(page_obj.zone_links(base))
 
         # если по "зонам" пусто - проход по всей странице
         if all(not links_local[k] for k in links_local if k != "websiteURL"):
-            for a in soup_obj.find_all("a", href=True):
-                abs_href = urljoin(base, a["href"])
-                for key, pattern in SOCIAL_PATTERNS.items():
-                    if key == "documentURL":
-                        continue
-                    if not links_local.get(key) and pattern.search(abs_href):
-                        links_local[key] = abs_href
+            _scan_links(page_obj.links(base))
 
         # website и docs
         links_local["websiteURL"] = base
-        doc_url_local = find_best_docs_link(soup_obj, base)
+        doc_url_local = find_best_docs_link(page_obj, base)
         links_local["documentURL"] = doc_url_local or ""
 
         # если docs найден - дозаполняем пустые поля со страницы docs
         if doc_url_local:
             doc_html = fetch_url_html(doc_url_local, prefer="http")
-            dsoup = BeautifulSoup(doc_html or "", "html.parser")
-            dzones = []
-            dzones.extend(dsoup.select("header, nav"))
-            dzones.extend(dsoup.select("footer"))
-            dzones.append(dsoup.find(["div", "section"], recursive=False))
-            dzones.append(dsoup.select_one("body > :last-child"))
-
-            for z in dzones:
-                if not z:
-                    continue
-                for a in z.find_all("a", href=True):
-                    abs_href = urljoin(doc_url_local, a["href"])
-                    for key, pattern in SOCIAL_PATTERNS.items():
-                        if key in ("documentURL",):
-                            continue
-                        if not links_local.get(key) and pattern.search(abs_href):
-                            links_local[key] = abs_href
+            _scan_links(as_page(doc_html, doc_url_local).zone_links(doc_url_local))
 
         return links_local
 
-    # обычный html -> первый проход парсинга
-    soup = BeautifulSoup(html or "", "html.parser")
-    links = _collect_socials_from_soup(soup, base_url)
+    # обычный html -> первый проход парсинга (страница общая с другими экстракторами)
+    page = page or as_page(html, base_url)
+    links = _collect_socials_from_page(page, base_url)
 
     # лог результат базового HTML-парсинга только для главной страницы
     if is_main_page:
@@ -533,7 +618,7 @@ def extract_social_links(html: str, base_url: str, is_main_page: bool = False) -
 
     if all(not links[k] for k in links if k not in ("websiteURL", "documentURL")):
         iframe_srcs: list[str] = []
-        for iframe in soup.find_all("iframe", src=True):
+        for iframe in page.soup.find_all("iframe", src=True):
             src_abs = urljoin(base_url, iframe["src"])
             if _same_project(src_abs) and src_abs not in iframe_srcs:
                 iframe_srcs.append(src_abs)
@@ -547,8 +632,9 @@ def extract_social_links(html: str, base_url: str, is_main_page: bool = False) -
             if not frame_html:
                 continue
 
-            fsoup = BeautifulSoup(frame_html or "", "html.parser")
-            frame_links = _collect_socials_from_soup(fsoup, iframe_url)
+            frame_links = _collect_socials_from_page(
+                as_page(frame_html, iframe_url), iframe_url
+            )
 
             # дозаполняем только пустые поля с основной страницы
             for key, val in frame_links.items():
@@ -572,14 +658,23 @@ def extract_social_links(html: str, base_url: str, is_main_page: bool = False) -
             ):
                 break
 
-    # если главная пустая целиком - fallback на browser_fetch.js (SPA/JS-рендер)
-    if is_main_page and all(not links[k] for k in links if k != "websiteURL"):
+    # если главная (HTML из requests) пустая целиком - fallback на browser_fetch.js
+    # (SPA/JS-рендер); ответ браузера повторно не рендерим
+    http_fallback = (
+        is_main_page
+        and browser_json is None
+        and all(not links[k] for k in links if k != "websiteURL")
+    )
+    if is_main_page and browser_json is None and not http_fallback:
+        # главная по HTTP дала ссылки - браузер этому хосту не нужен
+        record_outcome(base_url, HTTP, True)
+    if http_fallback:
         # здесь http-парс не дал соц.линков, логируем это и идем в Playwright
         logger.info(
             "Парс %s (requests + BeautifulSoup): пусто - повтор через Playwright",
             base_url,
         )
-        browser_out = fetch_url_html_playwright(base_url)
+        browser_out = _browser_get(base_url)
 
         j2 = None
         try:
@@ -628,13 +723,15 @@ def extract_social_links(html: str, base_url: str, is_main_page: bool = False) -
 
                 html2 = j2.get("html") or ""
                 if html2:
-                    soup2 = BeautifulSoup(html2 or "", "html.parser")
-                    links = _collect_socials_from_soup(soup2, base_url)
+                    links = _collect_socials_from_page(
+                        as_page(html2, base_url), base_url
+                    )
         else:
             # browser_out - это просто HTML, без JSON
             if browser_out:
-                soup2 = BeautifulSoup(browser_out or "", "html.parser")
-                links = _collect_socials_from_soup(soup2, base_url)
+                links = _collect_socials_from_page(
+                    as_page(browser_out, base_url), base_url
+                )
 
     # вытаскиваем соцлинки прямо из сырого HTML (включая inline-скрипты)
     if all(not links.get(k) for k in links if k not in ("websiteURL", "documentURL")):
@@ -652,14 +749,10 @@ def extract_social_links(html: str, base_url: str, is_main_page: bool = False) -
 
         for url_candidate in url_pattern.findall(raw_html):
             url_candidate = force_https(url_candidate)
-            for key, pattern in SOCIAL_PATTERNS.items():
-                if key in ("websiteURL", "documentURL"):
-                    continue
-                if links.get(key):
-                    continue
-                if pattern.search(url_candidate):
-                    links[key] = url_candidate
-                    found_raw = True
+            key = classify_url(url_candidate).social
+            if key and not links.get(key):
+                links[key] = url_candidate
+                found_raw = True
 
         if found_raw:
             logger.info("Парс %s (raw HTML): ok", base_url)
@@ -672,19 +765,22 @@ def extract_social_links(html: str, base_url: str, is_main_page: bool = False) -
             if not isinstance(url_candidate, str) or not url_candidate.strip():
                 continue
             url_candidate = force_https(url_candidate.strip())
-            for key, pattern in SOCIAL_PATTERNS.items():
-                if key in ("websiteURL", "documentURL"):
-                    continue
-                if links.get(key):
-                    continue
-                if pattern.search(url_candidate):
-                    links[key] = url_candidate
+            key = classify_url(url_candidate).social
+            if key and not links.get(key):
+                links[key] = url_candidate
 
     # финальная нормализация - все в https
     for k, v in list(links.items()):
         if v and isinstance(v, str):
             links[k] = force_https(v)
 
+    # HTTP ссылок не дал, а браузер дал - дальше этот хост сразу в браузер
+    if http_fallback:
+        found = any(links.get(k) for k in links if k != "websiteURL")
+        if found:
+            record_outcome(base_url, HTTP, False)
+        record_outcome(base_url, BROWSER, found)
+
     # лог начального обогащения для главной страницы
     if is_main_page:
         initial_summary = {
@@ -706,20 +802,20 @@ def extract_social_links(html: str, base_url: str, is_main_page: bool = False) -
 
 
 # Сбор внутренних ссылок сайта (ограничение max_links), с кэшем
-def get_internal_links(html: str, base_url: str, max_links: int = 10) -> list[str]:
+def get_internal_links(
+    html: str | ParsedPage, base_url: str, max_links: int = 10
+) -> list[str]:
     if base_url in PARSED_INTERNALS_CACHE:
         return PARSED_INTERNALS_CACHE[base_url]
 
     # если json от браузера - пропуск
-    if _looks_like_browser_json(html):
+    if _looks_like_browser_json(page_html(html)):
         PARSED_INTERNALS_CACHE[base_url] = []
         logger.debug("Внутренние ссылки для %s: пропущено (browser JSON)", base_url)
         return []
 
-    soup = BeautifulSoup(html or "", "html.parser")
     found: set[str] = set()
-    for a in soup.find_all("a", href=True):
-        href = urljoin(base_url, a["href"])
+    for _, href in as_page(html, base_url).links(base_url):
         if href.startswith(base_url) and href not in found:
             found.add(href)
             if len(found) >= max_links:
@@ -733,6 +829,7 @@ def get_internal_links(html: str, base_url: str, max_links: int = 10) -> list[st
 # Экспорт
 __all__ = [
     "fetch_url_html",
+    "fetch_url_html_async",
     "fetch_url_html_playwright",
     "extract_social_links",
     "find_best_docs_link",
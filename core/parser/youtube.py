@@ -2,14 +2,20 @@ import json
 import re
 from urllib.parse import quote as urlquote
 
-import requests
+from core.async_http import get_async_http
+from core.http_client import get_session, read_capped
 from core.log_utils import get_logger
+from core.parser.http_cache import FLIGHT_LOCK_DIR, MODE_HTTP, cache_get, cache_put
 from core.parser.web import force_https
 from core.settings import get_http_ua
+from core.singleflight import SingleFlight
 
 # Логгер
 logger = get_logger("parser_youtube")
 
+# og:title лежит в <head>: дальше страницу видео не читаем
+_HEAD_END = (b"</head>",)
+
 
 # Привод youtube-ссылки к каноническому виду @handle или /channel/...
 def youtube_to_handle(url: str) -> str:
@@ -27,9 +33,11 @@ def youtube_to_handle(url: str) -> str:
 
     try:
         headers = {"User-Agent": get_http_ua()}
-        resp = requests.get(u, headers=headers, timeout=10, allow_redirects=True)
+        resp = get_session("youtube").get(
+            u, headers=headers, timeout=10, allow_redirects=True, stream=True
+        )
+        html = read_capped(resp) or ""
         final_url = force_https(resp.url or u)
-        html = resp.text or ""
 
         # @handle в финальном URL
         m_final = re.search(
@@ -97,6 +105,23 @@ def youtube_watch_to_embed(url: str) -> str:
     return ""
 
 
+# Один запрос oEmbed на видео и между воркерами (ответ лидера - в дисковом кэше)
+_OEMBED_FLIGHT = SingleFlight("oembed", lock_dir=FLIGHT_LOCK_DIR)
+
+
+def _oembed_title(oembed: str) -> str:
+    hit = cache_get(oembed)
+    if hit and hit["fresh"]:
+        return (json.loads(hit["body"]) or {}).get("title", "") or ""
+    r = get_session("youtube").get(
+        oembed, timeout=8, headers={"User-Agent": get_http_ua()}
+    )
+    if r.status_code != 200:
+        return ""
+    cache_put(oembed, MODE_HTTP, r.text)
+    return (r.json() or {}).get("title", "") or ""
+
+
 # Получение заголовка видео через oEmbed API (fallback — og:title из HTML)
 def youtube_oembed_title(url: str) -> str:
     o = ""
@@ -104,9 +129,7 @@ def youtube_oembed_title(url: str) -> str:
         oembed = (
             f"https://www.youtube.com/oembed?url={urlquote(url, safe='')}&format=json"
         )
-        r = requests.get(oembed, timeout=8, headers={"User-Agent": get_http_ua()})
-        if r.status_code == 200:
-            o = (r.json() or {}).get("title", "") or ""
+        o = _OEMBED_FLIGHT.do(oembed, lambda: _oembed_title(oembed))
     except Exception:
         pass
     if o:
@@ -114,9 +137,58 @@ def youtube_oembed_title(url: str) -> str:
 
     # fallback: og:title
     try:
-        r = requests.get(url, timeout=8, headers={"User-Agent": get_http_ua()})
+        r = get_session("youtube").get(
+            url, timeout=8, headers={"User-Agent": get_http_ua()}, stream=True
+        )
         m = re.search(
-            r'property=["\']og:title["\']\s+content=["\']([^"\']+)', r.text or "", re.I
+            r'property=["\']og:title["\']\s+content=["\']([^"\']+)',
+            read_capped(r, stop_at=_HEAD_END) or "",
+            re.I,
+        )
+        if m:
+            return m.group(1).strip()
+    except Exception:
+        pass
+    return ""
+
+
+async def _oembed_title_async(oembed: str) -> str:
+    hit = cache_get(oembed)
+    if hit and hit["fresh"]:
+        return (json.loads(hit["body"]) or {}).get("title", "") or ""
+    r = await get_async_http().get(
+        oembed, service="youtube", timeout=8, headers={"User-Agent": get_http_ua()}
+    )
+    if r.status_code != 200:
+        return ""
+    cache_put(oembed, MODE_HTTP, r.text)
+    return (r.json() or {}).get("title", "") or ""
+
+
+# Асинхронный вариант youtube_oembed_title (общий event loop, без потоков)
+async def youtube_oembed_title_async(url: str) -> str:
+    o = ""
+    try:
+        oembed = (
+            f"https://www.youtube.com/oembed?url={urlquote(url, safe='')}&format=json"
+        )
+        o = await _OEMBED_FLIGHT.ado(oembed, lambda: _oembed_title_async(oembed))
+    except Exception:
+        pass
+    if o:
+        return o
+
+    # fallback: og:title
+    try:
+        _, text = await get_async_http().get_capped(
+            url,
+            service="youtube",
+            timeout=8,
+            stop_at=_HEAD_END,
+            headers={"User-Agent": get_http_ua()},
+        )
+        m = re.search(
+            r'property=["\']og:title["\']\s+content=["\']([^"\']+)', text or "", re.I
         )
         if m:
             return m.group(1).strip()
@@ -129,7 +201,10 @@ def youtube_oembed_title(url: str) -> str:
 def extract_youtube_featured_videos(channel_handle_url: str) -> list[dict]:
     try:
         headers = {"User-Agent": get_http_ua()}
-        html = requests.get(channel_handle_url, headers=headers, timeout=10).text
+        resp = get_session("youtube").get(
+            channel_handle_url, headers=headers, timeout=10, stream=True
+        )
+        html = read_capped(resp) or ""
 
         # ytInitialData = {...};
         m = re.search(r"ytInitialData\s*=\s*(\{.*?\});", html, re.DOTALL)
@@ -0,0 +1,114 @@
+import hashlib
+import json
+import os
+import shutil
+from urllib.parse import urlparse
+
+from core.log_utils import get_logger
+from core.paths import STORAGE_PARTNERS_DIR
+
+# Логгер
+logger = get_logger("orchestrator")
+
+# Файлы общего (не зависящего от приложения) кэша партнера
+COLLECTED_JSON = "collected.json"
+REVIEW_JSON = "review_full.json"
+
+
+# Ключ партнера без привязки к приложению: хост без www + путь без хвостового "/"
+def partner_url_key(url):
+    p = urlparse((url or "").strip())
+    host = (p.netloc or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+    return f"{host}{p.path.rstrip('/')}".lower() or (url or "").strip().lower()
+
+
+# Папка общего кэша партнера в рамках прогона
+def shared_partner_dir(run_id, url):
+    digest = hashlib.sha1(partner_url_key(url).encode("utf-8")).hexdigest()[:16]
+    return os.path.join(STORAGE_PARTNERS_DIR, run_id, digest)
+
+
+# Удаление кэша прошлых прогонов (текущий оставляем - он нужен для resume)
+def prune_shared_cache(keep_run_id):
+    try:
+        names = os.listdir(STORAGE_PARTNERS_DIR)
+    except FileNotFoundError:
+        return
+    for name in names:
+        if name != keep_run_id:
+            shutil.rmtree(os.path.join(STORAGE_PARTNERS_DIR, name), ignore_errors=True)
+
+
+def _write_json(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+# Сохранение собранных данных (+ копия лого) для остальных приложений
+def save_shared_collected(shared_dir, main_data, storage_path):
+    try:
+        logo = main_data.get("svgLogo") or ""
+        logo_path = os.path.join(storage_path, logo) if logo else ""
+        if logo_path and os.path.exists(logo_path):
+            os.makedirs(shared_dir, exist_ok=True)
+            shutil.copy2(logo_path, os.path.join(shared_dir, logo))
+        _write_json(os.path.join(shared_dir, COLLECTED_JSON), main_data)
+    except Exception as e:
+        logger.warning("partner cache: не удалось сохранить %s: %s", shared_dir, e)
+
+
+# Собранные данные из общего кэша (лого копируется в папку приложения) или None
+def load_shared_collected(shared_dir, storage_path):
+    try:
+        with open(os.path.join(shared_dir, COLLECTED_JSON), "r", encoding="utf-8") as f:
+            main_data = json.load(f)
+    except Exception:
+        return None
+    logo = main_data.get("svgLogo") or ""
+    if logo:
+        src = os.path.join(shared_dir, logo)
+        if os.path.exists(src):
+            shutil.copy2(src, os.path.join(storage_path, logo))
+        else:
+            main_data["svgLogo"] = ""
+    return main_data
+
+
+# Кэш обзора review_full: валиден только для того же контекста промпта
+def load_shared_review(path, context):
+    if not path:
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except Exception:
+        return None
+    if data.get("context") != context or not (data.get("content") or "").strip():
+        return None
+    return data["content"]
+
+
+def save_shared_review(path, context, content):
+    if not path or not (content or "").strip():
+        return
+    try:
+        _write_json(path, {"context": context, "content": content})
+    except Exception as e:
+        logger.warning("partner cache: review_full не сохранен %s: %s", path, e)
+
+
+__all__ = [
+    "REVIEW_JSON",
+    "load_shared_collected",
+    "load_shared_review",
+    "partner_url_key",
+    "prune_shared_cache",
+    "save_shared_collected",
+    "save_shared_review",
+    "shared_partner_dir",
+]
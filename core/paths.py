@@ -11,9 +11,17 @@ LOGS_DIR = os.path.join(PROJECT_ROOT, "logs")
 
 # Частные подпапки
 STORAGE_APPS_DIR = os.path.join(STORAGE_DIR, "apps")
+STORAGE_PARTNERS_DIR = os.path.join(STORAGE_DIR, "partners")
+STORAGE_RUNS_DIR = os.path.join(STORAGE_DIR, "runs")
+STORAGE_COOKIES_DIR = os.path.join(STORAGE_DIR, "cookies")
+HTTP_CACHE_DIR = os.path.join(STORAGE_DIR, "http_cache")
 
 # Файлы
 CONFIG_JSON = os.path.join(CONFIG_DIR, "config.json")
 PROMPT_JSON = os.path.join(CONFIG_DIR, "prompt.json")
 CONTENT_TEMPLATE = os.path.join(TEMPLATES_DIR, "content_template.json")
 MAIN_TEMPLATE = os.path.join(TEMPLATES_DIR, "main_template.json")
+LEDGER_JSON = os.path.join(STORAGE_DIR, "ledger.json")
+JOURNAL_JSONL = os.path.join(STORAGE_DIR, "journal.jsonl")
+QUEUE_DB = os.path.join(STORAGE_DIR, "queue.db")
+HOST_PROFILES_JSON = os.path.join(STORAGE_DIR, "host_profiles.json")
@@ -0,0 +1,231 @@
+import collections
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+from core.log_utils import get_logger
+
+# Логгер
+logger = get_logger("orchestrator")
+
+
+# Счетчики одной стадии пайплайна (живут в родителе)
+class StageStats:
+    def __init__(self, name, workers):
+        self.name = name
+        self.workers = workers
+        self.started_at = time.time()
+        self.active = 0
+        self.done = 0
+        self.busy_sec = 0.0
+        self.max_depth = 0
+        self._lock = threading.Lock()
+
+    def begin(self):
+        with self._lock:
+            self.active += 1
+
+    def end(self, elapsed):
+        with self._lock:
+            self.active -= 1
+            self.done += 1
+            self.busy_sec += elapsed
+
+    def observe_depth(self, depth):
+        with self._lock:
+            self.max_depth = max(self.max_depth, depth)
+
+    # Срез для логов: занятость, пропускная способность (шт/мин), средняя длительность
+    def snapshot(self, depth=0):
+        with self._lock:
+            wall = max(1e-6, time.time() - self.started_at)
+            return {
+                "stage": self.name,
+                "workers": self.workers,
+                "active": self.active,
+                "queued": depth,
+                "max_queued": self.max_depth,
+                "done": self.done,
+                "per_min": round(self.done * 60.0 / wall, 2),
+                "avg_sec": round(self.busy_sec / self.done, 1) if self.done else 0.0,
+                "utilization": round(self.busy_sec / (wall * self.workers), 2),
+            }
+
+
+# Как часто ждущий слота AI проверяет, не умер ли кто-то из держателей (сек)
+_AI_REAP_SEC = 5.0
+
+
+# Жив ли процесс (чужой pid без прав на сигнал - тоже жив)
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True
+    return True
+
+
+# Общий на все процессы ограничитель LLM-запросов (стадия AI). Для каждого
+# слота помнится pid держателя: слоты убитого по таймауту воркера возвращает
+# раннер (release_pid), а ждущие слота подбирают слоты умерших процессов
+class AiGate:
+    def __init__(self, ctx, workers):
+        self.workers = max(1, int(workers))
+        self._sem = ctx.BoundedSemaphore(self.workers)
+        self._lock = ctx.Lock()
+        self._holders = ctx.Array("i", self.workers, lock=False)
+        self._waiting = ctx.Value("i", 0, lock=False)
+        self._active = ctx.Value("i", 0, lock=False)
+        self._done = ctx.Value("i", 0, lock=False)
+        self._busy = ctx.Value("d", 0.0, lock=False)
+        self._started_at = time.time()
+
+    @contextmanager
+    def slot(self):
+        with self._lock:
+            self._waiting.value += 1
+        while not self._sem.acquire(timeout=_AI_REAP_SEC):
+            self.reap()
+        pid = os.getpid()
+        with self._lock:
+            self._waiting.value -= 1
+            self._active.value += 1
+            idx = self._holders[:].index(0)
+            self._holders[idx] = pid
+        t0 = time.time()
+        try:
+            yield
+        finally:
+            with self._lock:
+                # слот могли вернуть за нас (release_pid) - второй раз не отдаем
+                mine = self._holders[idx] == pid
+                if mine:
+                    self._holders[idx] = 0
+                    self._active.value -= 1
+                    self._done.value += 1
+                    self._busy.value += time.time() - t0
+            if mine:
+                self._sem.release()
+
+    # Вернуть слоты, занятые процессом pid (воркер убит или умер в LLM-запросе)
+    def release_pid(self, pid):
+        freed = 0
+        with self._lock:
+            for i in range(self.workers):
+                if self._holders[i] == pid:
+                    self._holders[i] = 0
+                    self._active.value -= 1
+                    freed += 1
+        for _ in range(freed):
+            self._sem.release()
+        if freed:
+            logger.warning("AI gate: возвращено слотов умершего pid=%s: %d", pid, freed)
+        return freed
+
+    # Слоты держателей, которых уже нет
+    def reap(self):
+        with self._lock:
+            pids = {pid for pid in self._holders[:] if pid}
+        return sum(self.release_pid(pid) for pid in pids if not _pid_alive(pid))
+
+    def snapshot(self):
+        with self._lock:
+            wall = max(1e-6, time.time() - self._started_at)
+            done = self._done.value
+            busy = self._busy.value
+            return {
+                "stage": "ai",
+                "workers": self.workers,
+                "active": self._active.value,
+                "queued": self._waiting.value,
+                "done": done,
+                "per_min": round(done * 60.0 / wall, 2),
+                "avg_sec": round(busy / done, 1) if done else 0.0,
+                "utilization": round(busy / (wall * self.workers), 2),
+            }
+
+
+# Стадия публикации: ограниченная очередь + свои потоки (Strapi упирается в запись).
+# put() не блокирует: планировщик в том же цикле следит за таймаутами
+# партнеров и продлевает аренды очереди. Не влезшее в очередь ждет в
+# overflow и досылается через flush() на каждом тике планировщика
+class PublishStage:
+    def __init__(self, handler, workers=2, queue_size=8):
+        self.handler = handler
+        self.stats = StageStats("publish", max(1, int(workers)))
+        self.queue = queue.Queue(maxsize=max(1, int(queue_size)))
+        self.overflow = collections.deque()
+        self.threads = []
+        for i in range(self.stats.workers):
+            t = threading.Thread(target=self._loop, name=f"publish-{i}", daemon=True)
+            t.start()
+            self.threads.append(t)
+
+    def _loop(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                self.queue.task_done()
+                return
+            self.stats.begin()
+            t0 = time.time()
+            try:
+                self.handler(*item)
+            except Exception as e:
+                logger.error("publish stage: ошибка обработки %s: %s", item[0], e)
+            finally:
+                self.stats.end(time.time() - t0)
+                self.queue.task_done()
+
+    # Очередь заполнена - планировщик не берет новых партнеров (backpressure)
+    def saturated(self):
+        return bool(self.overflow) or self.queue.full()
+
+    def put(self, *item):
+        self.overflow.append(item)
+        self.flush()
+
+    # Дослать ожидающие задания, сколько влезет (вызывает только планировщик)
+    def flush(self):
+        while self.overflow:
+            try:
+                self.queue.put_nowait(self.overflow[0])
+            except queue.Full:
+                break
+            self.overflow.popleft()
+        self.stats.observe_depth(self.queue.qsize() + len(self.overflow))
+
+    # Сколько заданий еще ждет, в очереди или в работе
+    def pending(self):
+        return len(self.overflow) + self.queue.unfinished_tasks
+
+    def drain(self):
+        while self.overflow:
+            self.flush()
+            time.sleep(0.1)
+        self.queue.join()
+
+    def close(self):
+        for _ in self.threads:
+            self.queue.put(None)
+        for t in self.threads:
+            t.join()
+
+    def snapshot(self):
+        return self.stats.snapshot(depth=self.queue.qsize() + len(self.overflow))
+
+
+# Строка со сводкой по стадиям для терминала/лога
+def format_stage_line(snapshots):
+    parts = []
+    for s in snapshots:
+        parts.append(
+            f"{s['stage']}: {s['active']}/{s['workers']} busy, q={s['queued']}, "
+            f"done={s['done']}, {s['per_min']}/min, avg={s['avg_sec']}s, "
+            f"util={int(s['utilization'] * 100)}%"
+        )
+    return " | ".join(parts)
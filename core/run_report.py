@@ -0,0 +1,159 @@
+import json
+import os
+import threading
+import time
+
+from core.log_utils import get_logger
+from core.paths import STORAGE_RUNS_DIR
+
+# Логгер
+logger = get_logger("orchestrator")
+
+PARTNERS_JSONL = "partners.jsonl"
+SUMMARY_JSON = "summary.json"
+
+
+# Отчет прогона: storage/runs/{run_id}/partners.jsonl + summary.json
+class RunReport:
+    def __init__(self, run_id, shard=None, runs_dir=STORAGE_RUNS_DIR):
+        self.run_id = run_id
+        self.shard = shard
+        self.run_dir = os.path.join(runs_dir, run_id)
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+        os.makedirs(self.run_dir, exist_ok=True)
+
+    # Одна строка на партнера (пишут потоки стадии публикации)
+    def add_partner(self, record):
+        record = {"run_id": self.run_id, "shard": self.shard, **record}
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock:
+            try:
+                with open(
+                    os.path.join(self.run_dir, PARTNERS_JSONL), "a", encoding="utf-8"
+                ) as f:
+                    f.write(line)
+            except Exception as e:
+                logger.warning("run report: не удалось записать партнера: %s", e)
+
+    # Итог прогона: агрегаты по всем строкам partners.jsonl (с учетом resume)
+    def write_summary(self, **extra):
+        records = load_partner_records(self.run_dir)
+        summary = summarize(records)
+        summary.update(
+            {
+                "run_id": self.run_id,
+                "shard": self.shard,
+                "started_at": self.started_at,
+                "finished_at": time.time(),
+                "wall_sec": round(time.time() - self.started_at, 1),
+            }
+        )
+        summary.update(extra)
+        write_json(os.path.join(self.run_dir, SUMMARY_JSON), summary)
+        return summary
+
+
+# Чтение partners.jsonl (битые строки пропускаются)
+def load_partner_records(run_dir):
+    records = []
+    try:
+        with open(os.path.join(run_dir, PARTNERS_JSONL), "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    continue
+    except FileNotFoundError:
+        pass
+    return records
+
+
+# Самые долгие этапы партнера (для списка slowest)
+def _top_stages(rec, limit=3):
+    stages = rec.get("stages") or {}
+    top = sorted(stages.items(), key=lambda kv: kv[1].get("sec", 0), reverse=True)
+    return {name: st.get("sec") for name, st in top[:limit]}
+
+
+# Этапы по всем партнерам: суммарное/максимальное время, вызовы; по убыванию времени
+def _summarize_stages(records):
+    totals = {}
+    for rec in records:
+        for name, st in (rec.get("stages") or {}).items():
+            sec = float(st.get("sec") or 0)
+            cur = totals.setdefault(
+                name, {"sec": 0.0, "calls": 0, "partners": 0, "max_sec": 0.0}
+            )
+            cur["sec"] += sec
+            cur["calls"] += int(st.get("calls") or 0)
+            cur["partners"] += 1
+            cur["max_sec"] = max(cur["max_sec"], sec)
+    out = {}
+    for name, cur in sorted(totals.items(), key=lambda kv: kv[1]["sec"], reverse=True):
+        out[name] = {
+            "sec": round(cur["sec"], 2),
+            "calls": cur["calls"],
+            "partners": cur["partners"],
+            "avg_sec": round(cur["sec"] / cur["partners"], 2),
+            "max_sec": round(cur["max_sec"], 2),
+        }
+    return out
+
+
+def _summarize_cache(records):
+    totals = {}
+    for rec in records:
+        for name, c in (rec.get("cache") or {}).items():
+            cur = totals.setdefault(name, {"hit": 0, "miss": 0})
+            cur["hit"] += int(c.get("hit") or 0)
+            cur["miss"] += int(c.get("miss") or 0)
+    for cur in totals.values():
+        lookups = cur["hit"] + cur["miss"]
+        cur["hit_rate"] = round(cur["hit"] / lookups, 3) if lookups else 0.0
+    return totals
+
+
+# Агрегаты по строкам партнеров: количество по статусам, время, этапы, кэши
+def summarize(records):
+    by_status = {}
+    total_elapsed = 0.0
+    for rec in records:
+        status = rec.get("final_status") or rec.get("status") or "unknown"
+        by_status[status] = by_status.get(status, 0) + 1
+        total_elapsed += float(rec.get("elapsed") or 0)
+    slowest = sorted(records, key=lambda r: float(r.get("elapsed") or 0), reverse=True)
+    return {
+        "partners": len(records),
+        "by_status": by_status,
+        "partner_sec_total": round(total_elapsed, 1),
+        "stages": _summarize_stages(records),
+        "cache": _summarize_cache(records),
+        "slowest": [
+            {
+                "app": r.get("app"),
+                "url": r.get("url"),
+                "elapsed": r.get("elapsed"),
+                "top_stages": _top_stages(r),
+            }
+            for r in slowest[:10]
+        ],
+    }
+
+
+def write_json(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+__all__ = [
+    "PARTNERS_JSONL",
+    "SUMMARY_JSON",
+    "RunReport",
+    "load_partner_records",
+    "summarize",
+    "write_json",
+]
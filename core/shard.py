@@ -0,0 +1,160 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+
+from core.log_utils import get_logger
+from core.partner_cache import partner_url_key
+from core.paths import LEDGER_JSON, STORAGE_APPS_DIR, STORAGE_RUNS_DIR
+from core.run_report import (
+    PARTNERS_JSONL,
+    SUMMARY_JSON,
+    load_partner_records,
+    summarize,
+    write_json,
+)
+
+# Логгер
+logger = get_logger("orchestrator")
+
+
+# "2/4" -> (2, 4); шарды нумеруются с 1
+def parse_shard(value):
+    if not value:
+        return None
+    try:
+        index, count = (int(x) for x in str(value).split("/", 1))
+    except ValueError:
+        raise ValueError(f"Некорректный шард: {value!r} (пример: 2/4)")
+    if count < 1 or not 1 <= index <= count:
+        raise ValueError(f"Некорректный шард: {value!r} (нужно 1 <= i <= N)")
+    return index, count
+
+
+# Номер шарда по стабильному хэшу URL (общий партнер приложений - на одной ноде)
+def shard_of(url, count):
+    digest = hashlib.sha1(partner_url_key(url).encode("utf-8")).hexdigest()
+    return int(digest[:12], 16) % count + 1
+
+
+def owns(url, shard):
+    if not shard:
+        return True
+    index, count = shard
+    return shard_of(url, count) == index
+
+
+# Копирование дерева шарда: при совпадении файла побеждает более свежий
+def _merge_tree(src, dst):
+    copied = 0
+    for root, _dirs, files in os.walk(src):
+        rel = os.path.relpath(root, src)
+        target_dir = os.path.join(dst, rel) if rel != "." else dst
+        os.makedirs(target_dir, exist_ok=True)
+        for name in files:
+            if name.endswith(".tmp") or name.endswith(".checkpoint.json"):
+                continue
+            s_path = os.path.join(root, name)
+            d_path = os.path.join(target_dir, name)
+            if os.path.exists(d_path):
+                if os.path.getmtime(d_path) >= os.path.getmtime(s_path):
+                    continue
+            shutil.copy2(s_path, d_path)
+            copied += 1
+    return copied
+
+
+# Слияние журналов свежести: по каждому полю берем самую свежую отметку
+def _merge_ledgers(paths, dst_path):
+    merged = {}
+    for path in [dst_path] + list(paths):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except Exception:
+            continue
+        for key, entry in data.items():
+            cur = merged.setdefault(key, {})
+            if (entry.get("collected_at") or 0) >= (cur.get("collected_at") or 0):
+                cur.update({k: v for k, v in entry.items() if not k.endswith("_at")})
+            for k, v in entry.items():
+                if k.endswith("_at") and (v or 0) > (cur.get(k) or 0):
+                    cur[k] = v
+    if merged:
+        write_json(dst_path, merged)
+    return len(merged)
+
+
+# Последний (не merged) прогон в storage/runs шарда
+def _latest_run_dir(runs_dir):
+    try:
+        names = sorted(os.listdir(runs_dir))
+    except FileNotFoundError:
+        return None
+    for name in reversed(names):
+        path = os.path.join(runs_dir, name)
+        if not name.startswith("merged-") and os.path.isdir(path):
+            return path
+    return None
+
+
+# Слияние storage нескольких шардов в локальный storage + общий отчет
+def merge_shards(storage_dirs):
+    merged_id = time.strftime("merged-%Y%m%d-%H%M%S")
+    merged_dir = os.path.join(STORAGE_RUNS_DIR, merged_id)
+    os.makedirs(merged_dir, exist_ok=True)
+
+    files = 0
+    records = []
+    shards = []
+    for storage_dir in storage_dirs:
+        apps_dir = os.path.join(storage_dir, "apps")
+        if os.path.isdir(apps_dir):
+            files += _merge_tree(apps_dir, STORAGE_APPS_DIR)
+
+        # отчет шарда - его последний прогон (run_id начинается с даты)
+        run_dir = _latest_run_dir(os.path.join(storage_dir, "runs"))
+        if not run_dir:
+            logger.warning("merge: в %s нет отчетов прогонов", storage_dir)
+            continue
+        run_id = os.path.basename(run_dir)
+        local_run_dir = os.path.join(STORAGE_RUNS_DIR, run_id)
+        if os.path.abspath(run_dir) != os.path.abspath(local_run_dir):
+            _merge_tree(run_dir, local_run_dir)
+        records.extend(load_partner_records(run_dir))
+        try:
+            with open(os.path.join(run_dir, SUMMARY_JSON), "r", encoding="utf-8") as f:
+                shards.append(json.load(f))
+        except Exception:
+            shards.append({"run_id": run_id})
+
+    ledger_entries = _merge_ledgers(
+        [os.path.join(d, "ledger.json") for d in storage_dirs], LEDGER_JSON
+    )
+
+    with open(os.path.join(merged_dir, PARTNERS_JSONL), "w", encoding="utf-8") as f:
+        for rec in records:
+            f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+
+    summary = summarize(records)
+    summary.update(
+        {
+            "run_id": merged_id,
+            "sources": list(storage_dirs),
+            "shards": [
+                {k: s.get(k) for k in ("run_id", "shard", "partners", "wall_sec")}
+                for s in shards
+            ],
+            # ноды работают параллельно: итоговое время - самый долгий шард
+            "wall_sec": max((s.get("wall_sec") or 0 for s in shards), default=0),
+            "files_merged": files,
+            "ledger_entries": ledger_entries,
+        }
+    )
+    write_json(os.path.join(merged_dir, SUMMARY_JSON), summary)
+    logger.info("merge: %s", {k: summary[k] for k in ("partners", "files_merged")})
+    return merged_dir, summary
+
+
+__all__ = ["merge_shards", "owns", "parse_shard", "shard_of"]
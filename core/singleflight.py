@@ -0,0 +1,140 @@
+import asyncio
+import contextlib
+import fcntl
+import hashlib
+import os
+import threading
+
+from core.timing import cache_event
+
+
+# Один вызов в полете на ключ: первый поток выполняет fn, остальные с тем же
+# ключом ждут и получают его результат (или его исключение).
+# lock_dir - склейка и между процессами (fork-воркеры): лидер держит flock на
+# файле ключа, лидер другого процесса ждет и потом выполняет fn сам. Поэтому
+# задавать lock_dir имеет смысл, только если fn сначала смотрит в общий
+# дисковый кэш (http_cache) - тогда второй процесс получает готовый ответ
+class SingleFlight:
+    def __init__(self, name, lock_dir=None):
+        self.name = name
+        self.lock_dir = lock_dir
+        self._lock = threading.Lock()
+        self._calls = {}
+        _GROUPS.append(self)
+
+    # flock на ключ между процессами; файл удаляется лидером перед снятием
+    # блокировки (опоздавший создаст новый - в худшем случае fn выполнится
+    # дважды, второй раз из дискового кэша)
+    @contextlib.contextmanager
+    def _process_lock(self, key):
+        if not self.lock_dir:
+            yield
+            return
+        sha = hashlib.sha1(f"{self.name}|{key!r}".encode("utf-8")).hexdigest()
+        path = os.path.join(self.lock_dir, sha[:2], f"{sha}.lock")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "a") as lockf:
+            try:
+                fcntl.flock(lockf, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                waited = False
+            except BlockingIOError:
+                fcntl.flock(lockf, fcntl.LOCK_EX)
+                waited = True
+            # hit - другой процесс уже выполнял этот ключ
+            cache_event(f"singleflight.{self.name}.process", waited)
+            try:
+                yield
+            finally:
+                with contextlib.suppress(OSError):
+                    os.remove(path)
+                fcntl.flock(lockf, fcntl.LOCK_UN)
+
+    # Вызов ключа: (call, True для лидера). Потоки и корутины делят одну таблицу
+    def _join(self, key):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = {"event": threading.Event(), "result": None, "error": None}
+                self._calls[key] = call
+        # hit - результат взят у чужого вызова
+        cache_event(f"singleflight.{self.name}", not leader)
+        return call, leader
+
+    def _finish(self, key, call):
+        with self._lock:
+            self._calls.pop(key, None)
+        call["event"].set()
+
+    def do(self, key, fn):
+        call, leader = self._join(key)
+
+        if not leader:
+            call["event"].wait()
+            if call["error"] is not None:
+                raise call["error"]
+            return call["result"]
+
+        try:
+            with self._process_lock(key):
+                call["result"] = fn()
+        except BaseException as e:
+            call["error"] = e
+            raise
+        finally:
+            self._finish(key, call)
+        return call["result"]
+
+    # То же для корутин: fn() возвращает awaitable. Ожидание чужого вызова и
+    # flock другого процесса идут в потоке - event loop не блокируется
+    async def ado(self, key, fn):
+        call, leader = self._join(key)
+
+        if not leader:
+            await asyncio.to_thread(call["event"].wait)
+            if call["error"] is not None:
+                raise call["error"]
+            return call["result"]
+
+        try:
+            lock = self._process_lock(key)
+            entered = asyncio.ensure_future(asyncio.to_thread(lock.__enter__))
+            try:
+                await asyncio.shield(entered)
+            except asyncio.CancelledError:
+                # поток все равно возьмет flock - отпускаем, как только возьмет
+                entered.add_done_callback(lambda f: _release_late(f, lock))
+                raise
+            try:
+                call["result"] = await fn()
+            finally:
+                lock.__exit__(None, None, None)
+        except BaseException as e:
+            call["error"] = e
+            raise
+        finally:
+            self._finish(key, call)
+        return call["result"]
+
+
+def _release_late(entered, lock):
+    if not entered.cancelled() and entered.exception() is None:
+        lock.__exit__(None, None, None)
+
+
+_GROUPS = []
+
+
+# После fork вызовы родителя в полете ребенку не принадлежат, а блокировка
+# могла остаться захваченной
+def _reinit_after_fork():
+    for group in _GROUPS:
+        group._lock = threading.Lock()
+        group._calls = {}
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reinit_after_fork)
+
+
+__all__ = ["SingleFlight"]
@@ -0,0 +1,110 @@
+import functools
+import threading
+import time
+from contextlib import contextmanager
+
+from core.trace import span
+
+
+# Тайминги этапов (сек + число вызовов) и попадания/промахи кэшей
+class Timings:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.stages = {}
+        self.cache = {}
+
+    def reset(self):
+        with self._lock:
+            self.stages = {}
+            self.cache = {}
+
+    def add(self, name, sec, calls=1):
+        with self._lock:
+            cur = self.stages.setdefault(name, {"sec": 0.0, "calls": 0})
+            cur["sec"] += sec
+            cur["calls"] += calls
+
+    # Замер этапа; вложенные этапы считаются и в своем, и в объемлющем.
+    # При включенной трассировке этап - еще и спан
+    @contextmanager
+    def stage(self, name):
+        started = time.perf_counter()
+        try:
+            with span(name):
+                yield
+        finally:
+            self.add(name, time.perf_counter() - started)
+
+    def cache_event(self, name, hit):
+        with self._lock:
+            cur = self.cache.setdefault(name, {"hit": 0, "miss": 0})
+            cur["hit" if hit else "miss"] += 1
+
+    # Добавить снимок другого процесса/потока
+    def merge(self, snap):
+        for name, st in (snap or {}).get("stages", {}).items():
+            self.add(name, st.get("sec", 0.0), st.get("calls", 0))
+        for name, c in (snap or {}).get("cache", {}).items():
+            with self._lock:
+                cur = self.cache.setdefault(name, {"hit": 0, "miss": 0})
+                cur["hit"] += c.get("hit", 0)
+                cur["miss"] += c.get("miss", 0)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "stages": {
+                    k: {"sec": round(v["sec"], 3), "calls": v["calls"]}
+                    for k, v in self.stages.items()
+                },
+                "cache": {k: dict(v) for k, v in self.cache.items()},
+            }
+
+
+# Тайминги текущего процесса: воркер обрабатывает одного партнера за раз
+_PROCESS = Timings()
+
+
+def stage(name):
+    return _PROCESS.stage(name)
+
+
+# Декоратор: вся функция - один этап
+def timed(name):
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with _PROCESS.stage(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+# Время, измеренное не здесь (например, ожидание в пуле страниц браузера)
+def add_stage(name, sec):
+    _PROCESS.add(name, sec)
+
+
+def cache_event(name, hit):
+    _PROCESS.cache_event(name, hit)
+
+
+def reset_timings():
+    _PROCESS.reset()
+
+
+def timings_snapshot():
+    return _PROCESS.snapshot()
+
+
+__all__ = [
+    "Timings",
+    "add_stage",
+    "cache_event",
+    "reset_timings",
+    "stage",
+    "timed",
+    "timings_snapshot",
+]
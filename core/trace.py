@@ -0,0 +1,124 @@
+import glob
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Папка трассировки прогона (None - трассировка выключена)
+_TRACE_DIR = None
+
+# Атрибуты процесса, которые получает каждый спан (app, partner)
+_CONTEXT = {}
+
+_LOCK = threading.Lock()
+_NAMED_PIDS = set()
+
+TRACE_JSON = "trace.json"
+
+
+# После fork блокировка могла остаться захваченной потоком родителя
+def _reinit_after_fork():
+    global _LOCK
+    _LOCK = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reinit_after_fork)
+
+
+# Включение трассировки: спаны каждого процесса пишутся в {trace_dir}/{pid}.jsonl
+def enable_tracing(trace_dir):
+    global _TRACE_DIR
+    if not trace_dir:
+        return
+    os.makedirs(trace_dir, exist_ok=True)
+    _TRACE_DIR = trace_dir
+
+
+def tracing_enabled():
+    return _TRACE_DIR is not None
+
+
+# Подпись процесса в просмотрщике + атрибуты для всех его спанов
+def set_trace_context(process_name=None, **attrs):
+    _CONTEXT.clear()
+    _CONTEXT.update({k: v for k, v in attrs.items() if v})
+    if _TRACE_DIR is None or not process_name:
+        return
+    pid = os.getpid()
+    if pid in _NAMED_PIDS:
+        return
+    _NAMED_PIDS.add(pid)
+    _emit(
+        {
+            "name": "process_name",
+            "ph": "M",
+            "pid": pid,
+            "tid": 0,
+            "args": {"name": f"{process_name} {pid}"},
+        }
+    )
+
+
+def _emit(event):
+    line = json.dumps(event, ensure_ascii=False, default=str) + "\n"
+    try:
+        with _LOCK:
+            with open(
+                os.path.join(_TRACE_DIR, f"{os.getpid()}.jsonl"), "a", encoding="utf-8"
+            ) as f:
+                f.write(line)
+    except Exception:
+        pass
+
+
+# Спан (complete event "X" формата Chrome trace_event)
+@contextmanager
+def span(name, **args):
+    if _TRACE_DIR is None:
+        yield
+        return
+    started = time.time()
+    try:
+        yield
+    finally:
+        _emit(
+            {
+                "name": name,
+                "ph": "X",
+                "ts": int(started * 1_000_000),
+                "dur": int((time.time() - started) * 1_000_000),
+                "pid": os.getpid(),
+                "tid": threading.get_native_id(),
+                "args": {**_CONTEXT, **{k: v for k, v in args.items() if v}},
+            }
+        )
+
+
+# Сборка спанов всех процессов прогона в один trace.json (chrome://tracing, Perfetto)
+def write_chrome_trace(trace_dir, out_path):
+    events = []
+    for path in sorted(glob.glob(os.path.join(trace_dir, "*.jsonl"))):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    events.append(json.loads(line))
+                except ValueError:
+                    continue
+    events.sort(key=lambda e: e.get("ts", 0))
+    tmp_path = f"{out_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+    os.replace(tmp_path, out_path)
+    return len(events)
+
+
+__all__ = [
+    "TRACE_JSON",
+    "enable_tracing",
+    "set_trace_context",
+    "span",
+    "tracing_enabled",
+    "write_chrome_trace",
+]
@@ -0,0 +1,228 @@
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+
+from core.log_utils import get_logger
+from core.paths import QUEUE_DB
+
+# Логгер
+logger = get_logger("orchestrator")
+
+# Стадии заданий в очереди
+STAGE_PARTNER = "partner"
+STAGE_PUBLISH = "publish"
+
+# Статусы заданий
+QUEUED = "queued"
+LEASED = "leased"
+DONE = "done"
+FAILED = "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_id TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    key TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    lease_owner TEXT,
+    lease_until REAL,
+    error TEXT,
+    enqueued_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    UNIQUE (run_id, stage, key)
+);
+DROP INDEX IF EXISTS jobs_claim;
+CREATE INDEX IF NOT EXISTS jobs_run_claim ON jobs (run_id, status, lease_until, id);
+"""
+
+
+# Имя воркера для аренды: host:pid
+def worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+# Очередь заданий на SQLite с арендой (lease) и heartbeat
+class WorkQueue:
+    def __init__(
+        self, path=QUEUE_DB, lease_sec=120, max_attempts=2, journal_mode="WAL"
+    ):
+        self.path = path
+        self.lease_sec = float(lease_sec)
+        self.max_attempts = int(max_attempts)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # соединение общее для планировщика и потоков публикации - под блокировкой;
+        # autocommit, транзакции открываем явно (BEGIN IMMEDIATE при захвате)
+        self._lock = threading.RLock()
+        self.conn = sqlite3.connect(
+            path, timeout=30, isolation_level=None, check_same_thread=False
+        )
+        self.conn.row_factory = sqlite3.Row
+        # WAL - для одной машины; на общем сетевом диске нужен DELETE
+        self.conn.execute(f"PRAGMA journal_mode={journal_mode}")
+        self.conn.execute("PRAGMA busy_timeout=30000")
+        self.conn.executescript(_SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+    # Постановка задания (повтор того же run_id/stage/key игнорируется);
+    # owner - сразу в аренду этому воркеру (публикация там, где лежат файлы)
+    def enqueue(self, run_id, stage, key, payload, owner=None):
+        now = time.time()
+        if owner:
+            status, attempts, lease_until = LEASED, 1, now + self.lease_sec
+        else:
+            status, attempts, lease_until = QUEUED, 0, None
+        with self._lock:
+            cur = self.conn.execute(
+                "INSERT OR IGNORE INTO jobs (run_id, stage, key, payload, status, "
+                "attempts, lease_owner, lease_until, enqueued_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    run_id,
+                    stage,
+                    key,
+                    json.dumps(payload, ensure_ascii=False),
+                    status,
+                    attempts,
+                    owner,
+                    lease_until,
+                    now,
+                    now,
+                ),
+            )
+            return cur.lastrowid if cur.rowcount else None
+
+    # Захват следующего задания прогона run_id: свободного или с истекшей арендой
+    def claim(self, owner, run_id):
+        now = time.time()
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self.conn.execute(
+                    "SELECT * FROM jobs WHERE run_id = ? AND (status = ? OR "
+                    "(status = ? AND lease_until < ?)) AND attempts < ? "
+                    "ORDER BY id LIMIT 1",
+                    (run_id, QUEUED, LEASED, now, self.max_attempts),
+                ).fetchone()
+                if row is not None:
+                    self.conn.execute(
+                        "UPDATE jobs SET status = ?, lease_owner = ?, "
+                        "lease_until = ?, attempts = attempts + 1, updated_at = ? "
+                        "WHERE id = ?",
+                        (LEASED, owner, now + self.lease_sec, now, row["id"]),
+                    )
+                else:
+                    # просроченные аренды прогона без попыток в запасе - в failed
+                    self.conn.execute(
+                        "UPDATE jobs SET status = ?, error = 'lease expired', "
+                        "updated_at = ? WHERE run_id = ? AND status = ? "
+                        "AND lease_until < ?",
+                        (FAILED, now, run_id, LEASED, now),
+                    )
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+
+        if row is None:
+            return None
+        if row["status"] == LEASED:
+            logger.warning(
+                "queue: аренда %s истекла, %s %s возвращено в работу",
+                row["lease_owner"],
+                row["stage"],
+                row["key"],
+            )
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"])
+        job["attempts"] += 1
+        return job
+
+    # Последний поставленный прогон с незавершенными заданиями (для --worker)
+    def latest_run(self):
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT run_id FROM jobs WHERE status IN (?, ?) "
+                "ORDER BY enqueued_at DESC, id DESC LIMIT 1",
+                (QUEUED, LEASED),
+            ).fetchone()
+        return row["run_id"] if row else None
+
+    # Продление всех аренд воркера одним запросом
+    def heartbeat(self, owner):
+        now = time.time()
+        with self._lock:
+            cur = self.conn.execute(
+                "UPDATE jobs SET lease_until = ?, updated_at = ? "
+                "WHERE status = ? AND lease_owner = ?",
+                (now + self.lease_sec, now, LEASED, owner),
+            )
+            return cur.rowcount
+
+    def complete(self, job_id, owner):
+        with self._lock:
+            cur = self.conn.execute(
+                "UPDATE jobs SET status = ?, lease_until = NULL, updated_at = ? "
+                "WHERE id = ? AND lease_owner = ? AND status = ?",
+                (DONE, time.time(), job_id, owner, LEASED),
+            )
+            return bool(cur.rowcount)
+
+    # Отказ: назад в очередь, пока есть попытки; иначе failed. Возвращает статус
+    def fail(self, job_id, owner, error=""):
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT attempts FROM jobs WHERE id = ? AND lease_owner = ? "
+                "AND status = ?",
+                (job_id, owner, LEASED),
+            ).fetchone()
+            if row is None:
+                return None
+            status = QUEUED if row["attempts"] < self.max_attempts else FAILED
+            self.conn.execute(
+                "UPDATE jobs SET status = ?, lease_owner = NULL, lease_until = NULL, "
+                "error = ?, updated_at = ? WHERE id = ?",
+                (status, str(error)[:500], time.time(), job_id),
+            )
+            return status
+
+    # Сколько заданий еще не завершено (в очереди или в аренде)
+    def pending(self, run_id=None):
+        sql = "SELECT COUNT(*) FROM jobs WHERE status IN (?, ?)"
+        params = [QUEUED, LEASED]
+        if run_id:
+            sql += " AND run_id = ?"
+            params.append(run_id)
+        with self._lock:
+            return self.conn.execute(sql, params).fetchone()[0]
+
+    def counts(self, run_id=None):
+        sql = "SELECT stage, status, COUNT(*) AS n FROM jobs"
+        params = []
+        if run_id:
+            sql += " WHERE run_id = ?"
+            params.append(run_id)
+        sql += " GROUP BY stage, status"
+        with self._lock:
+            rows = self.conn.execute(sql, params).fetchall()
+        return {f"{r['stage']}:{r['status']}": r["n"] for r in rows}
+
+
+__all__ = [
+    "DONE",
+    "FAILED",
+    "LEASED",
+    "QUEUED",
+    "STAGE_PARTNER",
+    "STAGE_PUBLISH",
+    "WorkQueue",
+    "worker_id",
+]
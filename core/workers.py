@@ -0,0 +1,279 @@
+import os
+import resource
+import time
+
+from core.log_utils import get_logger
+
+# Логгер
+logger = get_logger("orchestrator")
+
+
+# Текущий RSS процесса в МБ (/proc, фолбэк - пиковый ru_maxrss)
+def current_rss_mb() -> float:
+    try:
+        with open("/proc/self/statm", "r") as f:
+            rss_pages = int(f.read().split()[1])
+        return rss_pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except Exception:
+        pass
+    try:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    except Exception:
+        return 0.0
+
+
+# Результат задания: status или (status, timings)
+def _split_result(result):
+    if isinstance(result, tuple):
+        return result
+    return result, None
+
+
+# Цель процесса в режиме fork-per-partner: одно задание и выход
+def _fork_target(result_q, run_job, job):
+    os.environ["DISABLE_CHILD_SPINNER"] = "1"
+    status, timings = _split_result(run_job(job))
+    # отдаем статус (и тайминги этапов) родителю
+    try:
+        result_q.put((status, timings, False))
+    except Exception:
+        pass
+
+
+# Цель процесса в режиме пула: крутится, пока не исчерпан лимит заданий/памяти.
+# on_stop - перед выходом воркера: процесс mp выходит через os._exit, atexit
+# не сработает, сервисы воркера (браузер) надо закрыть явно
+def _pool_target(task_q, result_q, run_job, max_jobs, max_rss_mb, on_stop=None):
+    os.environ["DISABLE_CHILD_SPINNER"] = "1"
+    try:
+        _pool_loop(task_q, result_q, run_job, max_jobs, max_rss_mb)
+    finally:
+        if on_stop is not None:
+            on_stop()
+
+
+def _pool_loop(task_q, result_q, run_job, max_jobs, max_rss_mb):
+    done = 0
+    while True:
+        job = task_q.get()
+        if job is None:
+            break
+        status, timings = _split_result(run_job(job))
+        done += 1
+
+        rss = current_rss_mb()
+        recycle = bool(
+            (max_jobs and done >= max_jobs) or (max_rss_mb and rss >= max_rss_mb)
+        )
+        if recycle:
+            logger.info(
+                "Воркер pid=%s уходит на рецикл: jobs=%d, rss=%.0f MB",
+                os.getpid(),
+                done,
+                rss,
+            )
+        try:
+            result_q.put((status, timings, recycle))
+        except Exception:
+            break
+        if recycle:
+            break
+
+
+# Раннер "один процесс на партнера" (поведение по умолчанию).
+# on_exit(pid) - после убийства или падения воркера: вернуть то, что он
+# держал в общих ресурсах (слоты AiGate)
+class ForkPerPartnerRunner:
+    def __init__(self, ctx, size, run_job, partner_timeout, on_exit=None):
+        self.ctx = ctx
+        self.size = max(1, int(size))
+        self.run_job = run_job
+        self.partner_timeout = partner_timeout
+        self.on_exit = on_exit
+        self.running = []
+
+    def free_slots(self):
+        return self.size - len(self.running)
+
+    def in_flight(self):
+        return [slot["job"] for slot in self.running]
+
+    def submit(self, job):
+        q = self.ctx.Queue()
+        p = self.ctx.Process(target=_fork_target, args=(q, self.run_job, job))
+        p.start()
+        self.running.append({"job": job, "proc": p, "queue": q, "started": time.time()})
+
+    # Сбор завершившихся: список (job, status | None при таймауте, elapsed);
+    # тайминги этапов воркера - в job["timings"]
+    def poll(self):
+        finished = []
+        still_running = []
+        for slot in self.running:
+            p = slot["proc"]
+            elapsed = time.time() - slot["started"]
+
+            if p.is_alive():
+                if elapsed < self.partner_timeout:
+                    still_running.append(slot)
+                    continue
+                # таймаут: жестко убиваем воркер
+                p.terminate()
+                p.join()
+                self._released(p)
+                finished.append((slot["job"], None, elapsed))
+                continue
+
+            # воркер завершился сам - забираем его статус и тайминги
+            try:
+                status, timings, _ = slot["queue"].get_nowait()
+                if timings:
+                    slot["job"]["timings"] = timings
+            except Exception:
+                status = "ok" if (p.exitcode == 0) else "error"
+            p.join()
+            if p.exitcode != 0:
+                self._released(p)
+            finished.append((slot["job"], status, elapsed))
+
+        self.running = still_running
+        return finished
+
+    def _released(self, proc):
+        if self.on_exit is not None:
+            self.on_exit(proc.pid)
+
+    def close(self):
+        for slot in self.running:
+            if slot["proc"].is_alive():
+                slot["proc"].terminate()
+            slot["proc"].join()
+            self._released(slot["proc"])
+        self.running = []
+
+
+# Пул теплых воркеров: процессы живут между партнерами, кэши модулей
+# и сервисы (браузер) не теряются; on_stop - в воркере перед его выходом
+class WarmWorkerPool:
+    def __init__(
+        self,
+        ctx,
+        size,
+        run_job,
+        partner_timeout,
+        max_jobs=20,
+        max_rss_mb=0,
+        on_exit=None,
+        on_stop=None,
+    ):
+        self.ctx = ctx
+        self.size = max(1, int(size))
+        self.run_job = run_job
+        self.partner_timeout = partner_timeout
+        self.on_exit = on_exit
+        self.on_stop = on_stop
+        self.max_jobs = int(max_jobs or 0)
+        self.max_rss_mb = float(max_rss_mb or 0)
+        self.workers = [self._spawn() for _ in range(self.size)]
+
+    def _spawn(self):
+        # у каждого воркера свои очереди: убийство зависшего не портит чужие
+        task_q = self.ctx.Queue()
+        result_q = self.ctx.Queue()
+        p = self.ctx.Process(
+            target=_pool_target,
+            args=(
+                task_q,
+                result_q,
+                self.run_job,
+                self.max_jobs,
+                self.max_rss_mb,
+                self.on_stop,
+            ),
+        )
+        p.daemon = True
+        p.start()
+        return {
+            "proc": p,
+            "task_q": task_q,
+            "result_q": result_q,
+            "job": None,
+            "started": 0.0,
+        }
+
+    def _replace(self, idx, kill=False):
+        w = self.workers[idx]
+        if kill and w["proc"].is_alive():
+            w["proc"].terminate()
+        w["proc"].join(timeout=5)
+        if self.on_exit is not None:
+            self.on_exit(w["proc"].pid)
+        self.workers[idx] = self._spawn()
+
+    def free_slots(self):
+        return sum(1 for w in self.workers if w["job"] is None)
+
+    def in_flight(self):
+        return [w["job"] for w in self.workers if w["job"] is not None]
+
+    def submit(self, job):
+        for w in self.workers:
+            if w["job"] is None:
+                w["job"] = job
+                w["started"] = time.time()
+                w["task_q"].put(job)
+                return
+        raise RuntimeError("WarmWorkerPool: нет свободного воркера")
+
+    # Сбор завершившихся: список (job, status | None при таймауте, elapsed);
+    # тайминги этапов воркера - в job["timings"]
+    def poll(self):
+        finished = []
+        for idx, w in enumerate(self.workers):
+            job = w["job"]
+            if job is None:
+                # простаивающий воркер мог умереть сам (OOM и т.п.) - заменяем
+                if not w["proc"].is_alive():
+                    self._replace(idx)
+                continue
+
+            elapsed = time.time() - w["started"]
+            try:
+                status, timings, recycle = w["result_q"].get_nowait()
+            except Exception:
+                status, recycle = None, False
+            else:
+                w["job"] = None
+                if timings:
+                    job["timings"] = timings
+                finished.append((job, status, elapsed))
+                if recycle:
+                    self._replace(idx)
+                continue
+
+            if not w["proc"].is_alive():
+                # воркер упал посреди задания
+                logger.warning("Воркер пула умер на %s, заменяем", job.get("url"))
+                w["job"] = None
+                finished.append((job, "error", elapsed))
+                self._replace(idx)
+            elif elapsed >= self.partner_timeout:
+                # зависшее задание: убиваем воркер и ставим нового
+                w["job"] = None
+                finished.append((job, None, elapsed))
+                self._replace(idx, kill=True)
+        return finished
+
+    def close(self):
+        for w in self.workers:
+            if w["proc"].is_alive() and w["job"] is None:
+                try:
+                    w["task_q"].put(None)
+                except Exception:
+                    pass
+        for w in self.workers:
+            w["proc"].join(timeout=5)
+            if w["proc"].is_alive():
+                w["proc"].terminate()
+                w["proc"].join()
+        self.workers = []
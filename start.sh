@@ -1,3 +1,3 @@
 #!/bin/bash
 
-python3 config/start.py
+python3 config/start.py "$@"
@@ -0,0 +1,12 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import core.paths  # noqa: E402
+
+# Без config.json (чистый checkout) настройки читаются из шаблона
+if not os.path.exists(core.paths.CONFIG_JSON):
+    core.paths.CONFIG_JSON = os.path.join(core.paths.CONFIG_DIR, "config.tpl")
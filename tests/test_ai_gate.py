@@ -0,0 +1,59 @@
+import multiprocessing as mp
+import os
+import time
+
+import pytest
+
+from core.pipeline import AiGate
+from core.workers import ForkPerPartnerRunner
+
+pytestmark = pytest.mark.skipif(
+    "fork" not in mp.get_all_start_methods(), reason="нужен fork"
+)
+
+
+# Воркер занимает слот AI и зависает в "LLM-запросе"
+def _hold_slot(job, gate):
+    with gate.slot():
+        time.sleep(60)
+
+
+def _wait_active(gate, n, timeout=10.0):
+    deadline = time.time() + timeout
+    while gate.snapshot()["active"] != n and time.time() < deadline:
+        time.sleep(0.05)
+    return gate.snapshot()["active"]
+
+
+def test_runner_returns_slot_of_killed_worker():
+    ctx = mp.get_context("fork")
+    gate = AiGate(ctx, 1)
+    runner = ForkPerPartnerRunner(
+        ctx,
+        1,
+        lambda job: _hold_slot(job, gate),
+        partner_timeout=0.5,
+        on_exit=gate.release_pid,
+    )
+    runner.submit({"name": "slow"})
+    assert _wait_active(gate, 1) == 1
+    while not runner.poll():
+        time.sleep(0.1)
+    assert gate.snapshot()["active"] == 0
+    with gate.slot():
+        assert gate.snapshot()["active"] == 1
+    assert gate.snapshot()["active"] == 0
+
+
+def test_waiter_reclaims_slot_of_dead_holder(monkeypatch):
+    ctx = mp.get_context("fork")
+    gate = AiGate(ctx, 1)
+    proc = ctx.Process(target=_hold_slot, args=(None, gate))
+    proc.start()
+    assert _wait_active(gate, 1) == 1
+    os.kill(proc.pid, 9)
+    proc.join()
+    monkeypatch.setattr("core.pipeline._AI_REAP_SEC", 0.1)
+    with gate.slot():
+        assert gate.snapshot()["active"] == 1
+    assert gate.snapshot()["active"] == 0
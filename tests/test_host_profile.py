@@ -0,0 +1,47 @@
+import pytest
+
+pytest.importorskip("bs4")
+
+from core.parser import host_profile, web  # noqa: E402
+
+SPA_SHELL = '<html><body><div id="__next"></div><script src="/app.js"></script>'
+RENDERED = '<html><body><a href="https://x.com/acmeprotocol">X</a></body></html>'
+
+
+# Профили хостов - во временном файле; сеть и браузер подменены
+@pytest.fixture
+def profiles(tmp_path, monkeypatch):
+    monkeypatch.setattr(host_profile, "HOST_PROFILES_JSON", str(tmp_path / "hp.json"))
+    monkeypatch.setattr(host_profile, "_CACHE", {})
+    monkeypatch.setattr(host_profile, "_CACHE_STAMP", None)
+    monkeypatch.setattr(host_profile, "_ENABLED", True)
+    monkeypatch.setattr(web._FETCH_FLIGHT, "lock_dir", None)
+    monkeypatch.setattr(web, "FETCHED_HTML_CACHE", {})
+    calls = []
+    monkeypatch.setattr(
+        web, "_http_get", lambda url, t: calls.append("http") or SPA_SHELL
+    )
+    monkeypatch.setattr(
+        web, "_browser_get", lambda url: calls.append("browser") or RENDERED
+    )
+    return calls
+
+
+def test_spa_shell_teaches_browser(profiles):
+    url = "https://spa.example/"
+    assert host_profile.preferred_method(url) is None
+    assert web.fetch_url_html(url) == RENDERED
+    assert profiles == ["http", "browser"]
+    assert host_profile.preferred_method(url) == host_profile.BROWSER
+
+    # следующая страница хоста - сразу браузер, без requests
+    web.FETCHED_HTML_CACHE.clear()
+    assert web.fetch_url_html("https://spa.example/about") == RENDERED
+    assert profiles == ["http", "browser", "browser"]
+
+
+def test_http_verdict_expires(profiles, monkeypatch):
+    url = "https://spa.example/"
+    web.fetch_url_html(url)
+    monkeypatch.setattr(host_profile, "_TTL_SEC", -1.0)
+    assert host_profile.preferred_method(url) is None
@@ -0,0 +1,276 @@
+import os
+
+import pytest
+
+pytest.importorskip("bs4")
+pytest.importorskip("lxml")
+
+from core.parser import link_aggregator, nitter, page, twitter, web  # noqa: E402
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+BACKENDS = (page.HTML_PARSER, page.LXML)
+
+
+def _fixture(name: str) -> str:
+    with open(os.path.join(FIXTURES, name), "r", encoding="utf-8") as f:
+        return f.read()
+
+
+# Результат fn на каждом бэкенде: soup страниц строится заново выбранным парсером
+@pytest.fixture
+def on_backends(monkeypatch):
+    def run(fn):
+        out = {}
+        for backend in BACKENDS:
+            monkeypatch.setattr(page, "_PARSER", backend)
+            page._PAGES.clear()
+            out[backend] = fn()
+        return out
+
+    yield run
+    page._PAGES.clear()
+
+
+# Экстракторы не ходят в сеть: docs, iframe и браузер - пустые
+@pytest.fixture
+def offline(monkeypatch):
+    monkeypatch.setattr(web, "fetch_url_html", lambda *a, **kw: "")
+    monkeypatch.setattr(web, "_browser_get", lambda *a, **kw: "")
+    monkeypatch.setattr(link_aggregator, "fetch_url_html", lambda *a, **kw: "")
+
+
+def _same(results: dict):
+    values = list(results.values())
+    assert all(v == values[0] for v in values[1:]), results
+    return values[0]
+
+
+def test_lxml_backend_is_used():
+    assert page.parse_html("<p>x</p>", page.LXML).builder.NAME == page.LXML
+    assert page.parse_html("<p>x</p>", page.HTML_PARSER).builder.NAME == (
+        page.HTML_PARSER
+    )
+
+
+@pytest.mark.parametrize(
+    "name",
+    ["landing.html", "aggregator.html", "x_profile.html", "x_profile_meta.html"],
+)
+def test_meta_same_on_both_backends(on_backends, name):
+    html = _fixture(name)
+
+    def soup_meta():
+        soup = page.as_page(html).soup
+        return [
+            (m.get("property") or m.get("name"), m.get("content"))
+            for m in soup.find_all("meta", content=True)
+        ]
+
+    assert _same(on_backends(soup_meta))
+
+
+@pytest.mark.parametrize(
+    "name, base_url, expected",
+    [
+        (
+            "landing.html",
+            "https://acme.example/",
+            {
+                "twitterURL": "https://x.com/acmeprotocol",
+                "discordURL": "https://discord.gg/acme",
+                "telegramURL": "https://t.me/acmeprotocol",
+                "githubURL": "https://github.com/acme-protocol",
+                "linkedinURL": "https://www.linkedin.com/company/acme-protocol/",
+                "documentURL": "https://docs.acme.example/",
+            },
+        ),
+        # фрагмент без <body>: html.parser оставляет верхний <div> зоной
+        # "первый блок", libxml2 заворачивает все в body - такой зоны нет
+        (
+            "broken.html",
+            "https://borked.example/",
+            {
+                "twitterURL": "https://twitter.com/borkedfi",
+                "discordURL": "https://discord.com/invite/borked",
+                "mediumURL": "https://medium.com/borked",
+                "telegramURL": {
+                    page.HTML_PARSER: "https://t.me/borked",
+                    page.LXML: "",
+                },
+            },
+        ),
+    ],
+)
+def test_social_links(on_backends, offline, name, base_url, expected):
+    html = _fixture(name)
+    results = on_backends(
+        lambda: web.extract_social_links(page.as_page(html, base_url), base_url)
+    )
+    for backend, links in results.items():
+        for key, value in expected.items():
+            if isinstance(value, dict):
+                value = value[backend]
+            assert links[key] == value, (backend, key)
+
+
+# iframe на той же площадке: поиск идет по page.soup выбранного бэкенда,
+# чужие фреймы пропускаются, после первого фрейма с соцсетями обход стоп
+def test_social_links_from_iframe(on_backends, offline, monkeypatch):
+    html = _fixture("iframe_host.html")
+    base_url = "https://widget.example/"
+    frame = (
+        '<footer><a href="https://twitter.com/widgetfi">Twitter</a>'
+        '<a href="https://discord.gg/widget">Discord</a></footer>'
+    )
+    fetched = []
+
+    def fake_fetch(url, *a, **kw):
+        fetched.append(url)
+        return frame if url.endswith("/embed/community.html") else ""
+
+    monkeypatch.setattr(web, "fetch_url_html", fake_fetch)
+
+    def run():
+        fetched.clear()
+        links = web.extract_social_links(page.as_page(html, base_url), base_url)
+        return links["twitterURL"], links["discordURL"], list(fetched)
+
+    assert _same(on_backends(run)) == (
+        "https://twitter.com/widgetfi",
+        "https://discord.gg/widget",
+        ["https://widget.example/embed/community.html"],
+    )
+
+
+# Индексы потокового прохода против того же разбора через soup бэкенда:
+# зоны - прежние селекторы (header/nav, footer, первый блок, последний в body)
+def _soup_view(html: str, backend: str):
+    soup = page.parse_html(html, backend)
+    anchors = []
+    for a in soup.find_all("a", href=True):
+        zone = a.find_parent(["header", "nav", "footer"])
+        anchors.append(
+            (a["href"], a.get_text(" ", strip=True), zone.name if zone else "body")
+        )
+
+    meta = {}
+    for m in soup.find_all("meta", content=True):
+        for attr in ("property", "name"):
+            key = (m.get(attr) or "").strip().lower()
+            if key and key not in meta:
+                meta[key] = m["content"]
+
+    title = ((soup.title.string if soup.title else "") or "").strip()
+
+    zones = soup.select("header, nav") + soup.select("footer")
+    zones.append(soup.find(["div", "section"], recursive=False))
+    zones.append(soup.select_one("body > :last-child"))
+    zone_links = []
+    for zone in zones:
+        for a in zone.find_all("a", href=True) if zone is not None else ():
+            if a["href"] not in zone_links:
+                zone_links.append(a["href"])
+    return anchors, meta, title, zone_links
+
+
+def _scan_view(html: str):
+    parsed = page.ParsedPage(html, "https://scan.example/")
+    zone_links = []
+    for a, _ in parsed.zone_links():
+        if a.href not in zone_links:
+            zone_links.append(a.href)
+    return [tuple(a) for a in parsed.anchors], parsed.meta, parsed.title, zone_links
+
+
+@pytest.mark.parametrize("name", sorted(os.listdir(FIXTURES)))
+def test_scan_matches_soup(on_backends, name):
+    html = _fixture(name)
+    results = on_backends(lambda: (_scan_view(html), _soup_view(html, page._PARSER)))
+    for backend, (scanned, souped) in results.items():
+        assert scanned == souped, backend
+
+
+def test_aggregator_redirects(on_backends, offline):
+    html = _fixture("aggregator.html")
+    base_url = "https://linktr.ee/acmeprotocol"
+    socials = _same(
+        on_backends(
+            lambda: link_aggregator.extract_socials_raw_from_html(html, base_url)
+        )
+    )
+    assert socials["twitterURL"] == "https://x.com/acmeprotocol"
+    assert socials["discordURL"] == "https://discord.gg/acme"
+    assert socials["telegramURL"] == "https://t.me/acmeprotocol"
+    assert socials["githubURL"] == "https://github.com/acme-protocol"
+    assert socials["mediumURL"] == "https://medium.com/@acme"
+    assert socials["websiteURL"] == "https://acme.example/"
+
+    aggregators = _same(
+        on_backends(lambda: twitter.extract_link_collection_urls(html, base_url))
+    )
+    assert aggregators == ["https://linktr.ee/acme_backup"]
+
+
+def test_twitter_profiles(on_backends):
+    html = _fixture("landing.html")
+    base_url = "https://acme.example/"
+    profiles = _same(
+        on_backends(lambda: twitter.extract_twitter_profiles(html, base_url))
+    )
+    assert profiles == ["https://x.com/acmeprotocol"]
+
+
+@pytest.mark.parametrize(
+    "name, base_url, expected",
+    [
+        ("landing.html", "https://acme.example/", "Acme Protocol"),
+        ("broken.html", "https://borked.example/", "Borked Finance"),
+    ],
+)
+def test_project_name(on_backends, name, base_url, expected):
+    html = _fixture(name)
+    assert (
+        _same(on_backends(lambda: web.extract_project_name(html, base_url))) == expected
+    )
+
+
+def test_x_profile(on_backends):
+    html = _fixture("x_profile.html")
+    parsed = _same(
+        on_backends(
+            lambda: {
+                k: sorted(v) if isinstance(v, list) else v
+                for k, v in twitter._parse_x_profile_html(html).items()
+            }
+        )
+    )
+    assert parsed["name"] == "Acme Protocol"
+    assert "profile_images/1700000000000000000/AbCdEf" in parsed["avatar"]
+    assert "https://github.com/acme-protocol" in parsed["links"]
+    assert "https://discord.gg/acme" in parsed["links"]
+    assert parsed["handles"] == ["@acmelabs"]
+
+
+def test_x_profile_og_image(on_backends):
+    html = _fixture("x_profile_meta.html")
+    parsed = _same(on_backends(lambda: twitter._parse_x_profile_html(html)))
+    assert parsed["name"] == "Borked Finance"
+    assert "profile_images/1699999999999999999/XyZ" in parsed["avatar"]
+
+
+def test_nitter_profile(on_backends, monkeypatch):
+    html = _fixture("nitter_profile.html")
+    inst = "https://nitter.example"
+    monkeypatch.setattr(nitter, "fetch_profile_html", lambda *a, **kw: (html, inst))
+    profile = _same(
+        on_backends(
+            lambda: {
+                k: sorted(v) if isinstance(v, list) else v
+                for k, v in nitter.parse_profile("acmeprotocol").items()
+            }
+        )
+    )
+    assert profile["name"] == "Acme Protocol"
+    assert "profile_images/1700000000000000000/AbCdEf" in profile["avatar"]
+    assert profile["links"] == ["https://acme.example", "https://t.me/acmeprotocol"]
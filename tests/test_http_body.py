@@ -0,0 +1,97 @@
+import os
+
+import pytest
+
+pytest.importorskip("bs4")
+
+from core import http_client  # noqa: E402
+from core.parser import page, web  # noqa: E402
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def _fixture(name: str) -> str:
+    with open(os.path.join(FIXTURES, name), "r", encoding="utf-8") as f:
+        return f.read()
+
+
+# Ответ requests (stream=True), отдающий тело мелкими кусками
+class _Response:
+    status_code = 200
+    encoding = "utf-8"
+
+    def __init__(self, url, text, piece=256):
+        self.url = url
+        self.headers = {"Content-Type": "text/html; charset=utf-8"}
+        self._body = text.encode()
+        self._piece = piece
+
+    def iter_content(self, chunk_size):
+        for i in range(0, len(self._body), self._piece):
+            yield self._body[i : i + self._piece]
+
+    def close(self):
+        pass
+
+
+# Сеть, дисковый кэш и профиль хоста подменены; put - записи в кэш
+@pytest.fixture
+def served(monkeypatch):
+    put = []
+    pages = {}
+
+    class _Session:
+        def get(self, url, **kwargs):
+            return _Response(url, pages[url])
+
+    monkeypatch.setattr(web, "get_session", lambda service: _Session())
+    monkeypatch.setattr(web, "cache_get", lambda url, mode: None)
+    monkeypatch.setattr(web, "cache_put", lambda url, *a, **kw: put.append(url))
+    monkeypatch.setattr(web, "record_outcome", lambda *a, **kw: None)
+    monkeypatch.setattr(web, "fetch_url_html", lambda *a, **kw: "")
+    monkeypatch.setattr(web, "_browser_get", lambda *a, **kw: "")
+    page._PAGES.clear()
+    yield pages, put
+    page._PAGES.clear()
+
+
+# Скрипт после </body> дочитывается (поток кончился в пределах STOP_TAIL):
+# тело полное, идет в кэш, raw-фолбэк находит в нем соцсети
+def test_post_body_script_kept(served):
+    pages, put = served
+    url = "https://late.example/"
+    pages[url] = _fixture("post_body_script.html")
+
+    html = web._http_get(url, 10)
+    assert html == pages[url]
+    assert put == [url]
+
+    links = web.extract_social_links(page.as_page(html, url), url)
+    assert links["twitterURL"] == "https://twitter.com/latefinance"
+    assert links["discordURL"] == "https://discord.gg/latefinance"
+
+
+# Хвост после маркера длиннее STOP_TAIL: чтение обрывается, тело в кэш не идет
+def test_stopped_body_not_cached(served):
+    pages, put = served
+    url = "https://long.example/"
+    tail = "<script>" + "x" * (2 * http_client.STOP_TAIL) + "</script></html>"
+    pages[url] = "<html><body><p>hi</p></body>" + tail
+
+    html = web._http_get(url, 10)
+    assert html.startswith("<html><body><p>hi</p></body>")
+    assert not html.endswith("</html>")
+    assert put == []
+
+
+def test_capped_body_marker_across_chunks():
+    body = http_client.CappedBody(max_bytes=1024, stop_at=(b"</body>",))
+    assert not body.feed(b"<p>x</bo")
+    assert not body.feed(b"dy>")
+    assert not body.partial
+    assert body.feed(b"y" * http_client.STOP_TAIL)
+    assert body.partial
+
+    capped = http_client.CappedBody(max_bytes=4)
+    assert capped.feed(b"abcdef")
+    assert capped.partial and capped.text("u") == "abcd"
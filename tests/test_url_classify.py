@@ -0,0 +1,139 @@
+import re
+
+import pytest
+
+from core.parser.link_aggregator import _embedded_social_keys
+from core.parser.url_classify import (
+    LINK_COLLECTION_DOMAINS,
+    classify_host,
+    classify_url,
+)
+
+# Правила до общего индекса: SOCIAL_PATTERNS из web.py (без websiteURL и
+# documentURL) и SOCIAL_PATTS из link_aggregator.py, как были
+OLD_WEB = {
+    "twitterURL": re.compile(r"^https?://(?:www\.)?(?:twitter\.com|x\.com)/", re.I),
+    "discordURL": re.compile(r"^https?://(?:www\.)?discord\.(?:gg|com)/", re.I),
+    "telegramURL": re.compile(r"^https?://(?:www\.)?(?:t\.me|telegram\.me)/", re.I),
+    "youtubeURL": re.compile(r"^https?://(?:www\.)?(?:youtube\.com|youtu\.be)/", re.I),
+    "linkedinURL": re.compile(r"^https?://(?:[a-z0-9\-]+\.)?linkedin\.com/", re.I),
+    "redditURL": re.compile(r"^https?://(?:www\.)?reddit\.com/", re.I),
+    "mediumURL": re.compile(r"^https?://(?:www\.)?medium\.com/", re.I),
+    "githubURL": re.compile(r"^https?://(?:www\.)?github\.com/", re.I),
+}
+OLD_AGG = {
+    "twitterURL": re.compile(r"(?:^|//)(?:www\.)?(?:twitter\.com|x\.com)/", re.I),
+    "discordURL": re.compile(r"(?:^|//)(?:www\.)?discord\.(?:gg|com)/", re.I),
+    "telegramURL": re.compile(r"(?:^|//)(?:www\.)?(?:t\.me|telegram\.me)/", re.I),
+    "youtubeURL": re.compile(r"(?:^|//)(?:www\.)?(?:youtube\.com|youtu\.be)/", re.I),
+    "linkedinURL": re.compile(r"(?:^|//)(?:www\.)?linkedin\.com/", re.I),
+    "redditURL": re.compile(r"(?:^|//)(?:www\.)?reddit\.com/", re.I),
+    "mediumURL": re.compile(r"(?:^|//)(?:www\.)?medium\.com/", re.I),
+    "githubURL": re.compile(r"(?:^|//)(?:www\.)?github\.com/", re.I),
+}
+
+URLS = [
+    "https://x.com/acme",
+    "https://twitter.com/acme/",
+    "http://WWW.X.COM/Acme",
+    "https://x.com/",
+    "https://x.com",
+    "https://x.com?lang=en",
+    "https://help.x.com/en/rules",
+    "https://notx.com/acme",
+    "https://x.com.evil.example/acme",
+    "https://discord.gg/acme",
+    "https://discord.com/invite/acme",
+    "https://discord.com",
+    "https://discordapp.com/invite/acme",
+    "https://t.me/acme",
+    "https://telegram.me/acme",
+    "https://www.youtube.com/@acme",
+    "https://youtu.be/dQw4w9WgXcQ",
+    "https://m.youtube.com/@acme",
+    "https://studio.youtube.com/channel/UC1",
+    "https://www.linkedin.com/company/acme/",
+    "https://uk.linkedin.com/company/acme",
+    "https://a.b.linkedin.com/company/acme",
+    "https://www.reddit.com/r/acme/",
+    "https://old.reddit.com/r/acme/",
+    "https://medium.com/@acme",
+    "https://acme.medium.com/post",
+    "https://github.com/acme",
+    "https://docs.github.com/en",
+    "https://gist.github.com/acme/1",
+    "https://acme.example/",
+    "/relative/path",
+    "mailto:team@acme.example",
+    "",
+]
+
+# Намеренные отличия общего индекса от SOCIAL_PATTERNS: url -> новый ключ
+WEB_CHANGES = {
+    # явный порт и точка в конце хоста не мешают разбору хоста
+    "https://x.com:443/acme": "twitterURL",
+    "https://x.com./acme": "twitterURL",
+    # ведущий www. снимается и перед региональным поддоменом
+    "https://www.uk.linkedin.com/in/acme": "linkedinURL",
+}
+
+# Намеренные отличия от SOCIAL_PATTS: url -> новый набор ключей
+AGG_CHANGES = {
+    # региональный поддомен linkedin - как в web.py
+    "https://uk.linkedin.com/company/acme": {"linkedinURL"},
+    # имя пользователя и порт в ссылке больше не прячут хост
+    "https://acme@github.com/acme": {"githubURL"},
+    "https://x.com:443/acme": {"twitterURL"},
+}
+
+
+def _old_web(url: str) -> str:
+    return next((k for k, p in OLD_WEB.items() if p.search(url)), "")
+
+
+def _old_agg(url: str) -> set:
+    return {k for k, p in OLD_AGG.items() if p.search(url)}
+
+
+@pytest.mark.parametrize("url", URLS + list(WEB_CHANGES))
+def test_classify_url_matches_old_web_rules(url):
+    expected = WEB_CHANGES.get(url, _old_web(url))
+    assert classify_url(url).social == expected
+
+
+@pytest.mark.parametrize("url", URLS + list(AGG_CHANGES))
+def test_embedded_keys_match_old_aggregator_rules(url):
+    expected = AGG_CHANGES.get(url, _old_agg(url))
+    assert set(_embedded_social_keys(url)) == expected
+
+
+@pytest.mark.parametrize(
+    "url, changes, old",
+    [(u, WEB_CHANGES, _old_web) for u in WEB_CHANGES]
+    + [(u, AGG_CHANGES, _old_agg) for u in AGG_CHANGES],
+)
+def test_changes_differ_from_old_rules(url, changes, old):
+    assert changes[url] != old(url)
+
+
+def test_socials_inside_redirects():
+    href = "https://l.instagram.com/?u=https://t.me/acme&next=https://github.com/acme"
+    assert list(_embedded_social_keys(href)) == ["telegramURL", "githubURL"]
+
+
+def test_host_flags():
+    assert classify_host("x.com").x_service
+    assert classify_host("pbs.twimg.com").x_service
+    help_x = classify_host("help.x.com")
+    assert help_x.x_service and not help_x.social
+    assert classify_url("https://x.com").x_service
+    assert not classify_url("https://x.com").social
+
+
+@pytest.mark.skipif(not LINK_COLLECTION_DOMAINS, reason="link_collections пуст")
+def test_aggregator_hosts():
+    domain = sorted(LINK_COLLECTION_DOMAINS)[0]
+    assert classify_host("www." + domain).aggregator
+    assert classify_host("sub." + domain).aggregator
+    assert not classify_host(domain + ".evil.example").aggregator
+    assert classify_url(f"https://{domain}").aggregator
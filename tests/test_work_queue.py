@@ -0,0 +1,47 @@
+import os
+import time
+
+from core.work_queue import DONE, FAILED, LEASED, QUEUED, WorkQueue
+
+
+def _queue(tmp_path, **kw):
+    return WorkQueue(path=os.path.join(str(tmp_path), "queue.db"), **kw)
+
+
+def _status(queue, run_id, key):
+    return queue.conn.execute(
+        "SELECT status FROM jobs WHERE run_id = ? AND key = ?", (run_id, key)
+    ).fetchone()[0]
+
+
+# Воркер прогона не берет задания чужого прогона из той же очереди
+def test_claim_scoped_to_run(tmp_path):
+    queue = _queue(tmp_path)
+    queue.enqueue("old", "partner", "a", {"n": 1})
+    queue.enqueue("new", "partner", "b", {"n": 2})
+
+    assert queue.latest_run() == "new"
+    job = queue.claim("w1", "new")
+    assert (job["run_id"], job["key"]) == ("new", "b")
+    assert queue.claim("w1", "new") is None
+    assert _status(queue, "old", "a") == QUEUED
+
+    queue.complete(job["id"], "w1")
+    assert _status(queue, "new", "b") == DONE
+    assert queue.latest_run() == "old"
+    queue.close()
+
+
+# Истекшие аренды возвращаются в работу и уходят в failed только в своем прогоне
+def test_lease_expiry_scoped_to_run(tmp_path):
+    queue = _queue(tmp_path, lease_sec=0.01, max_attempts=1)
+    queue.enqueue("old", "partner", "a", {})
+    queue.enqueue("new", "partner", "b", {})
+    assert queue.claim("w-old", "old")["key"] == "a"
+    assert queue.claim("w-new", "new")["key"] == "b"
+    time.sleep(0.05)
+
+    assert queue.claim("w2", "new") is None
+    assert _status(queue, "new", "b") == FAILED
+    assert _status(queue, "old", "a") == LEASED
+    queue.close()
@@ -0,0 +1,36 @@
+import multiprocessing as mp
+import os
+import time
+
+import pytest
+
+from core.workers import WarmWorkerPool
+
+pytestmark = pytest.mark.skipif(
+    "fork" not in mp.get_all_start_methods(), reason="нужен fork"
+)
+
+
+# Воркер пула выходит через os._exit: on_stop должен сработать и на рецикле,
+# и при закрытии пула (atexit в воркере не вызывается)
+def test_pool_stops_worker_services(tmp_path):
+    stopped = tmp_path / "stopped"
+
+    def on_stop():
+        with open(stopped, "a") as f:
+            f.write(f"{os.getpid()}\n")
+
+    ctx = mp.get_context("fork")
+    pool = WarmWorkerPool(
+        ctx, 1, lambda job: "ok", partner_timeout=10, max_jobs=1, on_stop=on_stop
+    )
+    first = pool.workers[0]["proc"].pid
+    pool.submit({"url": "https://a.example/"})
+    deadline = time.time() + 10
+    while not pool.poll() and time.time() < deadline:
+        time.sleep(0.05)
+    second = pool.workers[0]["proc"].pid
+    pool.close()
+
+    assert first != second
+    assert stopped.read_text().split() == [str(first), str(second)]